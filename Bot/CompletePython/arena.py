@@ -0,0 +1,35 @@
+import numpy as np
+
+
+class BufferArena:
+    # Named buffers of a game, allocated on first use and handed out again on
+    # every later request, so the per tick computations write in place instead
+    # of allocating new arrays. The size of the map is fixed per game.
+    # A buffer handed out before is overwritten by the next user of the same
+    # name, so only keep results for as long as they are valid anyway.
+
+    def __init__(self, height: int, width: int):
+        self.shape = (height, width)
+        self._buffers = {}
+        self.allocations = 0
+        self.requests = 0
+
+    def get(self, name: str, dtype=np.int32, shape: tuple[int,...]|None = None, fill=None) -> np.ndarray:
+        # Shape defaults to the map, fill is None to leave the old contents
+        shape = self.shape if shape is None else shape
+        self.requests += 1
+        buffer = self._buffers.get(name)
+        if buffer is None or buffer.shape != shape or buffer.dtype != dtype:
+            buffer = np.empty(shape, dtype=dtype)
+            self._buffers[name] = buffer
+            self.allocations += 1
+        if fill is not None:
+            buffer.fill(fill)
+        return buffer
+
+    @property
+    def nbytes(self) -> int:
+        return sum(buffer.nbytes for buffer in self._buffers.values())
+
+    def stats(self) -> dict[str,int]:
+        return {'allocations': self.allocations, 'requests': self.requests, 'buffers': len(self._buffers), 'bytes': self.nbytes}
@@ -0,0 +1,252 @@
+import argparse
+import contextlib
+import json
+import numpy as np
+import os
+import sys
+import tracemalloc
+from collections import defaultdict
+from functools import wraps
+from glob import glob
+from time import perf_counter_ns
+import swoq_pb2
+from play import GamePlayer
+from replay import ReplayReader
+from simulator import GameSimulator
+from metrics import strategy_routines, max_rss_kb
+
+# The routines of GamePlayer that are timed, besides a whole tick
+routines = ('update_global_state', 'plan') + strategy_routines
+
+percentiles = (50, 90, 99)
+
+
+class ReplayStub:
+
+    # Answers with the recorded responses, whatever the actions of the player are
+    def __init__(self, path:str):
+        self.reader = ReplayReader(path)
+        self.next_act = 0
+
+
+    @property
+    def exhausted(self) -> bool:
+        return self.next_act >= len(self.reader)
+
+
+    def Start(self, request:swoq_pb2.StartRequest, **kwargs) -> swoq_pb2.StartResponse:
+        self.next_act = 0
+        return self.reader.start_response
+
+
+    def Act(self, request:swoq_pb2.ActRequest, **kwargs) -> swoq_pb2.ActResponse:
+        _, response = self.reader.act(self.next_act)
+        self.next_act += 1
+        return response
+
+
+    def close(self) -> None:
+        self.reader.close()
+
+
+    def __enter__(self) -> object:
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class Recorder:
+
+    # Durations in nanoseconds per routine and level
+    def __init__(self, player:GamePlayer):
+        self.player = player
+        self.samples = defaultdict(list)
+
+
+    def instrument(self) -> None:
+        # Instance attributes take precedence over the methods of the class
+        for name in routines:
+            setattr(self.player, name, self.timed(name, getattr(self.player, name)))
+
+
+    def timed(self, name:str, method):
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                self.add(name, perf_counter_ns() - start)
+        return wrapper
+
+
+    def add(self, name:str, duration:int) -> None:
+        self.samples[(name, getattr(self.player, 'level', None))].append(duration)
+
+
+def play_case(player:GamePlayer, recorder:Recorder, level:int|None, seed:int|None, stub, max_ticks:int) -> None:
+    # The time spent in the stub is not part of a tick
+    stub_ns = 0
+    stub_act = stub.Act
+    def timed_act(request:swoq_pb2.ActRequest, **kwargs) -> swoq_pb2.ActResponse:
+        nonlocal stub_ns
+        start = perf_counter_ns()
+        try:
+            return stub_act(request, **kwargs)
+        finally:
+            stub_ns += perf_counter_ns() - start
+    stub.Act = timed_act
+
+    player.start(level, seed)
+    ticks = 0
+    while not player.finished and ticks < max_ticks:
+        if isinstance(stub, ReplayStub) and stub.exhausted: break
+        stub_ns = 0
+        start = perf_counter_ns()
+        player.step()
+        recorder.add('tick', perf_counter_ns() - start - stub_ns)
+        ticks += 1
+
+
+def run_cases(cases:list[tuple[str,object]], max_ticks:int=20000, trace_memory:bool=False) -> dict:
+    # A case is ('replay', path) or ('seeded', (level, seed))
+    samples = defaultdict(list)
+    memory = defaultdict(int)
+    case_results = []
+
+    if trace_memory:
+        tracemalloc.start()
+    try:
+        for kind, arg in cases:
+            if kind == 'replay':
+                stub = ReplayStub(arg)
+                level, seed = None, None
+            else:
+                stub = GameSimulator()
+                level, seed = arg
+            np.random.seed(0 if seed is None else seed)
+            if trace_memory:
+                tracemalloc.reset_peak()
+
+            # The replay is closed once played, the simulator holds nothing to close
+            with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull), \
+                 stub if isinstance(stub, ReplayStub) else contextlib.nullcontext():
+                player = GamePlayer('benchmark', 'benchmark', plot=False, print=False, stub=stub)
+                recorder = Recorder(player)
+                recorder.instrument()
+                play_case(player, recorder, level, seed, stub, max_ticks)
+
+            for key, durations in recorder.samples.items():
+                samples[key].extend(durations)
+            result = {'kind': kind, 'case': arg, 'status': swoq_pb2.GameStatus.Name(player.status), 'level': player.level, 'ticks': player.tick}
+            if player.arena is not None:
+                result['arena'] = player.arena.stats()
+            if trace_memory:
+                peak = tracemalloc.get_traced_memory()[1]
+                memory[player.level] = max(memory[player.level], peak)
+                result['peak_bytes'] = peak
+            case_results.append(result)
+    finally:
+        if trace_memory:
+            tracemalloc.stop()
+
+    return {
+        'cases': case_results,
+        'routines': summarize(samples),
+        'memory': {
+            'peak_bytes_per_level': {str(level): peak for level, peak in sorted(memory.items())},
+            'max_rss_kb': max_rss_kb(),
+        },
+    }
+
+
+def summarize(samples:dict[tuple[str,int|None],list[int]]) -> dict[str,dict[str,dict[str,float]]]:
+    # Percentiles in microseconds per routine and level, 'all' for all levels together
+    per_routine = defaultdict(list)
+    for (name, _), durations in samples.items():
+        per_routine[name].extend(durations)
+
+    def stats(durations:list[int]) -> dict[str,float]:
+        us = np.asarray(durations, dtype=np.float64) / 1000
+        result = {f'p{p}': float(v) for p, v in zip(percentiles, np.percentile(us, percentiles))}
+        result['max'] = float(us.max())
+        result['count'] = len(us)
+        return result
+
+    summary = defaultdict(dict)
+    for (name, level), durations in sorted(samples.items(), key=lambda item: (item[0][0], -1 if item[0][1] is None else item[0][1])):
+        summary[name][str(level)] = stats(durations)
+    for name, durations in per_routine.items():
+        summary[name]['all'] = stats(durations)
+    return dict(summary)
+
+
+def compare(results:dict, baseline:dict, tolerance:float=0.25, min_count:int=20) -> list[str]:
+    # Regressions of the median and p90 against the baseline, ignoring sparse samples
+    regressions = []
+    for name, levels in results['routines'].items():
+        for level, current in levels.items():
+            base = baseline.get('routines', {}).get(name, {}).get(level)
+            if base is None or current['count'] < min_count or base['count'] < min_count: continue
+            for key in ('p50', 'p90'):
+                if current[key] > base[key] * (1 + tolerance):
+                    regressions.append(f'{name} level {level} {key}: {base[key]:.1f}us -> {current[key]:.1f}us')
+
+    base_rss = baseline.get('memory', {}).get('max_rss_kb')
+    rss = results['memory']['max_rss_kb']
+    if base_rss and rss and rss > base_rss * (1 + tolerance):
+        regressions.append(f'max rss: {base_rss}kB -> {rss}kB')
+    return regressions
+
+
+def parse_levels(text:str) -> list[int]:
+    # Like '0-5,8,10-12'
+    levels = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        levels.extend(range(int(first), int(last or first) + 1))
+    return levels
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Benchmark the strategy of GamePlayer without a server')
+    parser.add_argument('--replays', help='folder with .swoq replays to feed through the player')
+    parser.add_argument('--levels', default='0-22', help='levels of the seeded runs, like 0-5,8')
+    parser.add_argument('--seeds', type=int, default=3, help='number of seeds per level')
+    parser.add_argument('--max-ticks', type=int, default=20000)
+    parser.add_argument('--memory', action='store_true', help='trace the peak memory per level, slows down the run')
+    parser.add_argument('--output', help='write the results as json')
+    parser.add_argument('--baseline', help='compare with the results of an earlier run')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    args = parser.parse_args()
+
+    if args.replays:
+        paths = sorted(glob(os.path.join(args.replays, '**', '*.swoq'), recursive=True) + glob(os.path.join(args.replays, '**', '*.swoq.gz'), recursive=True))
+        cases = [('replay', path) for path in paths]
+    else:
+        cases = [('seeded', (level, seed)) for level in parse_levels(args.levels) for seed in range(args.seeds)]
+
+    results = run_cases(cases, max_ticks=args.max_ticks, trace_memory=args.memory)
+
+    for name, levels in results['routines'].items():
+        overall = levels['all']
+        print(f'{name:32} p50={overall["p50"]:9.1f}us p90={overall["p90"]:9.1f}us p99={overall["p99"]:9.1f}us n={overall["count"]}')
+    print(f'max rss={results["memory"]["max_rss_kb"]}kB')
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f'REGRESSION {line}')
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
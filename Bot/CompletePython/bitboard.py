@@ -0,0 +1,114 @@
+import numpy as np
+import swoq_pb2
+
+# Tile classes that are kept as bit planes
+plane_tiles = {
+    'empty': [swoq_pb2.TILE_EMPTY],
+    'unknown': [swoq_pb2.TILE_UNKNOWN],
+    'wall': [swoq_pb2.TILE_WALL, swoq_pb2.TILE_DOOR_RED, swoq_pb2.TILE_DOOR_GREEN, swoq_pb2.TILE_DOOR_BLUE,
+             swoq_pb2.TILE_BOULDER, swoq_pb2.TILE_UNKNOWN],
+    'door': [swoq_pb2.TILE_DOOR_RED, swoq_pb2.TILE_DOOR_GREEN, swoq_pb2.TILE_DOOR_BLUE],
+    'key': [swoq_pb2.TILE_KEY_RED, swoq_pb2.TILE_KEY_GREEN, swoq_pb2.TILE_KEY_BLUE],
+    'plate': [swoq_pb2.TILE_PRESSURE_PLATE_RED, swoq_pb2.TILE_PRESSURE_PLATE_GREEN, swoq_pb2.TILE_PRESSURE_PLATE_BLUE],
+    'boulder': [swoq_pb2.TILE_BOULDER],
+    'enemy': [swoq_pb2.TILE_ENEMY, swoq_pb2.TILE_BOSS],
+}
+plane_names = tuple(plane_tiles)
+
+# Per plane which tiles are in it, indexed by tile value
+_plane_lookup = np.zeros((len(plane_names), max(swoq_pb2.Tile.values())+1), dtype=bool)
+for _i, _name in enumerate(plane_names):
+    _plane_lookup[_i, plane_tiles[_name]] = True
+
+
+class BitPlanes:
+    # The map as one bit plane per tile class. A plane is a Python int with
+    # a bit per cell, bit y * stride + x for cell (y, x). Every row has an
+    # extra guard bit that is never set, so shifting by one column does not
+    # wrap into the next row. Neighbour queries over the whole map are a few
+    # shifts and bitwise operations on machine words.
+    # Cells outside the map count as not set in any plane.
+
+    def __init__(self, game_map: np.ndarray[np.int8]):
+        self.map = game_map
+        self.height, self.width = game_map.shape
+        self.stride = self.width + 1
+        self.nr_bits = self.height * self.stride
+        self.valid = self._pack(np.ones((1, self.height, self.width), dtype=bool))[0]
+        self.planes = dict(zip(plane_names, self._pack(_plane_lookup[:, game_map])))
+
+    def _pack(self, masks: np.ndarray[bool], first_row: int = 0) -> list[int]:
+        # Masks of (planes, rows, width) into one int per plane
+        nr_planes, nr_rows, width = masks.shape
+        padded = np.zeros((nr_planes, nr_rows, self.stride), dtype=bool)
+        padded[:, :, :width] = masks
+        packed = np.packbits(padded.reshape(nr_planes, -1), axis=1, bitorder='little')
+        shift = first_row * self.stride
+        return [int.from_bytes(row.tobytes(), 'little') << shift for row in packed]
+
+    def pack(self, mask: np.ndarray[bool]) -> int:
+        # A mask of the map as a plane
+        return self._pack(mask[np.newaxis])[0]
+
+    def update(self, first_row: int = 0, last_row: int|None = None) -> None:
+        # Packs rows first_row up to and including last_row of the map again
+        last_row = self.height - 1 if last_row is None else last_row
+        rows = self._pack(_plane_lookup[:, self.map[first_row:last_row+1]], first_row)
+        keep = ~(((1 << ((last_row - first_row + 1) * self.stride)) - 1) << (first_row * self.stride))
+        for name, row_bits in zip(plane_names, rows):
+            self.planes[name] = (self.planes[name] & keep) | row_bits
+
+    def update_cells(self, changes: np.ndarray[np.intp]) -> None:
+        # Changes are (N, 2) positions, only the rows they span are packed again
+        if len(changes) > 0:
+            self.update(int(changes[:, 0].min()), int(changes[:, 0].max()))
+
+    def __getitem__(self, name: str) -> int:
+        return self.planes[name]
+
+    def test(self, plane: int|str, pos: tuple[int,int]) -> bool:
+        if isinstance(plane, str):
+            plane = self.planes[plane]
+        y, x = pos
+        if not (0 <= y < self.height and 0 <= x < self.width): return False
+        return (plane >> (y * self.stride + x)) & 1 == 1
+
+    def is_wall(self, pos: tuple[int,int]) -> bool:
+        return self.test('wall', pos)
+
+    def any_neighbour(self, plane: int) -> int:
+        # Cells with at least one of their 4 neighbours in the plane
+        stride = self.stride
+        return ((plane << stride) | (plane >> stride) | (plane << 1) | (plane >> 1)) & self.valid
+
+    def all_neighbours(self, plane: int) -> int:
+        # Cells with all of their 4 neighbours in the plane
+        stride = self.stride
+        return (plane << stride) & (plane >> stride) & (plane << 1) & (plane >> 1) & self.valid
+
+    def frontier(self) -> int:
+        # Empty cells with at least one unknown neighbour
+        return self.planes['empty'] & self.any_neighbour(self.planes['unknown'])
+
+    def clearing(self) -> int:
+        # Empty cells with only empty neighbours
+        empty = self.planes['empty']
+        return empty & self.all_neighbours(empty)
+
+    def mask(self, plane: int|str, out: np.ndarray[bool]|None = None) -> np.ndarray[bool]:
+        if isinstance(plane, str):
+            plane = self.planes[plane]
+        data = np.frombuffer(plane.to_bytes((self.nr_bits + 7) // 8, 'little'), dtype=np.uint8)
+        bits = np.unpackbits(data, count=self.nr_bits, bitorder='little')
+        if out is None:
+            return bits.reshape(self.height, self.stride)[:, :self.width].astype(bool)
+        np.copyto(out, bits.reshape(self.height, self.stride)[:, :self.width], casting='unsafe')
+        return out
+
+    def positions(self, plane: int|str) -> np.ndarray[np.intp]:
+        return np.argwhere(self.mask(plane))
+
+    def count(self, plane: int|str) -> int:
+        if isinstance(plane, str):
+            plane = self.planes[plane]
+        return plane.bit_count()
@@ -0,0 +1,43 @@
+import numpy as np
+
+
+class CellSet:
+    # Set of map positions backed by a boolean mask of the map, so its size
+    # is fixed by the map whatever is added. Positions are (y, x), as tuples
+    # or numpy rows. Iterates in row-major order.
+
+    def __init__(self, shape: tuple[int,int], cells=()):
+        self.mask = np.zeros(shape, dtype=bool)
+        self._count = 0
+        for cell in cells:
+            self.add(cell)
+
+    def _inside(self, cell) -> bool:
+        height, width = self.mask.shape
+        return 0 <= cell[0] < height and 0 <= cell[1] < width
+
+    def add(self, cell) -> None:
+        # Negative positions would otherwise wrap around to the other side of the mask
+        if not self._inside(cell): raise IndexError(f'position {tuple(cell)} is outside the map {self.mask.shape}')
+        y, x = int(cell[0]), int(cell[1])
+        if not self.mask[y, x]:
+            self.mask[y, x] = True
+            self._count += 1
+
+    def discard(self, cell) -> None:
+        if cell is not None and self._inside(cell) and self.mask[cell[0], cell[1]]:
+            self.mask[cell[0], cell[1]] = False
+            self._count -= 1
+
+    def clear(self) -> None:
+        self.mask[:] = False
+        self._count = 0
+
+    def __contains__(self, cell) -> bool:
+        return cell is not None and self._inside(cell) and bool(self.mask[cell[0], cell[1]])
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self):
+        return iter([(y, x) for y, x in np.argwhere(self.mask).tolist()])
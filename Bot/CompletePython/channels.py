@@ -0,0 +1,108 @@
+import grpc
+import os
+import threading
+import swoq_pb2_grpc
+
+default_target = 'localhost:5001'
+
+
+class _CallDefaults:
+
+    # A method of the stub with a default deadline, both for blocking calls and futures
+    def __init__(self, method, timeout:float|None):
+        self.method = method
+        self.timeout = timeout
+
+
+    def __call__(self, request, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.method(request, **kwargs)
+
+
+    def future(self, request, **kwargs):
+        kwargs.setdefault('timeout', self.timeout)
+        return self.method.future(request, **kwargs)
+
+
+class PooledStub:
+
+    # The game service on a shared channel, closing it is up to the pool
+    def __init__(self, channel:grpc.Channel, timeout:float|None):
+        stub = swoq_pb2_grpc.GameServiceStub(channel)
+        self.Start = _CallDefaults(stub.Start, timeout)
+        self.Act = _CallDefaults(stub.Act, timeout)
+
+
+class ChannelPool:
+
+    # One channel per target, shared by all players of a process and kept open
+    # across games. gRPC multiplexes the calls of all players over it.
+    # Timeout is the deadline of every call in seconds, None for no deadline.
+    def __init__(self, keepalive_time_ms:int=30000, keepalive_timeout_ms:int=10000, max_message_bytes:int=16*1024*1024,
+                 compression:bool=False, timeout:float|None=None):
+        self.keepalive_time_ms = keepalive_time_ms
+        self.keepalive_timeout_ms = keepalive_timeout_ms
+        self.max_message_bytes = max_message_bytes
+        self.compression = compression
+        self.timeout = timeout
+        self._channels = {}
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+
+
+    def options(self) -> list[tuple[str,object]]:
+        # Also usable for a grpc.aio channel
+        return [
+            ('grpc.keepalive_time_ms', self.keepalive_time_ms),
+            ('grpc.keepalive_timeout_ms', self.keepalive_timeout_ms),
+            ('grpc.keepalive_permit_without_calls', 1),
+            ('grpc.max_send_message_length', self.max_message_bytes),
+            ('grpc.max_receive_message_length', self.max_message_bytes),
+        ]
+
+
+    def grpc_compression(self) -> grpc.Compression:
+        return grpc.Compression.Gzip if self.compression else grpc.Compression.NoCompression
+
+
+    def channel(self, target:str=default_target) -> grpc.Channel:
+        with self._lock:
+            # Channels of the parent are not usable after a fork, and must not be closed either
+            if self._pid != os.getpid():
+                self._pid = os.getpid()
+                self._channels = {}
+            channel = self._channels.get(target)
+            if channel is None:
+                channel = grpc.insecure_channel(target, options=self.options(), compression=self.grpc_compression())
+                self._channels[target] = channel
+            return channel
+
+
+    def stub(self, target:str=default_target) -> PooledStub:
+        return PooledStub(self.channel(target), self.timeout)
+
+
+    def close(self) -> None:
+        with self._lock:
+            channels, self._channels = self._channels, {}
+        for channel in channels.values():
+            channel.close()
+
+
+_shared_pool = None
+
+
+def shared_pool() -> ChannelPool:
+    # Created on first use, configure() replaces it
+    global _shared_pool
+    if _shared_pool is None:
+        _shared_pool = ChannelPool()
+    return _shared_pool
+
+
+def configure(**kwargs) -> ChannelPool:
+    # Settings of ChannelPool, for the players created from now on.
+    # Players that use the previous pool keep using its channels.
+    global _shared_pool
+    _shared_pool = ChannelPool(**kwargs)
+    return _shared_pool
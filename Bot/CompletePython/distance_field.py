@@ -0,0 +1,523 @@
+from array import array
+import numpy as np
+import swoq_pb2
+
+
+def _unpad_predecessors(pred_padded: np.ndarray[np.int32], height: int, width: int, out: np.ndarray[np.int32]|None = None) -> np.ndarray[np.int32]:
+    # Convert flat indices into the padded map back to flat indices into the real map,
+    # for the cells of the real map only. Written into out when given.
+    padded_width = width + 2
+    pred = pred_padded.reshape(height+2, padded_width)[1:-1, 1:-1]
+    if out is None:
+        out = np.empty((height, width), dtype=np.int32)
+    # (y+1) * padded_width + (x+1) becomes y * width + x, that is 2 less per row
+    # and padded_width - 1 less for the padding before the first cell
+    np.floor_divide(pred, padded_width, out=out)
+    out *= -2
+    out += pred
+    out += 1 - padded_width
+    np.copyto(out, -1, where=pred < 0)
+    return out
+
+
+def _unpad_distances(dist_padded: np.ndarray[np.int32], height: int, width: int, out: np.ndarray[np.int32]|None = None) -> np.ndarray[np.int32]:
+    # The cells of the real map only, written into out when given
+    dist = dist_padded.reshape(height+2, width+2)[1:-1, 1:-1]
+    if out is None:
+        return dist.copy()
+    np.copyto(out, dist)
+    return out
+
+
+def _padded_open_cells(game_map: np.ndarray[np.int8], blocked: np.ndarray[bool]|None = None) -> np.ndarray[np.uint8]:
+    # Walkable cells on a map padded with a border of non-walkable cells,
+    # so neighbours can be looked up without bounds checks.
+    height, width = game_map.shape
+    open_cells = np.zeros((height+2, width+2), dtype=np.uint8)
+    open_cells[1:-1, 1:-1] = game_map == swoq_pb2.TILE_EMPTY
+    if blocked is not None:
+        open_cells[1:-1, 1:-1][blocked] = 0
+    return open_cells.ravel()
+
+
+def _breadth_first_search(open_cells: bytearray, start: int, padded_width: int) -> tuple[array, array]:
+    # Flat int32 buffers, can be wrapped as numpy arrays without copying
+    size = len(open_cells)
+    distances = array('i', [-1]) * size
+    predecessors = array('i', [-1]) * size
+
+    # Cells are cleared from the open cells once they are visited
+    distances[start] = 0
+    open_cells[start] = 0
+
+    # The queue is stored in a flat array, cells are never removed,
+    # only the head index moves forward.
+    north, south, west, east = -padded_width, padded_width, -1, 1
+    queue = array('i', [start])
+    head = 0
+    while head < len(queue):
+        cur = queue[head]
+        head += 1
+        next_dist = distances[cur] + 1
+        for offset in (north, south, west, east):
+            next_cell = cur + offset
+            if open_cells[next_cell]:
+                open_cells[next_cell] = 0
+                distances[next_cell] = next_dist
+                predecessors[next_cell] = cur
+                queue.append(next_cell)
+
+    return distances, predecessors
+
+
+def compute_distance_field(game_map: np.ndarray[np.int8], from_pos: tuple[int,int]) -> tuple[np.ndarray[np.int32], np.ndarray[np.int32]]:
+    height, width = game_map.shape
+    padded_width = width + 2
+
+    open_cells = bytearray(_padded_open_cells(game_map))
+    start = (from_pos[0]+1) * padded_width + (from_pos[1]+1)
+    distances, predecessors = _breadth_first_search(open_cells, start, padded_width)
+
+    distances = np.frombuffer(distances, dtype=np.int32).reshape(height+2, padded_width)[1:-1, 1:-1].copy()
+    predecessors = _unpad_predecessors(np.frombuffer(predecessors, dtype=np.int32), height, width)
+    return distances, predecessors
+
+
+def compute_target_field(game_map: np.ndarray[np.int8], targets: np.ndarray[bool], blocked: np.ndarray[bool]|None = None,
+                         out: tuple[np.ndarray[np.int32], np.ndarray[np.int32]]|None = None) -> tuple[np.ndarray[np.int32], np.ndarray[np.int32]]:
+    # Distance from every walkable cell to the closest target, and the flat
+    # index of that target (-1 if no target can be reached). Targets do not
+    # have to be walkable themselves, they are only the starting points.
+    # The targets are searched from in row-major order, so of the closest
+    # targets a cell gets the first in row-major order as origin.
+    # Blocked cells are not walkable. Written into out when given.
+    height, width = game_map.shape
+    padded_width = width + 2
+
+    open_cells = bytearray(_padded_open_cells(game_map, blocked))
+    padded_targets = np.zeros((height+2, padded_width), dtype=bool)
+    padded_targets[1:-1, 1:-1] = targets
+    starts = np.flatnonzero(padded_targets).tolist()
+
+    size = len(open_cells)
+    distances = array('i', [-1]) * size
+    origins = array('i', [-1]) * size
+    for start in starts:
+        distances[start] = 0
+        origins[start] = start
+        open_cells[start] = 0
+
+    north, south, west, east = -padded_width, padded_width, -1, 1
+    queue = array('i', starts)
+    head = 0
+    while head < len(queue):
+        cur = queue[head]
+        head += 1
+        next_dist = distances[cur] + 1
+        origin = origins[cur]
+        for offset in (north, south, west, east):
+            next_cell = cur + offset
+            if open_cells[next_cell]:
+                open_cells[next_cell] = 0
+                distances[next_cell] = next_dist
+                origins[next_cell] = origin
+                queue.append(next_cell)
+
+    distances_out, origins_out = out if out is not None else (None, None)
+    distances = _unpad_distances(np.frombuffer(distances, dtype=np.int32), height, width, distances_out)
+    origins = _unpad_predecessors(np.frombuffer(origins, dtype=np.int32), height, width, origins_out)
+    return distances, origins
+
+
+def _subtree_mask(predecessors: np.ndarray[np.int32], roots: np.ndarray[bool]) -> np.ndarray[bool]:
+    # Mark all cells that have one of the roots on their path to the source,
+    # using pointer jumping so only log(max distance) passes are needed.
+    mask = roots.copy()
+    ancestors = predecessors.copy()
+    has_ancestor = ancestors >= 0
+    while np.any(has_ancestor):
+        mask[has_ancestor] |= mask[ancestors[has_ancestor]]
+        ancestors[has_ancestor] = ancestors[ancestors[has_ancestor]]
+        has_ancestor = ancestors >= 0
+    return mask
+
+
+def _search_order(predecessors: np.ndarray[np.int32], root: int) -> np.ndarray[np.intp]:
+    # Flat indices of the cells of the path tree below root, in the order a
+    # breadth first search finds them: level by level, and within a level by
+    # the order of the predecessor and then the side it is reached from (N, S,
+    # W, E). For a field of a single search this is the insertion order of the
+    # dicts of the old compute_distances_quick.
+    width = predecessors.shape[1]
+    flat = predecessors.ravel()
+    cells = np.flatnonzero(flat >= 0)
+    parents = flat[cells].astype(np.intp)
+    step = cells - parents
+    side = np.select([step == -width, step == width, step == -1], [0, 1, 2], 3)
+    keys = parents * 4 + side
+    by_key = np.argsort(keys, kind='stable')
+    cells, keys = cells[by_key], keys[by_key]
+
+    levels = [np.array([root], dtype=np.intp)]
+    while True:
+        # The children of the cells of a level, in the order of those cells
+        level = levels[-1]
+        starts = np.searchsorted(keys, level * 4)
+        counts = np.searchsorted(keys, level * 4 + 4) - starts
+        if not np.any(counts): break
+        offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        levels.append(cells[np.repeat(starts, counts) + offsets])
+    return np.concatenate(levels)
+
+
+class DistanceMap:
+    # Dict-like view on a dense distance field, compatible with the
+    # {pos: distance} dicts of the old compute_distances_quick.
+    # A distance of -1 means the position is not reachable.
+    # With the predecessors of the field the keys are in the order of the
+    # search, as the dicts were, otherwise in row-major order.
+
+    def __init__(self, distances: np.ndarray[np.int32], predecessors: np.ndarray[np.int32]|None = None):
+        self.distances = distances
+        self.predecessors = predecessors
+
+    def __contains__(self, pos) -> bool:
+        if pos is None: return False
+        y, x = pos
+        height, width = self.distances.shape
+        return 0 <= y < height and 0 <= x < width and self.distances[y, x] >= 0
+
+    def __getitem__(self, pos) -> int:
+        if pos not in self: raise KeyError(pos)
+        return int(self.distances[pos[0], pos[1]])
+
+    def __delitem__(self, pos) -> None:
+        if pos not in self: raise KeyError(pos)
+        self.distances[pos[0], pos[1]] = -1
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.distances >= 0))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self) -> list[tuple[int,int]]:
+        width = self.distances.shape[1]
+        sources = np.flatnonzero(self.distances == 0)
+        if self.predecessors is None or len(sources) != 1:
+            return [(y, x) for y, x in np.argwhere(self.distances >= 0).tolist()]
+        # Cells deleted from the map are left out, the others keep their place
+        order = _search_order(self.predecessors, int(sources[0]))
+        order = order[self.distances.ravel()[order] >= 0]
+        return [(cell // width, cell % width) for cell in order.tolist()]
+
+
+class PathMap:
+    # Dict-like view on a dense predecessor field, compatible with the
+    # {pos: previous pos} dicts of the old compute_distances_quick.
+    # Predecessors are stored as flat indices, -1 means no predecessor.
+    # The first steps from the source are remembered for every cell that
+    # has been walked over, so the chains are only walked back once.
+
+    def __init__(self, predecessors: np.ndarray[np.int32]):
+        self.predecessors = predecessors
+        self._source = None
+        self._first_steps = None
+
+    def __contains__(self, pos) -> bool:
+        if pos is None: return False
+        y, x = pos
+        height, width = self.predecessors.shape
+        return 0 <= y < height and 0 <= x < width and self.predecessors[y, x] >= 0
+
+    def __getitem__(self, pos) -> tuple[int,int]:
+        if pos not in self: raise KeyError(pos)
+        width = self.predecessors.shape[1]
+        prev = int(self.predecessors[pos[0], pos[1]])
+        return (prev // width, prev % width)
+
+    def __len__(self) -> int:
+        return int(np.count_nonzero(self.predecessors >= 0))
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def keys(self) -> list[tuple[int,int]]:
+        # In the order of the search, the source itself is not a key
+        width = self.predecessors.shape[1]
+        flat = self.predecessors.ravel()
+        parents = np.unique(flat[flat >= 0])
+        roots = parents[flat[parents] < 0]
+        if len(roots) == 0: return []
+        order = np.concatenate([_search_order(self.predecessors, int(root))[1:] for root in roots])
+        return [(cell // width, cell % width) for cell in order.tolist()]
+
+    def next_step(self, from_pos: tuple[int,int], to_pos: tuple[int,int]) -> tuple[int,int]|None:
+        if to_pos not in self: return None
+
+        width = self.predecessors.shape[1]
+        source = from_pos[0] * width + from_pos[1]
+        if source != self._source:
+            self._source = source
+            self._first_steps = array('i', [-1]) * self.predecessors.size
+
+        # Walk back over flat indices until the source, or a cell of which the
+        # first step is already known, is reached
+        flat = memoryview(self.predecessors.ravel())
+        first_steps = self._first_steps
+        chain = []
+        cur = to_pos[0] * width + to_pos[1]
+        while cur != source and first_steps[cur] < 0:
+            chain.append(cur)
+            cur = flat[cur]
+            if cur < 0: return None
+        first = first_steps[cur] if cur != source else chain[-1]
+
+        # Compress the chain, all cells on it share the first step
+        for cell in chain:
+            first_steps[cell] = first
+        return (first // width, first % width)
+
+
+class IncrementalDistanceField:
+    # Distance field from a player that is kept up to date across ticks.
+    # Only the cells affected by tiles that became (non-)walkable, or by the
+    # source moving a single step, are recomputed. When too many cells are
+    # affected it falls back to a full breadth first search.
+    # The distances are always those of a full search. Where a cell has more
+    # than one shortest path, a repair can keep or pick another predecessor
+    # than a full search would, which takes the neighbour it reached first.
+    # The first steps towards a target, the order of the keys and so the
+    # moves of the player can then differ from searching anew every tick.
+    # The moves stay equally short. A negative max_repair_fraction never
+    # repairs, the player then makes the moves of a full search every tick.
+
+    def __init__(self, max_repair_fraction: float = 0.2):
+        self.max_repair_fraction = max_repair_fraction
+        self.full_updates = 0
+        self.repairs = 0
+        self.reset()
+
+    def reset(self) -> None:
+        self.shape = None
+        self.source = None
+
+    def copy(self) -> 'IncrementalDistanceField':
+        other = IncrementalDistanceField(self.max_repair_fraction)
+        if self.shape is not None:
+            other.shape = self.shape
+            other.source = self.source
+            other._open_cells = bytearray(self._open_cells)
+            other._distances = array('i', self._distances)
+            other._predecessors = array('i', self._predecessors)
+            other._distances_np = np.frombuffer(other._distances, dtype=np.int32)
+            other._predecessors_np = np.frombuffer(other._predecessors, dtype=np.int32)
+        other.full_updates = self.full_updates
+        other.repairs = self.repairs
+        return other
+
+    def update(self, game_map: np.ndarray[np.int8], source: tuple[int,int], changes: np.ndarray[np.intp]|None = None,
+               out: tuple[np.ndarray[np.int32], np.ndarray[np.int32]]|None = None) -> tuple[DistanceMap, PathMap]:
+        # Changes are the (N, 2) positions that changed since the previous
+        # update, or None when not known. The distances and predecessors are
+        # written into out when given, which the maps of the previous update
+        # may share.
+        if changes is not None and self.shape == game_map.shape:
+            open_cells = np.frombuffer(self._open_cells, dtype=np.uint8).copy()
+            ys, xs = changes[:, 0], changes[:, 1]
+            open_cells[(ys+1) * (self.shape[1]+2) + (xs+1)] = game_map[ys, xs] == swoq_pb2.TILE_EMPTY
+        else:
+            open_cells = _padded_open_cells(game_map)
+
+        if self.shape != game_map.shape or not self._repair(open_cells, source):
+            self._compute_full(game_map.shape, open_cells, source)
+
+        height, width = self.shape
+        distances_out, predecessors_out = out if out is not None else (None, None)
+        distances = _unpad_distances(self._distances_np, height, width, distances_out)
+        predecessors = _unpad_predecessors(self._predecessors_np, height, width, predecessors_out)
+        return DistanceMap(distances, predecessors), PathMap(predecessors)
+
+    def speculate(self, source: tuple[int,int]) -> 'IncrementalDistanceField|None':
+        # A copy in which the source has already moved a single step, the part
+        # of the next update that does not depend on the changes of the map.
+        # Updating it gives the same result as updating this field. None when
+        # the step cannot be repaired.
+        if self.shape is None: return None
+        start = self._start_index(source)
+        if self._distances[start] != 1: return None
+        other = self.copy()
+        other._move_source(start, self._start_index(self.source))
+        other.source = source
+        return other
+
+    def _start_index(self, source: tuple[int,int]) -> int:
+        return (source[0]+1) * (self.shape[1]+2) + (source[1]+1)
+
+    def _compute_full(self, shape: tuple[int,int], open_cells: np.ndarray[np.uint8], source: tuple[int,int]) -> None:
+        self.shape = shape
+        self.source = source
+        self._open_cells = bytearray(open_cells)
+        self._distances, self._predecessors = _breadth_first_search(bytearray(open_cells), self._start_index(source), shape[1]+2)
+        self._distances_np = np.frombuffer(self._distances, dtype=np.int32)
+        self._predecessors_np = np.frombuffer(self._predecessors, dtype=np.int32)
+        self.full_updates += 1
+
+    def _repair(self, open_cells: np.ndarray[np.uint8], source: tuple[int,int]) -> bool:
+        distances = self._distances_np
+        predecessors = self._predecessors_np
+        start = self._start_index(source)
+        prev_start = self._start_index(self.source)
+
+        if start != prev_start:
+            # Only a single step towards a cell that was reachable can be repaired
+            dy = source[0] - self.source[0]
+            dx = source[1] - self.source[1]
+            if abs(dy) + abs(dx) != 1 or distances[start] != 1:
+                return False
+            self._move_source(start, prev_start)
+            self.source = source
+
+        was_open = np.frombuffer(self._open_cells, dtype=np.uint8)
+        reachable = distances >= 0
+        opened = (open_cells != 0) & (was_open == 0)
+        closed = (open_cells == 0) & (was_open != 0) & reachable
+
+        # Cells reached via a blocked cell lose their path
+        invalid = _subtree_mask(predecessors, closed) if np.any(closed) else closed
+
+        nr_affected = np.count_nonzero(invalid) + np.count_nonzero(opened)
+        if nr_affected > self.max_repair_fraction * np.count_nonzero(reachable):
+            return False
+
+        distances[invalid] = -1
+        predecessors[invalid] = -1
+        self._open_cells[:] = open_cells.tobytes()
+
+        # Seed the affected walkable cells from their valid neighbours
+        padded_width = self.shape[1] + 2
+        offsets = np.array([-padded_width, padded_width, -1, 1], dtype=np.int32)
+        seeds = np.flatnonzero((invalid | opened) & (open_cells != 0)).astype(np.int32)
+        neighbours = seeds[:, np.newaxis] + offsets
+        neighbour_distances = distances[neighbours]
+        neighbour_distances = np.where(neighbour_distances >= 0, neighbour_distances, np.iinfo(np.int32).max)
+        closest = np.argmin(neighbour_distances, axis=1)
+        seed_distances = neighbour_distances[np.arange(len(seeds)), closest]
+        has_path = seed_distances < np.iinfo(np.int32).max
+        seeds = seeds[has_path]
+        seed_distances = seed_distances[has_path] + 1
+        distances[seeds] = seed_distances
+        predecessors[seeds] = neighbours[has_path, closest[has_path]]
+
+        order = np.argsort(seed_distances, kind='stable')
+        self._propagate(seeds[order].tolist(), seed_distances[order].tolist())
+        self.repairs += 1
+        return True
+
+    def _move_source(self, start: int, prev_start: int) -> None:
+        # A grid is bipartite, so after a single step every distance changes by
+        # exactly one: cells with a shortest path via the new source get one
+        # step closer, all others one step further away.
+        # Both groups are searched for in lockstep along the shortest paths,
+        # the first search to finish determines the split.
+        distances = self._distances
+        padded_width = self.shape[1] + 2
+        offsets = (-padded_width, padded_width, -1, 1)
+
+        closer = bytearray(len(distances))
+        closer[start] = 1
+        closer_queue = array('i', [start])
+        closer_head = 0
+
+        further = bytearray(len(distances))
+        further[prev_start] = 1
+        further_queue = array('i', [prev_start])
+        further_head = 0
+
+        while closer_head < len(closer_queue) and further_head < len(further_queue):
+            # Every cell on a shortest path from the new source is closer
+            cur = closer_queue[closer_head]
+            closer_head += 1
+            next_dist = distances[cur] + 1
+            for offset in offsets:
+                next_cell = cur + offset
+                if distances[next_cell] == next_dist and not closer[next_cell]:
+                    closer[next_cell] = 1
+                    closer_queue.append(next_cell)
+
+            # A cell is further away only if all of its shortest paths are
+            cur = further_queue[further_head]
+            further_head += 1
+            next_dist = distances[cur] + 1
+            for offset in offsets:
+                next_cell = cur + offset
+                if distances[next_cell] == next_dist and not further[next_cell] and next_cell != start:
+                    if all(distances[next_cell + o] != next_dist - 1 or further[next_cell + o] for o in offsets):
+                        further[next_cell] = 1
+                        further_queue.append(next_cell)
+
+        distances = self._distances_np
+        predecessors = self._predecessors_np
+        reachable = distances >= 0
+        if closer_head == len(closer_queue):
+            closer = np.frombuffer(closer, dtype=bool)
+        else:
+            closer = reachable & ~np.frombuffer(further, dtype=bool)
+
+        # Cells further away can keep their predecessor, as that is further away too.
+        # Cells closer by need a predecessor that is closer by as well.
+        closer_cells = np.flatnonzero(closer)
+        closer_cells = closer_cells[closer_cells != start]
+        needs_fix = closer_cells[~closer[predecessors[closer_cells]]]
+
+        distances[reachable] += 1
+        distances[closer] -= 2
+        predecessors[start] = -1
+        predecessors[prev_start] = start
+
+        offsets = np.array(offsets, dtype=np.int32)
+        neighbours = needs_fix[:, np.newaxis] + offsets
+        is_parent = closer[neighbours] & (distances[neighbours] == distances[needs_fix][:, np.newaxis] - 1)
+        predecessors[needs_fix] = neighbours[np.arange(len(needs_fix)), np.argmax(is_parent, axis=1)]
+
+        # The old source can be walked through now, the new one is occupied by the player
+        self._open_cells[prev_start] = 1
+        self._open_cells[start] = 0
+
+    def _propagate(self, seeds: list[int], seed_distances: list[int]) -> None:
+        # Breadth first search from seeds with different start distances.
+        # Seeds are sorted, and cells pushed on the queue are in order too,
+        # so merging both gives the cells in order of increasing distance.
+        open_cells = self._open_cells
+        distances = self._distances
+        predecessors = self._predecessors
+        padded_width = self.shape[1] + 2
+        north, south, west, east = -padded_width, padded_width, -1, 1
+
+        queue = array('i')
+        queue_distances = array('i')
+        head = 0
+        seed_index = 0
+        while head < len(queue) or seed_index < len(seeds):
+            if seed_index < len(seeds) and (head >= len(queue) or seed_distances[seed_index] <= queue_distances[head]):
+                cur = seeds[seed_index]
+                cur_dist = seed_distances[seed_index]
+                seed_index += 1
+            else:
+                cur = queue[head]
+                cur_dist = queue_distances[head]
+                head += 1
+
+            # Skip cells that got a shorter distance after being queued
+            if distances[cur] != cur_dist: continue
+
+            next_dist = cur_dist + 1
+            for offset in (north, south, west, east):
+                next_cell = cur + offset
+                if open_cells[next_cell]:
+                    dist = distances[next_cell]
+                    if dist < 0 or next_dist < dist:
+                        distances[next_cell] = next_dist
+                        predecessors[next_cell] = cur
+                        queue.append(next_cell)
+                        queue_distances.append(next_dist)
@@ -0,0 +1,97 @@
+import numpy as np
+from bitboard import BitPlanes
+from arena import BufferArena
+
+# The neighbours of an unknown cell in the order the scan of closest() looks at them
+_scan_order = ((0, -1), (0, 1), (-1, 0), (1, 0))
+
+
+class Frontier:
+    # Known empty cells next to unknown cells, as a bit plane that is kept up
+    # to date across ticks. Only the rows around the cells that changed are
+    # looked at again, as a cell can only enter or leave the frontier when
+    # it or one of its neighbours changed.
+    # Targets are ranked by the distance field of a player, so no extra
+    # search is needed. The candidates are unpacked into a buffer of the
+    # arena, when given.
+
+    def __init__(self, planes: BitPlanes, arena: BufferArena|None = None):
+        self.planes = planes
+        self.arena = arena
+        self.cells = planes.frontier()
+
+    def update(self, changes: np.ndarray[np.intp]) -> None:
+        # Changes are (N, 2) positions, planes must have been updated already
+        if len(changes) == 0: return
+        planes = self.planes
+        first_row = max(int(changes[:, 0].min()) - 1, 0)
+        last_row = min(int(changes[:, 0].max()) + 1, planes.height - 1)
+        band = ((1 << ((last_row - first_row + 1) * planes.stride)) - 1) << (first_row * planes.stride)
+        self.cells = (self.cells & ~band) | (planes.frontier() & band)
+
+    def __len__(self) -> int:
+        return self.cells.bit_count()
+
+    def mask(self) -> np.ndarray[bool]:
+        return self.planes.mask(self.cells)
+
+    def _candidates(self, distances: np.ndarray[np.int32], blocked: np.ndarray[bool]|None) -> np.ndarray[bool]:
+        cells = self.cells
+        if blocked is not None:
+            # Blocked cells count as walls, so unknown cells behind them do not make a frontier
+            planes = self.planes
+            open_cells = ~planes.pack(blocked)
+            cells &= open_cells & planes.any_neighbour(planes['unknown'] & open_cells)
+        if self.arena is None:
+            return self.planes.mask(cells) & (distances >= 0)
+        candidates = self.planes.mask(cells, self.arena.get('frontier_mask', bool))
+        candidates &= distances >= 0
+        return candidates
+
+    def closest(self, distances: np.ndarray[np.int32], blocked: np.ndarray[bool]|None = None) -> tuple[int,int]|None:
+        # The same choice as a scan over the unknown cells in row-major order,
+        # that takes the first of the west, east, north and south neighbours
+        # of each that is a reachable frontier cell, and keeps the first one
+        # with the lowest distance. That is not always the closest frontier cell.
+        candidates = self._candidates(distances, blocked)
+        planes = self.planes
+        unknown = planes['unknown'] & planes.any_neighbour(self.cells)
+        if blocked is not None:
+            unknown &= ~planes.pack(blocked)
+        ys, xs = np.nonzero(planes.mask(unknown))
+        if len(ys) == 0: return None
+
+        no_path = np.iinfo(np.int32).max
+        height, width = distances.shape
+        padded = np.full((height+2, width+2), no_path, dtype=np.int32)
+        np.copyto(padded[1:-1, 1:-1], distances, where=candidates)
+        neighbour_distances = np.stack([padded[ys+1+dy, xs+1+dx] for dy, dx in _scan_order])
+        first = np.argmax(neighbour_distances < no_path, axis=0)
+        scan_distances = neighbour_distances[first, np.arange(len(ys))]
+        index = int(np.argmin(scan_distances))
+        if scan_distances[index] == no_path: return None
+        dy, dx = _scan_order[first[index]]
+        return (int(ys[index]) + dy, int(xs[index]) + dx)
+
+    def information_gain(self, visibility_range: int) -> np.ndarray[np.int32]:
+        # Number of unknown cells in the square of visibility_range around every cell,
+        # an upper bound of what would be revealed by standing there
+        unknown = self.planes.mask('unknown').astype(np.int32)
+        height, width = unknown.shape
+        integral = np.zeros((height+1, width+1), dtype=np.int32)
+        integral[1:, 1:] = unknown.cumsum(axis=0).cumsum(axis=1)
+        ys = np.arange(height)
+        xs = np.arange(width)
+        top = np.clip(ys - visibility_range, 0, height)[:, np.newaxis]
+        bottom = np.clip(ys + visibility_range + 1, 0, height)[:, np.newaxis]
+        left = np.clip(xs - visibility_range, 0, width)[np.newaxis, :]
+        right = np.clip(xs + visibility_range + 1, 0, width)[np.newaxis, :]
+        return integral[bottom, right] - integral[top, right] - integral[bottom, left] + integral[top, left]
+
+    def most_informative(self, distances: np.ndarray[np.int32], visibility_range: int, blocked: np.ndarray[bool]|None = None) -> tuple[int,int]|None:
+        # The reachable frontier cell that reveals the most unknown cells per step
+        candidates = self._candidates(distances, blocked)
+        if not np.any(candidates): return None
+        # Only divided where reachable, unreachable cells have a distance of -1
+        score = np.divide(self.information_gain(visibility_range), distances + 1.0, out=np.full(distances.shape, -1.0), where=candidates)
+        return divmod(int(np.argmax(score)), distances.shape[1])
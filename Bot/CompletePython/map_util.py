@@ -2,6 +2,8 @@ import numpy as np
 import matplotlib.pyplot as plt
 from IPython.display import clear_output, display
 import swoq_pb2
+from distance_field import compute_distance_field, DistanceMap, PathMap
+from bitboard import plane_tiles
 
 _cell_colors = {
     swoq_pb2.TILE_UNKNOWN:              [  0,   0,   0],
@@ -26,13 +28,22 @@ _cell_colors = {
     swoq_pb2.TILE_TREASURE:             [255, 255, 255],
 }
 
-def get_map_image(game_map: np.ndarray[np.int8]) -> np.ndarray[np.float32]:
-    height, width = game_map.shape
-    map_img = np.zeros((height, width, 3), dtype=np.float32)
-    for y in range(height):
-        for x in range(width):
-            map_img[y, x] = (np.array(_cell_colors[game_map[y, x]]) / 255).astype(np.float32)
-    return map_img
+# Colors of all tiles, indexed by tile value
+_palette = np.zeros((max(_cell_colors.keys())+1, 3), dtype=np.float32)
+for tile, color in _cell_colors.items():
+    _palette[tile] = np.array(color, dtype=np.float32) / 255
+
+
+def get_map_image(game_map: np.ndarray[np.int8], out: np.ndarray[np.float32]|None=None, changes: np.ndarray[np.intp]|None=None) -> np.ndarray[np.float32]:
+    # Changes are (N, 2) positions, when given only those are rendered into out
+    if out is None:
+        return _palette[game_map]
+    if changes is None:
+        np.take(_palette, game_map, axis=0, out=out)
+    else:
+        ys, xs = changes[:, 0], changes[:, 1]
+        out[ys, xs] = _palette[game_map[ys, xs]]
+    return out
 
 
 def plot_map(game_map):
@@ -44,23 +55,62 @@ def plot_map(game_map):
     plt.show()
     return (fig, img)
 
-def update_map(frame, game_map):
-    map_img = get_map_image(game_map)
+def update_map(frame, game_map, map_img=None, changes=None):
+    # When the image of the previous update is given, only the changes are rendered into it
+    if map_img is None:
+        map_img = get_map_image(game_map)
+    else:
+        map_img = get_map_image(game_map, map_img, changes)
 
     fig, img = frame
     img.set_data(map_img)
     clear_output(wait=True)
     display(fig)
+    return map_img
+
+
+def merge_surroundings(game_map: np.ndarray[np.int8], surroundings, center: tuple[int,int], visibility_range: int) -> tuple[slice,slice]|None:
+    if len(surroundings) == 0: return None
+
+    # Single copy of the repeated field into a square window around the center
+    size = visibility_range*2 + 1
+    window = np.array(surroundings, dtype=np.int8).reshape(size, size)
+
+    # Clip the window to the map
+    height, width = game_map.shape
+    top = center[0] - visibility_range
+    left = center[1] - visibility_range
+    map_top, map_left = max(top, 0), max(left, 0)
+    map_bottom, map_right = min(top + size, height), min(left + size, width)
+    if map_top >= map_bottom or map_left >= map_right: return None
+
+    window = window[map_top-top:map_bottom-top, map_left-left:map_right-left]
+    region = (slice(map_top, map_bottom), slice(map_left, map_right))
+
+    # Unknown tiles do not overwrite what was seen before
+    np.copyto(game_map[region], window, where=window != swoq_pb2.TILE_UNKNOWN)
+    return region
+
+
+def changed_cells(prev_map: np.ndarray[np.int8], game_map: np.ndarray[np.int8], regions: list[tuple[slice,slice]], positions: list[tuple[int,int]]) -> np.ndarray[np.intp]:
+    # Positions (N, 2) that differ between both maps, only looking at the given regions and positions
+    width = game_map.shape[1]
+    changes = []
+    for region in regions:
+        y, x = np.nonzero(prev_map[region] != game_map[region])
+        changes.append((y + region[0].start) * width + (x + region[1].start))
+    changes.append(np.array([y * width + x for y, x in positions if prev_map[y, x] != game_map[y, x]], dtype=np.intp))
+    changes = np.unique(np.concatenate(changes))
+    return np.stack(np.divmod(changes, width), axis=1)
+
+
+# Walls, closed doors, boulders and unknown tiles, indexed by tile value
+_wall_tiles = np.zeros(max(swoq_pb2.Tile.values())+1, dtype=bool)
+_wall_tiles[plane_tiles['wall']] = True
 
 
 def is_wall(game_map: np.ndarray[np.int8], pos: tuple[int,int]) -> bool:
-    cell = game_map[pos[0], pos[1]]
-    return cell == swoq_pb2.TILE_WALL or \
-        cell == swoq_pb2.TILE_DOOR_RED or \
-        cell == swoq_pb2.TILE_DOOR_GREEN or \
-        cell == swoq_pb2.TILE_DOOR_BLUE or \
-        cell == swoq_pb2.TILE_BOULDER or \
-        cell == swoq_pb2.TILE_UNKNOWN
+    return bool(_wall_tiles[game_map[pos[0], pos[1]]])
 
 
 def compute_distances(game_map: np.ndarray[np.int8], from_pos: tuple[int,int], exclude_cells: set[int]=None) -> tuple[dict, dict]:
@@ -100,46 +150,24 @@ def compute_distances(game_map: np.ndarray[np.int8], from_pos: tuple[int,int], e
     return distances, paths
 
 
-def compute_distances_quick(game_map: np.ndarray[np.int8], from_pos: tuple[int,int]) -> tuple[dict, dict]:
-    height, width = game_map.shape
-
-    todo = []
-    distances = {}
-    paths = {}
-
-    todo.append(from_pos)
-    distances[from_pos] = 0
-
-    def enqueue(cur_pos, cur_dist, next_pos):
-        nonlocal game_map, distances, todo, paths
-        if next_pos not in distances and game_map[next_pos[0], next_pos[1]] == swoq_pb2.TILE_EMPTY:
-            distances[next_pos] = cur_dist + 1
-            paths[next_pos] = cur_pos
-            todo.append(next_pos)
-
-    while todo:
-        cur_y, cur_x = cur_pos = todo[0]
-        cur_dist = distances[cur_pos]
-        del todo[0]
-
-        if cur_y > 0: enqueue(cur_pos, cur_dist, (cur_y-1, cur_x))
-        if cur_y < height-1: enqueue(cur_pos, cur_dist, (cur_y+1, cur_x))
-        if cur_x > 0: enqueue(cur_pos, cur_dist, (cur_y, cur_x-1))
-        if cur_x < width-1: enqueue(cur_pos, cur_dist, (cur_y, cur_x+1))
-
-    return distances, paths
+def compute_distances_quick(game_map: np.ndarray[np.int8], from_pos: tuple[int,int]) -> tuple[DistanceMap, PathMap]:
+    distances, predecessors = compute_distance_field(game_map, from_pos)
+    return DistanceMap(distances, predecessors), PathMap(predecessors)
 
 
-def get_direction_towards(paths: dict, from_pos: tuple[int,int], to_pos: tuple[int,int]) -> str:
+def get_direction_towards(paths: dict|PathMap, from_pos: tuple[int,int], to_pos: tuple[int,int]) -> str:
     if to_pos not in paths: return None
 
     # Get first step in path towards target
-    cur = to_pos
-    prev = None
-    while cur != from_pos:
-        prev = cur
-        cur = paths[cur]
-    next_pos = prev
+    if isinstance(paths, PathMap):
+        next_pos = paths.next_step(from_pos, to_pos)
+    else:
+        cur = to_pos
+        prev = None
+        while cur != from_pos:
+            prev = cur
+            cur = paths[cur]
+        next_pos = prev
     assert(next_pos is not None)
 
     diff_y = next_pos[0] - from_pos[0]
@@ -0,0 +1,73 @@
+import numpy as np
+import swoq_pb2
+
+
+class MapView:
+    # The map with stacked blocking overlays on top, blocked cells count as
+    # walls. The map itself is never copied or changed, overlays are only
+    # kept as rectangles and cell lists and are combined into a mask when
+    # it is asked for, once per set of overlays.
+    # Pathfinding, the tile index and the nearest targets take the mask and
+    # leave the blocked cells out, so the distance fields are not searched
+    # again. In those only the blocked cells are marked unreachable.
+
+    def __init__(self, game_map: np.ndarray[np.int8]):
+        self.map = game_map
+        self.height, self.width = game_map.shape
+        self.overlays = []
+        self._blocked = None
+
+    def __bool__(self) -> bool:
+        return len(self.overlays) > 0
+
+    def block_rect(self, top: int, left: int, bottom: int, right: int) -> 'MapView':
+        # Rows top up to bottom and columns left up to right, exclusive, clipped to the map
+        top, left = max(top, 0), max(left, 0)
+        bottom, right = min(bottom, self.height), min(right, self.width)
+        if top < bottom and left < right:
+            self.overlays.append((slice(top, bottom), slice(left, right)))
+            self._blocked = None
+        return self
+
+    def block_box(self, center: tuple[int,int], radius: int) -> 'MapView':
+        # All cells within radius steps in both directions, like the visibility range
+        y, x = center
+        return self.block_rect(y - radius, x - radius, y + radius + 1, x + radius + 1)
+
+    def block_cells(self, cells) -> 'MapView':
+        # Positions as (y, x), positions outside the map are ignored
+        cells = np.asarray(cells, dtype=np.intp).reshape(-1, 2)
+        inside = (cells[:, 0] >= 0) & (cells[:, 0] < self.height) & (cells[:, 1] >= 0) & (cells[:, 1] < self.width)
+        cells = cells[inside]
+        if len(cells) > 0:
+            self.overlays.append((cells[:, 0], cells[:, 1]))
+            self._blocked = None
+        return self
+
+    def pop(self) -> None:
+        # Removes the last overlay
+        self.overlays.pop()
+        self._blocked = None
+
+    def clear(self) -> None:
+        self.overlays.clear()
+        self._blocked = None
+
+    @property
+    def blocked(self) -> np.ndarray[bool]|None:
+        # None when nothing is blocked, so callers can skip the mask altogether
+        if not self.overlays: return None
+        if self._blocked is None:
+            blocked = np.zeros((self.height, self.width), dtype=bool)
+            for index in self.overlays:
+                blocked[index] = True
+            self._blocked = blocked
+        return self._blocked
+
+    def is_blocked(self, pos: tuple[int,int]) -> bool:
+        blocked = self.blocked
+        return blocked is not None and bool(blocked[pos])
+
+    def tile(self, pos: tuple[int,int]) -> int:
+        # The tile as seen through the overlays
+        return swoq_pb2.TILE_WALL if self.is_blocked(pos) else int(self.map[pos])
@@ -0,0 +1,174 @@
+import os
+import socket
+import sys
+from bisect import bisect_left
+from collections import Counter
+from functools import wraps
+from time import monotonic, perf_counter_ns
+
+# The strategy routines of GamePlayer, in the order of the chain in plan
+strategy_routines = (
+    'store_plate_door_positions', 'handle_level20',
+    'move_to_exit', 'pickup_health', 'pickup_sword', 'pickup_keys_or_open_doors',
+    'attack', 'crush_with_door', 'explore', 'move_to_pressure_plate',
+    'wait_at_pressure_plate_door_1', 'wait_at_pressure_plate_door_2',
+    'pickup_boulder', 'wait_at_random_door', 'pickup_treasure',
+    'level21_place_boulder', 'level21_wait_at_plate_1', 'level21_wait_at_plate_2',
+    'step_level20', 'step_level21', 'step_level22', 'random_walk',
+)
+
+# Upper bounds of the histogram buckets, in seconds
+buckets = (1e-5, 2.5e-5, 5e-5, 1e-4, 2.5e-4, 5e-4, 1e-3, 2.5e-3, 5e-3, 1e-2, 2.5e-2, 5e-2, 0.1, 0.25, 0.5, 1.0)
+_bucket_ns = tuple(int(b * 1e9) for b in buckets)
+
+
+class Histogram:
+
+    def __init__(self):
+        self.counts = [0] * (len(buckets) + 1)
+        self.total_ns = 0
+
+
+    def add(self, duration_ns:int) -> None:
+        self.counts[bisect_left(_bucket_ns, duration_ns)] += 1
+        self.total_ns += duration_ns
+
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+
+def max_rss_kb() -> int|None:
+    # Peak resident set size of this process
+    try:
+        import resource
+    except ImportError:
+        return None # not available on Windows
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss
+
+
+def prometheus_file(path:str):
+    # Written for the textfile collector of the node exporter, replaced atomically
+    def sink(text:str) -> None:
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(text)
+        os.replace(tmp, path)
+    return sink
+
+
+def udp_socket(host:str='localhost', port:int=9125):
+    # Every export is sent as a single datagram
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    def sink(text:str) -> None:
+        try:
+            sock.sendto(text.encode(), (host, port))
+        except OSError:
+            pass # nobody listening, or too large
+    return sink
+
+
+class Metrics:
+
+    # Times the strategy routines and the act round trip, and counts the routine
+    # that decided the action of each player. Only a player that is given a
+    # Metrics is instrumented, without one nothing is wrapped or counted.
+    def __init__(self, sinks:list=(), export_interval:float=10.0, labels:dict[str,str]|None=None):
+        self.sinks = list(sinks)
+        self.export_interval = export_interval
+        self.labels = labels or {}
+        self.timers = {}
+        self.decided_by = Counter()
+        self.round_trip = Histogram()
+        self.ticks = 0
+        self._next_export = monotonic() + export_interval
+
+
+    def instrument(self, player) -> None:
+        # The routines that decided the actions of the current tick, per player,
+        # so players can share a Metrics
+        player._decided_by = [None, None]
+        # Instance attributes take precedence over the methods of the class
+        for name in strategy_routines:
+            setattr(player, name, self._timed(player, name, getattr(player, name)))
+
+
+    def _timed(self, player, name:str, method):
+        timer = self.timers.setdefault(name, Histogram())
+        decided = player._decided_by
+
+        @wraps(method)
+        def wrapper(*args, **kwargs):
+            undecided1 = player.action1 is None
+            undecided2 = player.action2 is None
+            start = perf_counter_ns()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                timer.add(perf_counter_ns() - start)
+                # Nested routines return first, so the innermost one is credited
+                if undecided1 and player.action1 is not None and decided[0] is None: decided[0] = name
+                if undecided2 and player.action2 is not None and decided[1] is None: decided[1] = name
+        return wrapper
+
+
+    def add_act(self, player, duration_ns:int) -> None:
+        self.round_trip.add(duration_ns)
+        self.ticks += 1
+        decided = player._decided_by
+        for i, name in enumerate(decided):
+            if name is not None:
+                self.decided_by[(i+1, name)] += 1
+                decided[i] = None
+        if self.sinks and monotonic() >= self._next_export:
+            self.export()
+
+
+    def export(self) -> None:
+        self._next_export = monotonic() + self.export_interval
+        text = self.to_prometheus()
+        for sink in self.sinks:
+            sink(text)
+
+
+    def _labels(self, **extra) -> str:
+        labels = {**self.labels, **extra}
+        if not labels: return ''
+        return '{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}'
+
+
+    def _histogram_lines(self, metric:str, histogram:Histogram, **labels) -> list[str]:
+        lines = []
+        cumulative = 0
+        for bound, count in zip(buckets, histogram.counts):
+            cumulative += count
+            lines.append(f'{metric}_bucket{self._labels(**labels, le=repr(bound))} {cumulative}')
+        cumulative += histogram.counts[-1]
+        lines.append(f'{metric}_bucket{self._labels(**labels, le="+Inf")} {cumulative}')
+        lines.append(f'{metric}_sum{self._labels(**labels)} {histogram.total_ns / 1e9}')
+        lines.append(f'{metric}_count{self._labels(**labels)} {cumulative}')
+        return lines
+
+
+    def to_prometheus(self) -> str:
+        lines = ['# TYPE swoq_bot_ticks_total counter', f'swoq_bot_ticks_total{self._labels()} {self.ticks}']
+
+        lines.append('# TYPE swoq_bot_act_seconds histogram')
+        lines.extend(self._histogram_lines('swoq_bot_act_seconds', self.round_trip))
+
+        lines.append('# TYPE swoq_bot_routine_seconds histogram')
+        for name, timer in self.timers.items():
+            if timer.count:
+                lines.extend(self._histogram_lines('swoq_bot_routine_seconds', timer, routine=name))
+
+        rss = max_rss_kb()
+        if rss is not None:
+            lines.append('# TYPE swoq_bot_max_rss_bytes gauge')
+            lines.append(f'swoq_bot_max_rss_bytes{self._labels()} {rss * 1024}')
+
+        lines.append('# TYPE swoq_bot_decided_total counter')
+        for (player, name), count in sorted(self.decided_by.items()):
+            lines.append(f'swoq_bot_decided_total{self._labels(player=player, routine=name)} {count}')
+        return '\n'.join(lines) + '\n'
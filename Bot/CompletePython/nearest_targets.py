@@ -0,0 +1,99 @@
+import numpy as np
+import swoq_pb2
+from distance_field import compute_target_field
+from tile_index import TileIndex
+from bitboard import BitPlanes
+from arena import BufferArena
+
+_directions = (('N', -1, 0), ('S', 1, 0), ('W', 0, -1), ('E', 0, 1))
+
+
+def _frontier_mask(game_map: np.ndarray[np.int8], blocked: np.ndarray[bool]|None = None) -> np.ndarray[bool]:
+    # Empty cells with at least one unknown neighbor, blocked cells are neither
+    unknown = np.zeros((game_map.shape[0]+2, game_map.shape[1]+2), dtype=bool)
+    unknown[1:-1, 1:-1] = game_map == swoq_pb2.TILE_UNKNOWN
+    empty = game_map == swoq_pb2.TILE_EMPTY
+    if blocked is not None:
+        unknown[1:-1, 1:-1] &= ~blocked
+        empty &= ~blocked
+    has_unknown = unknown[:-2, 1:-1] | unknown[2:, 1:-1] | unknown[1:-1, :-2] | unknown[1:-1, 2:]
+    return empty & has_unknown
+
+
+def _clearing_mask(game_map: np.ndarray[np.int8], blocked: np.ndarray[bool]|None = None) -> np.ndarray[bool]:
+    # Empty cells with only empty neighbors, blocked cells are not empty
+    empty = np.zeros((game_map.shape[0]+2, game_map.shape[1]+2), dtype=bool)
+    empty[1:-1, 1:-1] = game_map == swoq_pb2.TILE_EMPTY
+    if blocked is not None:
+        empty[1:-1, 1:-1] &= ~blocked
+    return empty[1:-1, 1:-1] & empty[:-2, 1:-1] & empty[2:, 1:-1] & empty[1:-1, :-2] & empty[1:-1, 2:]
+
+
+class NearestTargets:
+    # Finds the closest target of a kind for any player position.
+    # A kind is a single tile value, a name from tile_index.kind_tiles,
+    # 'frontier' (empty cells next to unknown cells) or 'clearing' (empty
+    # cells surrounded by empty cells).
+    # Per kind one search from all targets at once is done, and cached, after
+    # which each query only has to look at the neighbors of the player.
+    # Bit planes of the same map, when given, are used for the frontier and
+    # clearing masks.
+    # Blocked cells, when given, count as walls. They are neither targets
+    # nor walked through.
+    # With an arena the fields are written into its buffers, which the
+    # targets of an earlier map share.
+
+    def __init__(self, game_map: np.ndarray[np.int8], tiles: TileIndex|None = None, planes: BitPlanes|None = None, blocked: np.ndarray[bool]|None = None,
+                 arena: BufferArena|None = None):
+        self.map = game_map
+        self.blocked = blocked
+        self.arena = arena
+        self.tiles = tiles if tiles is not None and tiles.blocked is blocked else TileIndex(game_map, blocked)
+        # The planes do not know about blocked cells
+        self.planes = planes if planes is not None and planes.map is game_map and blocked is None else None
+        self._fields = {}
+
+    def target_mask(self, kind: str|int, out: np.ndarray[bool]|None = None) -> np.ndarray[bool]:
+        if kind == 'frontier':
+            return self.planes.mask(self.planes.frontier(), out) if self.planes is not None else _frontier_mask(self.map, self.blocked)
+        if kind == 'clearing':
+            return self.planes.mask(self.planes.clearing(), out) if self.planes is not None else _clearing_mask(self.map, self.blocked)
+        return self.tiles.mask(kind, out=out)
+
+    def _field(self, kind: str|int) -> tuple[np.ndarray[np.int32], np.ndarray[np.int32]]:
+        if kind not in self._fields:
+            if self.arena is None:
+                self._fields[kind] = compute_target_field(self.map, self.target_mask(kind), self.blocked)
+            else:
+                arena = self.arena
+                targets = self.target_mask(kind, arena.get('target_mask', bool))
+                out = arena.get(f'target_distances_{kind}'), arena.get(f'target_origins_{kind}')
+                self._fields[kind] = compute_target_field(self.map, targets, self.blocked, out)
+        return self._fields[kind]
+
+    def closest(self, kind: str|int, from_pos: tuple[int,int]) -> tuple[tuple[int,int]|None, str|None, int|None]:
+        distances, origins = self._field(kind)
+        height, width = distances.shape
+        pos_y, pos_x = from_pos
+
+        # The best first step is the neighbor that is closest to a target.
+        # Every cell has the first target in row-major order of the closest
+        # ones as origin, so among equally close neighbors the smallest origin
+        # is the first target a row-major scan of all targets would find.
+        min_dist = None
+        min_dir = None
+        min_origin = None
+        for dir, dy, dx in _directions:
+            y, x = pos_y + dy, pos_x + dx
+            if 0 <= y < height and 0 <= x < width:
+                dist = distances[y, x]
+                if dist >= 0 and (min_dist is None or dist < min_dist or (dist == min_dist and origins[y, x] < min_origin)):
+                    min_dist = dist
+                    min_dir = dir
+                    min_origin = origins[y, x]
+
+        if min_dist is None:
+            return None, None, None
+
+        target = (int(min_origin) // width, int(min_origin) % width)
+        return target, min_dir, int(min_dist) + 1
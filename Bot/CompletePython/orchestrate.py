@@ -0,0 +1,173 @@
+import multiprocessing as mp
+import numpy as np
+import os
+import queue
+import sys
+import swoq_pb2
+from collections import defaultdict
+from time import monotonic, sleep
+import random_train
+import play_quest
+from metrics import max_rss_kb
+
+
+def uniform_levels(rng:np.random.Generator) -> int:
+    return int(rng.integers(23))
+
+
+class WeightedLevels:
+
+    # Picks level i with a chance proportional to weights[i]
+    def __init__(self, weights:list[float]):
+        self.p = np.asarray(weights, dtype=np.float64) / np.sum(weights)
+
+
+    def __call__(self, rng:np.random.Generator) -> int:
+        return int(rng.choice(len(self.p), p=self.p))
+
+
+def worker_users(users:list[tuple[str,str]], worker_index:int, num_workers:int) -> list[tuple[str,str]]:
+    # Every worker gets its own users, unless there are fewer users than workers
+    if len(users) >= num_workers:
+        return users[worker_index::num_workers]
+    return [users[worker_index % len(users)]]
+
+
+def worker(mode:str, worker_index:int, users:list[tuple[str,str]], schedule, stats_queue:mp.Queue, max_rss_mb:float|None=None) -> None:
+    rng = np.random.default_rng()
+    while True:
+        user_id, user_name = users[rng.integers(len(users))]
+        level = schedule(rng) if mode == 'train' else None
+        start = monotonic()
+        try:
+            if mode == 'train':
+                status, level_ticks = random_train.train(user_id, user_name, level)
+            else:
+                status, level_ticks = play_quest.quest(user_id, user_name)
+        except Exception as e:
+            print(f'Worker {worker_index}: game failed: {e}')
+            stats_queue.put((worker_index, level, None, {}, monotonic() - start, max_rss_kb()))
+            sleep(1) # do not hammer an unavailable server
+            continue
+        rss = max_rss_kb()
+        stats_queue.put((worker_index, level, status, level_ticks, monotonic() - start, rss))
+
+        # A fresh process gives all memory back, the worker is restarted by run
+        if max_rss_mb is not None and rss is not None and rss > max_rss_mb * 1024:
+            print(f'Worker {worker_index}: max rss {rss // 1024}MB, recycling')
+            return
+
+
+class Stats:
+
+    def __init__(self):
+        self.start = monotonic()
+        self.games = 0
+        self.wins = 0
+        self.errors = 0
+        self.restarts = 0
+        self.recycles = 0
+        self.level_games = defaultdict(int)
+        self.level_wins = defaultdict(int)
+        self.level_ticks = defaultdict(int)
+        self.level_count = defaultdict(int)
+        self.worker_rss_kb = {}
+
+
+    def add(self, level:int|None, status:int|None, level_ticks:dict[int,int], duration:float) -> None:
+        # Failed games are only counted as errors, they have no status
+        if status is None:
+            self.errors += 1
+            return
+        won = status == swoq_pb2.GAME_STATUS_FINISHED_SUCCESS
+        self.games += 1
+        self.wins += won
+        if level is not None:
+            self.level_games[level] += 1
+            self.level_wins[level] += won
+        for played_level, ticks in level_ticks.items():
+            self.level_ticks[played_level] += ticks
+            self.level_count[played_level] += 1
+
+
+    def report(self) -> str:
+        elapsed = monotonic() - self.start
+        lines = [f'games={self.games} ({self.games / elapsed:.2f}/s), win rate={self.wins / max(self.games, 1):.1%}, errors={self.errors}, restarts={self.restarts}, recycles={self.recycles}']
+        if self.worker_rss_kb:
+            lines.append(f' max rss per worker={max(self.worker_rss_kb.values()) // 1024}MB')
+        for level in sorted(self.level_count):
+            line = f' level {level}: mean ticks={self.level_ticks[level] / self.level_count[level]:.1f}'
+            if self.level_games[level]:
+                line += f', win rate={self.level_wins[level] / self.level_games[level]:.1%}'
+            lines.append(line)
+        return '\n'.join(lines)
+
+
+def restart_exited(processes:list[mp.Process], start_worker, stats:Stats) -> None:
+    # Workers exit with code 0 when they recycle themselves at the rss limit, any other exit is a crash
+    for i, p in enumerate(processes):
+        if p.is_alive(): continue
+        if p.exitcode == 0:
+            stats.recycles += 1
+        else:
+            print(f'Worker {i} exited with code {p.exitcode}, restarting')
+            stats.restarts += 1
+        processes[i] = start_worker(i)
+
+
+def run(mode:str, users:list[tuple[str,str]], num_workers:int|None=None, schedule=uniform_levels, report_interval:float=30.0, max_games:int|None=None,
+        max_rss_mb:float|None=None) -> Stats:
+    assert(mode in ('train', 'quest'))
+    num_workers = num_workers or os.cpu_count()
+
+    # Spawn, gRPC does not survive forking
+    ctx = mp.get_context('spawn')
+    stats_queue = ctx.Queue()
+    stats = Stats()
+
+    def start_worker(worker_index:int) -> mp.Process:
+        p = ctx.Process(target=worker, args=(mode, worker_index, worker_users(users, worker_index, num_workers), schedule, stats_queue, max_rss_mb), daemon=True)
+        p.start()
+        return p
+
+    processes = [start_worker(i) for i in range(num_workers)]
+    next_report = monotonic() + report_interval
+    try:
+        while max_games is None or stats.games < max_games:
+            try:
+                worker_index, *result, rss = stats_queue.get(timeout=1.0)
+                stats.add(*result)
+                if rss is not None:
+                    stats.worker_rss_kb[worker_index] = rss
+            except queue.Empty:
+                pass
+
+            restart_exited(processes, start_worker, stats)
+
+            if monotonic() >= next_report:
+                print(stats.report())
+                next_report = monotonic() + report_interval
+    finally:
+        for p in processes:
+            p.terminate()
+        for p in processes:
+            p.join()
+
+    return stats
+
+
+def main() -> None:
+    mode = sys.argv[1] if len(sys.argv) > 1 else 'train'
+    num_workers = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    max_rss_mb = float(sys.argv[3]) if len(sys.argv) > 3 else None
+    if mode == 'train':
+        users = [(user_id, random_train.user_name) for user_id in random_train.user_ids]
+    else:
+        users = [(user_id, play_quest.user_name) for user_id in play_quest.user_ids]
+    if not all(user_name for _, user_name in users):
+        sys.exit('Set SWOQ_USER_NAME to the user name of the user ids')
+    run(mode, users, num_workers, max_rss_mb=max_rss_mb)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+from heapq import heappush, heappop
+import numpy as np
+import swoq_pb2
+
+_direction_names = {(-1, 0): 'N', (1, 0): 'S', (0, -1): 'W', (0, 1): 'E'}
+
+
+def _padded_open_cells(game_map: np.ndarray[np.int8], blocked: np.ndarray[bool]|None) -> bytearray:
+    # Walkable cells on a map padded with a border of non-walkable cells,
+    # without the temporarily blocked cells
+    height, width = game_map.shape
+    open_cells = np.zeros((height+2, width+2), dtype=np.uint8)
+    open_cells[1:-1, 1:-1] = game_map == swoq_pb2.TILE_EMPTY
+    if blocked is not None:
+        open_cells[1:-1, 1:-1][blocked] = 0
+    return bytearray(open_cells.tobytes())
+
+
+def _a_star(open_cells: bytearray, start: int, goal: int, padded_width: int) -> tuple[int,int]|None:
+    # First cell after the start and the length of a shortest path, with the
+    # Manhattan distance as heuristic. The goal itself does not have to be open.
+    offsets = (-padded_width, padded_width, -1, 1)
+    goal_y, goal_x = divmod(goal, padded_width)
+
+    def heuristic(cell: int) -> int:
+        y, x = divmod(cell, padded_width)
+        return abs(y - goal_y) + abs(x - goal_x)
+
+    # Ties are broken towards the longest path so far, which is the closest to
+    # the goal, otherwise open areas are searched almost completely
+    distances = {start: 0}
+    first_steps = {start: -1}
+    todo = [(heuristic(start), 0, start)]
+    while todo:
+        _, neg_dist, cur = heappop(todo)
+        dist = -neg_dist
+        if dist > distances[cur]: continue
+        next_dist = dist + 1
+        for offset in offsets:
+            next_cell = cur + offset
+            # With a consistent heuristic the first path found to the goal is a shortest one
+            if next_cell == goal:
+                return (next_cell if cur == start else first_steps[cur]), next_dist
+            if open_cells[next_cell] and next_dist < distances.get(next_cell, next_dist + 1):
+                distances[next_cell] = next_dist
+                first_steps[next_cell] = next_cell if cur == start else first_steps[cur]
+                heappush(todo, (next_dist + heuristic(next_cell), -next_dist, next_cell))
+    return None
+
+
+def _bidirectional_search(open_cells: bytearray, start: int, goal: int, padded_width: int) -> tuple[int,int]|None:
+    # Breadth first search from both ends, a level at a time from the smallest
+    # side, until they meet. The goal itself does not have to be open.
+    offsets = (-padded_width, padded_width, -1, 1)
+    start_distances = {start: 0}
+    first_steps = {start: -1}
+    goal_distances = {goal: 0}
+    start_level = [start]
+    goal_level = [goal]
+
+    while start_level and goal_level:
+        best = None
+        if len(start_level) <= len(goal_level):
+            next_level = []
+            for cur in start_level:
+                for offset in offsets:
+                    next_cell = cur + offset
+                    if next_cell in goal_distances:
+                        length = start_distances[cur] + 1 + goal_distances[next_cell]
+                        first = next_cell if cur == start else first_steps[cur]
+                        if best is None or length < best[1]: best = (first, length)
+                    elif open_cells[next_cell] and next_cell not in start_distances:
+                        start_distances[next_cell] = start_distances[cur] + 1
+                        first_steps[next_cell] = next_cell if cur == start else first_steps[cur]
+                        next_level.append(next_cell)
+            start_level = next_level
+        else:
+            next_level = []
+            for cur in goal_level:
+                for offset in offsets:
+                    next_cell = cur + offset
+                    if next_cell in start_distances:
+                        length = goal_distances[cur] + 1 + start_distances[next_cell]
+                        first = cur if next_cell == start else first_steps[next_cell]
+                        if best is None or length < best[1]: best = (first, length)
+                    elif open_cells[next_cell] and next_cell not in goal_distances:
+                        goal_distances[next_cell] = goal_distances[cur] + 1
+                        next_level.append(next_cell)
+            goal_level = next_level
+        if best is not None:
+            return best
+    return None
+
+
+def find_path(game_map: np.ndarray[np.int8], start: tuple[int,int], goal: tuple[int,int], blocked: np.ndarray[bool]|None = None, bidirectional: bool = False) -> tuple[str|None,int|None]:
+    # Direction of the first step and the length of a shortest path from start
+    # to goal over empty cells, not through the blocked cells. The goal can be
+    # any tile, the last step enters it. None, None when there is no path.
+    if start == goal: return None, 0
+    height, width = game_map.shape
+    if not (0 <= goal[0] < height and 0 <= goal[1] < width): return None, None
+
+    padded_width = width + 2
+    open_cells = _padded_open_cells(game_map, blocked)
+    start_cell = (start[0]+1) * padded_width + (start[1]+1)
+    goal_cell = (goal[0]+1) * padded_width + (goal[1]+1)
+    search = _bidirectional_search if bidirectional else _a_star
+    result = search(open_cells, start_cell, goal_cell, padded_width)
+    if result is None: return None, None
+
+    first_step, length = result
+    step_y, step_x = divmod(first_step, padded_width)
+    return _direction_names[(step_y - 1 - start[0], step_x - 1 - start[1])], length
@@ -1,9 +1,20 @@
-import grpc
 import swoq_pb2
-import swoq_pb2_grpc
 import numpy as np
+from collections import deque
 from map_util import *
-from time import sleep
+from distance_field import IncrementalDistanceField, DistanceMap, PathMap
+from nearest_targets import NearestTargets
+from tile_index import TileIndex
+from bitboard import BitPlanes
+from frontier import Frontier
+from map_view import MapView
+from replay import ReplayWriter
+from metrics import Metrics
+from channels import ChannelPool, default_target, shared_pool
+from player_view import PlayerView, decode_players
+from cell_set import CellSet
+from arena import BufferArena
+from time import sleep, monotonic, perf_counter_ns
 
 to_swoq_pb2_action = {
     'MN': swoq_pb2.DIRECTED_ACTION_MOVE_NORTH,
@@ -17,6 +28,14 @@ to_swoq_pb2_action = {
     None: None,
 }
 
+# Position change of a move that succeeds
+move_offsets = {
+    swoq_pb2.DIRECTED_ACTION_MOVE_NORTH: (-1, 0),
+    swoq_pb2.DIRECTED_ACTION_MOVE_EAST: (0, 1),
+    swoq_pb2.DIRECTED_ACTION_MOVE_SOUTH: (1, 0),
+    swoq_pb2.DIRECTED_ACTION_MOVE_WEST: (0, -1),
+}
+
 def find_random_pos(player_pos, player_distances) -> tuple[int,int]|None:
     positions = list(player_distances.keys())
     if player_pos in positions:
@@ -27,25 +46,109 @@ def find_random_pos(player_pos, player_distances) -> tuple[int,int]|None:
         return None
 
 
+# Exponential backoff with full jitter
+def backoff_delays(initial:float, maximum:float, factor:float=2.0):
+    delay = initial
+    while True:
+        yield np.random.uniform(0, delay)
+        delay = min(delay * factor, maximum)
+
+
+def _player_property(i:int, name:str) -> property:
+    # Read only attribute of one of the decoded players
+    return property(lambda self: getattr(self.players[i], name))
+
+
 class GamePlayer:
 
-    def __init__(self, user_id:str, user_name:str, plot:bool=True, print:bool=True):
+    # Waiting for a queued quest
+    queue_initial_delay = 0.1
+    queue_max_delay = 5.0
+
+    # Strategy routines in order of priority. Once no player can act anymore
+    # the remaining ones are skipped, except the ones that always run because
+    # they override actions or keep state across ticks. Those do their own
+    # bookkeeping first and only then check whether a player can act.
+    default_stages = ('move_to_exit', 'pickup_health', 'pickup_sword', 'pickup_keys_or_open_doors', 'attack',
+                      'crush_with_door', 'explore', 'move_to_pressure_plate', 'wait_at_pressure_plate_door_2',
+                      'pickup_boulder', 'wait_at_random_door')
+    level20_stages = ('handle_level20', 'move_to_exit', 'pickup_health', 'pickup_sword', 'pickup_keys_or_open_doors',
+                      'attack', 'explore', 'pickup_boulder')
+    always_run_stages = frozenset(('crush_with_door', 'handle_level20', 'attack', 'random_walk'))
+
+    # Explore towards the frontier cell that reveals the most per step, instead of the closest one
+    explore_by_information_gain = False
+
+    # Only the most recent actions are kept, games of a quest can take very long
+    max_actions = 10000
+
+    # The players are decoded once per tick into self.players
+    player1_pos = _player_property(0, 'pos')
+    player1_health = _player_property(0, 'health')
+    player1_inventory = _player_property(0, 'inventory')
+    player1_has_sword = _player_property(0, 'has_sword')
+    player2_pos = _player_property(1, 'pos')
+    player2_health = _player_property(1, 'health')
+    player2_inventory = _player_property(1, 'inventory')
+    player2_has_sword = _player_property(1, 'has_sword')
+
+    def __init__(self, user_id:str, user_name:str, plot:bool=True, print:bool=True, stub=None, replays_folder:str|None=None, compress_replays:bool=False, metrics:Metrics|None=None, pipeline:bool=False,
+                 target:str=default_target, channels:ChannelPool|None=None):
         self.user_id = user_id
         self.user_name = user_name
         self.plot = plot
         self.print = print
         
-        self.actions = []
+        self.actions = deque(maxlen=self.max_actions)
+        self.players = (PlayerView(), PlayerView())
+
+        # Every game is recorded when a folder is given
+        self.replays_folder = replays_folder
+        self.compress_replays = compress_replays
+        self.replay = None
+
+        # Without metrics the routines are not instrumented at all
+        self.metrics = metrics
+        if metrics is not None:
+            metrics.instrument(self)
+
+        # Pipelined, the distance fields of the next tick are prepared while an act is in flight
+        self.pipeline = pipeline
+        self._speculated = (None, None)
 
         self.remain_on_plate_counter = 0
         self.plate_color = None
 
-        self.channel = grpc.insecure_channel('localhost:5001')
-        self.stub = swoq_pb2_grpc.GameServiceStub(self.channel)
+        self.player1_field = IncrementalDistanceField()
+        self.player2_field = IncrementalDistanceField()
+        self._tiles = None
+        self._nearest_targets = None
+        self.planes = None
+        self.frontier = None
+        # Buffers of the map size, allocated once per game
+        self.arena = None
+        # Bumped when the map, a player position or the blocked cells change, the path cache is only valid for one generation
+        self.map_generation = 0
+        self._generation_positions = None
+        self._forgot_distances = False
+        self._path_cache = {}
+        self._path_cache_generation = None
+
+        # Without a stub the channel of the target is taken from the pool, which keeps it open for other players and games
+        if stub is None:
+            self.stub = (channels or shared_pool()).stub(target)
+        else:
+            self.stub = stub
 
 
     def close(self) -> None:
-        self.channel.close()
+        self._close_replay()
+
+
+    def _close_replay(self) -> None:
+        if self.replay is not None:
+            self.replay.close()
+            self.replay = None
 
 
     def __enter__(self) -> object:
@@ -56,29 +159,66 @@ class GamePlayer:
         self.close()
 
 
-    def start(self, level:int=None, seed:int=None) -> None:
-        startResponse = self.stub.Start(swoq_pb2.StartRequest(userId=self.user_id, userName=self.user_name, level=level, seed=seed))
+    def start(self, level:int=None, seed:int=None, queue_timeout:float|None=None) -> None:
+        startRequest = self._start_request(level, seed)
+        startResponse = self.stub.Start(startRequest)
+        self._print_start_result(startResponse)
+
+        delays = self._queue_delays(queue_timeout)
+        while startResponse.result == swoq_pb2.START_RESULT_QUEST_QUEUED:
+            sleep(next(delays))
+            startResponse = self.stub.Start(startRequest)
+            self._print_start_result(startResponse)
+
+        self._handle_start_response(startRequest, startResponse)
+
+
+    # Delays between polls of a queued quest, until the optional deadline has passed
+    def _queue_delays(self, queue_timeout:float|None):
+        deadline = None if queue_timeout is None else monotonic() + queue_timeout
+        for delay in backoff_delays(self.queue_initial_delay, self.queue_max_delay):
+            if deadline is not None:
+                remaining = deadline - monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f'Quest still queued after {queue_timeout}s')
+                delay = min(delay, remaining)
+            yield delay
+
+
+    def _start_request(self, level:int|None, seed:int|None) -> swoq_pb2.StartRequest:
+        return swoq_pb2.StartRequest(userId=self.user_id, userName=self.user_name, level=level, seed=seed)
+
+
+    def _print_start_result(self, startResponse:swoq_pb2.StartResponse) -> None:
         if self.print:
             result = swoq_pb2.StartResult.Name(startResponse.result)
             print(f'{result=}')
 
-        while startResponse.result == swoq_pb2.START_RESULT_QUEST_QUEUED:
-            startResponse = self.stub.Start(swoq_pb2.StartRequest(userId=self.user_id, userName=self.user_name, level=level, seed=seed))
-            if self.print:
-                result = swoq_pb2.StartResult.Name(startResponse.result)
-                print(f'{result=}')
-        
+
+    def _handle_start_response(self, startRequest:swoq_pb2.StartRequest, startResponse:swoq_pb2.StartResponse) -> None:
         if startResponse.result != swoq_pb2.START_RESULT_OK:
             raise Exception(f'Failed to start game: {startResponse.result}')
 
+        self._close_replay()
+        if self.replays_folder is not None:
+            self.replay = ReplayWriter.create(self.replays_folder, startRequest, startResponse, compress=self.compress_replays)
+
         self.game_id = startResponse.gameId
         self.height = startResponse.mapHeight
         self.width = startResponse.mapWidth
         self.visibility_range = startResponse.visibilityRange
-        self.actions = []
+        self.actions = deque(maxlen=self.max_actions)
+        self.level_ticks = {}
 
+        # The size of the map is fixed per game, these are cleared for every level instead of allocated again
         self.prev_level = -1
-        self.map = np.zeros((self.height, self.width), dtype=np.int8)
+        self.arena = BufferArena(self.height, self.width)
+        self.map = self.arena.get('map', np.int8, fill=swoq_pb2.TILE_UNKNOWN)
+        self.plates_with_boulders = CellSet(self.map.shape)
+        self.picked_up_boulders = CellSet(self.map.shape)
+        self.plate_door_positions = CellSet(self.map.shape)
+        self.placed_players = []
+        self.map_reset = True
 
         self.update_global_state(startResponse.state)
 
@@ -91,12 +231,17 @@ class GamePlayer:
 
         if self.plot:
             self._frame = plot_map(self.map)
+            self._map_img = None
 
 
     def reset(self) -> None:
-        self.map = np.zeros_like(self.map)
+        self.map.fill(swoq_pb2.TILE_UNKNOWN)
+        self.placed_players = []
+        self.map_reset = True
+        self.player1_field.reset()
+        self.player2_field.reset()
         self.expected_enemy_health = None
-        self.plates_with_boulders = []
+        self.plates_with_boulders.clear()
         self.boulder_drop_pos_1 = None
         self.boulder_drop_pos_2 = None
         self.remain_on_plate_counter_1 = 0
@@ -107,93 +252,151 @@ class GamePlayer:
         self.plate_pos_2 = None
         self.random_pos1 = None
         self.random_pos2 = None
-        self.picked_up_boulders = set()
-        self.plate_door_positions = set()
+        self.picked_up_boulders.clear()
+        self.plate_door_positions.clear()
         self.level22_prev_boss_pos = None
         self.level22_state = None
+        self.view = MapView(self.map)
+        self._speculated = (None, None)
+        # The map is cleared in place, so the caches cannot tell it changed
+        self.planes = BitPlanes(self.map)
+        self.frontier = Frontier(self.planes, self.arena)
+        self._tiles = None
+        self._nearest_targets = None
+        self.map_generation += 1
 
 
     def update_global_state(self, state:swoq_pb2.State) -> None:
+        self.tick = state.tick
         self.level = state.level
         self.status = state.status
         self.finished = state.status != swoq_pb2.GAME_STATUS_ACTIVE
 
-        self.combined_health = 0
-
-        self.player1_pos = (state.playerState.position.y, state.playerState.position.x) if state.HasField('playerState') else None
-        self.player1_health = state.playerState.health if state.HasField('playerState') else None
-        self.player1_inventory = state.playerState.inventory if state.HasField('playerState') else None
-        self.player1_has_sword = state.playerState.hasSword if state.HasField('playerState') else None
-        if self.player1_health is not None:
-            self.combined_health += self.player1_health
-
-        self.player2_pos = (state.player2State.position.y, state.player2State.position.x) if state.HasField('player2State') else None
-        self.player2_health = state.player2State.health if state.HasField('player2State') else None
-        self.player2_inventory = state.player2State.inventory if state.HasField('player2State') else None
-        self.player2_has_sword = state.player2State.hasSword if state.HasField('player2State') else None
-        if self.player2_health is not None:
-            self.combined_health += self.player2_health
-
-        self.two_players = valid_pos(self.player1_pos) and valid_pos(self.player2_pos)
+        self.players = decode_players(state)
+        self.combined_health = sum(player.health for player in self.players if player.health is not None)
+        self.two_players = all(valid_pos(player.pos) for player in self.players)
 
         if self.print:
             print(f'status={self.status} level={self.level}, comb health={self.combined_health}')
-            print(f'player1: pos={self.player1_pos}, health={self.player1_health}, inventory={self.player1_inventory}, has_sword={self.player1_has_sword}')
-            print(f'player2: pos={self.player2_pos}, health={self.player2_health}, inventory={self.player2_inventory}, has_sword={self.player2_has_sword}')
+            for i, player in enumerate(self.players):
+                print(f'player{i+1}: {player}')
+
+        prev_players = self.placed_players
 
         # Clear map for every new level
         if self.prev_level != self.level:
             self.prev_level = self.level
             if self.print: print(f'Entered level {self.level}')
+            self.level_start_tick = self.tick
             self.reset()
 
+        # Ticks spent in each level so far
+        self.level_ticks[self.level] = self.tick - self.level_start_tick
+
         # Copy surroundings to map
-        if len(state.playerState.surroundings) > 0:
-            top = self.player1_pos[0] - self.visibility_range
-            left = self.player1_pos[1] - self.visibility_range
-            i = 0
-            for y in range(self.visibility_range*2 + 1):
-                for x in range(self.visibility_range*2 + 1):
-                    s = state.playerState.surroundings[i]
-                    if s != swoq_pb2.TILE_UNKNOWN:
-                        map_x = left + x
-                        map_y = top + y
-                        if 0 <= map_y < self.map.shape[0] and 0 <= map_x < self.map.shape[1]:
-                            self.map[map_y, map_x] = s
-                    i += 1
-
-        if len(state.player2State.surroundings) > 0:
-            top = self.player2_pos[0] - self.visibility_range
-            left = self.player2_pos[1] - self.visibility_range
-            i = 0
-            for y in range(self.visibility_range*2 + 1):
-                for x in range(self.visibility_range*2 + 1):
-                    s = state.player2State.surroundings[i]
-                    if s != swoq_pb2.TILE_UNKNOWN:
-                        map_x = left + x
-                        map_y = top + y
-                        if 0 <= map_y < self.map.shape[0] and 0 <= map_x < self.map.shape[1]:
-                            self.map[map_y, map_x] = s
-                    i += 1
+        prev_map = self.arena.get('prev_map', np.int8)
+        np.copyto(prev_map, self.map)
+        regions = []
+        for pos, player_state in ((self.player1_pos, state.playerState), (self.player2_pos, state.player2State)):
+            region = merge_surroundings(self.map, player_state.surroundings, pos, self.visibility_range)
+            if region is not None:
+                regions.append(region)
 
         # Manually place players, to prevent lingering entries
-        self.map[self.map == swoq_pb2.TILE_PLAYER] = swoq_pb2.TILE_EMPTY
-        if self.player1_pos is not None:
-            y,x = self.player1_pos
-            if y >= 0 and x >=0: self.map[y,x] = swoq_pb2.TILE_PLAYER
-        if self.player2_pos is not None:
-            y,x = self.player2_pos
-            if y >= 0 and x >=0: self.map[y,x] = swoq_pb2.TILE_PLAYER
+        for region in regions:
+            window = self.map[region]
+            window[window == swoq_pb2.TILE_PLAYER] = swoq_pb2.TILE_EMPTY
+        for y, x in self.placed_players:
+            if self.map[y,x] == swoq_pb2.TILE_PLAYER: self.map[y,x] = swoq_pb2.TILE_EMPTY
+        self.placed_players = [pos for pos in (self.player1_pos, self.player2_pos) if valid_pos(pos)]
+        for y, x in self.placed_players:
+            self.map[y,x] = swoq_pb2.TILE_PLAYER
+
+        # Keep track of the changed cells, for updating derived state incrementally.
+        # None means the whole map has been reset.
+        if self.map_reset:
+            self.map_changes = None
+            self.map_reset = False
+        else:
+            self.map_changes = changed_cells(prev_map, self.map, regions, self.placed_players + prev_players)
 
-        # Update paths
+        # Bit planes are updated in place, only in the rows that changed
+        if self.map_changes is None or self.planes is None or self.planes.map is not self.map:
+            self.planes = BitPlanes(self.map)
+            self.frontier = Frontier(self.planes, self.arena)
+        else:
+            self.planes.update_cells(self.map_changes)
+            self.frontier.update(self.map_changes)
+
+        # Tiles and targets are looked up again on the updated map, without overlays
+        self._tiles = None
+        self._nearest_targets = None
+        self.view = MapView(self.map)
+
+        # A field prepared while the act was in flight is used when the move succeeded
+        speculated1, speculated2 = self._speculated
+        self._speculated = (None, None)
+        if speculated1 is not None and speculated1.source == self.player1_pos:
+            self.player1_field = speculated1
+        if speculated2 is not None and speculated2.source == self.player2_pos:
+            self.player2_field = speculated2
+
+        # Update paths, repairs the paths of the previous tick where possible
         if self.player1_pos is not None:
-            self.player1_distances, self.player1_paths = compute_distances_quick(self.map, self.player1_pos)
+            out = self.arena.get('distances_1'), self.arena.get('predecessors_1')
+            self.player1_distances, self.player1_paths = self.player1_field.update(self.map, self.player1_pos, self.map_changes, out)
+        else:
+            self.player1_field.reset()
 
         if self.player2_pos is not None:
-            self.player2_distances, self.player2_paths = compute_distances_quick(self.map, self.player2_pos)
+            out = self.arena.get('distances_2'), self.arena.get('predecessors_2')
+            self.player2_distances, self.player2_paths = self.player2_field.update(self.map, self.player2_pos, self.map_changes, out)
+        else:
+            self.player2_field.reset()
+
+        positions = (self.player1_pos, self.player2_pos)
+        # Distances forgotten by the level handlers have been written again
+        if self.map_changes is None or len(self.map_changes) > 0 or positions != self._generation_positions or self._forgot_distances:
+            self.map_generation += 1
+            self._generation_positions = positions
+            self._forgot_distances = False
 
 
     def act(self):
+        request = self._act_request()
+        if self.metrics is None:
+            response = self._call_act(request)
+        else:
+            start = perf_counter_ns()
+            response = self._call_act(request)
+            self.metrics.add_act(self, perf_counter_ns() - start)
+        return self._handle_act_response(request, response)
+
+
+    def _call_act(self, request:swoq_pb2.ActRequest) -> swoq_pb2.ActResponse:
+        # Only a grpc stub can have the act in flight, other stubs answer right away
+        if self.pipeline and hasattr(self.stub.Act, 'future'):
+            future = self.stub.Act.future(request)
+            self._speculate(request)
+            return future.result()
+        return self.stub.Act(request)
+
+
+    def _speculate(self, request:swoq_pb2.ActRequest) -> None:
+        # Moves the distance fields on to where the players are when their moves succeed.
+        # When a move fails the current field is still the right one.
+        speculated = []
+        for field, pos, has_action, action in ((self.player1_field, self.player1_pos, request.HasField('action'), request.action),
+                                               (self.player2_field, self.player2_pos, request.HasField('action2'), request.action2)):
+            offset = move_offsets.get(action) if has_action and valid_pos(pos) else None
+            if offset is None:
+                speculated.append(None)
+            else:
+                speculated.append(field.speculate((pos[0] + offset[0], pos[1] + offset[1])))
+        self._speculated = tuple(speculated)
+
+
+    def _act_request(self) -> swoq_pb2.ActRequest:
         if not self.print: print('.', end='', flush=True)
         
         # Once in a while player 2 will not move, to break cycles
@@ -208,15 +411,23 @@ class GamePlayer:
             self.action2 = None
 
         if self.print: print(f'{self.action1=}, {self.action2=}')
-        response = self.stub.Act(swoq_pb2.ActRequest(gameId=self.game_id, action=self.action1, action2=self.action2))
+        return swoq_pb2.ActRequest(gameId=self.game_id, action=self.action1, action2=self.action2)
+
+
+    def _handle_act_response(self, request:swoq_pb2.ActRequest, response:swoq_pb2.ActResponse) -> bool:
+        if self.replay is not None:
+            self.replay.append(request, response)
 
         if response.result == swoq_pb2.ACT_RESULT_OK:
             self.actions.append((self.action1, self.action2))
 
         self.update_global_state(response.state)
+        if self.finished:
+            self._close_replay()
 
         if self.plot:
-            update_map(self._frame, self.map)
+            # Only the changed cells are rendered again
+            self._map_img = update_map(self._frame, self.map, self._map_img, self.map_changes)
 
         if self.print:
             result = swoq_pb2.ActResult.Name(response.result)
@@ -235,13 +446,17 @@ class GamePlayer:
 
 
     def step_randomly(self) -> None:
+        self.plan_randomly()
+        self.act()
+        self.update_remain_on_plate()
+
+
+    def plan_randomly(self) -> None:
         assert(self.action1 is None)
         self.action1 = np.random.choice(swoq_pb2.DirectedAction.values())
         if self.two_players:
             assert(self.action2 is None)
             self.action2 = np.random.choice(swoq_pb2.DirectedAction.values())
-        self.act()
-        self.update_remain_on_plate()
         
 
     def queue_move1(self, direction:str) -> None:
@@ -274,7 +489,13 @@ class GamePlayer:
 
     def step(self) -> None:
         if self.finished: return
+        self.plan()
+        self.act()
+        self.update_remain_on_plate()
 
+
+    # Queues the actions for the next act, without sending them
+    def plan(self) -> None:
         self.plate_pos_2 = None
         self.plate_pos_1 = None
 
@@ -287,79 +508,53 @@ class GamePlayer:
         elif self.level == 22:
             self.step_level22()
         else:
-            self.move_to_exit()
-            self.pickup_health()
-            self.pickup_sword()
-            self.pickup_keys_or_open_doors()
-            self.attack()
-            self.crush_with_door()
-            self.explore()
-            self.move_to_pressure_plate()
-            self.wait_at_pressure_plate_door_2()
-            self.pickup_boulder()
-            self.wait_at_random_door()
-        self.random_walk() # fallback
-        self.act()
-        self.update_remain_on_plate()
+            self.run_stages(self.default_stages)
+        self.run_stages(('random_walk',)) # fallback
+
+
+    def can_act_any(self) -> bool:
+        return self.can_act1() or self.can_act2()
+
+
+    def run_stages(self, stages:tuple[str,...]) -> None:
+        # By name, so instrumented routines are used
+        for name in stages:
+            if name in self.always_run_stages or self.can_act_any():
+                getattr(self, name)()
+
 
     def step_level20(self) -> None:
-        self.handle_level20()
-        self.move_to_exit()
-        self.pickup_health()
-        self.pickup_sword()
-        self.pickup_keys_or_open_doors()
-        self.attack()
-        self.explore()
-        self.pickup_boulder()
+        self.run_stages(self.level20_stages)
 
 
     def step_level21(self) -> None:
-        old_map = self.map
-
         # as long as both players have no sword the bottom right part is off-limits
         if not self.player1_has_sword or not self.player2_has_sword:
-            new_map = self.map.copy()
-            for my in range(self.height-19, self.height):
-                for mx in range(self.width-12, self.width):
-                    new_map[my, mx] = swoq_pb2.TILE_WALL
-                    if (my, mx) in self.player1_distances:
-                        del self.player1_distances[(my, mx)]
-                    if (my, mx) in self.player2_distances:
-                        del self.player2_distances[(my, mx)]
-            self.map = new_map
-
-        self.move_to_exit()
-        self.pickup_boulder()
-        self.level21_place_boulder()
+            self.view.block_rect(self.height-19, self.width-12, self.height, self.width)
+            self.forget_blocked_distances()
+
+        self.run_stages(('move_to_exit', 'pickup_boulder', 'level21_place_boulder'))
         if not self.player1_has_sword and len(self.plates_with_boulders) > 0:
             self.level21_wait_at_plate_2()
         if self.player1_has_sword and not self.player2_has_sword and len(self.plates_with_boulders) > 0:
             self.level21_wait_at_plate_1()
-        self.pickup_health()
-        self.pickup_sword()
-        self.pickup_keys_or_open_doors()
-        self.attack()
-        self.explore()
-        # self.move_to_pressure_plate()
-        self.wait_at_pressure_plate_door_1()
-        self.wait_at_pressure_plate_door_2()
+        # 'move_to_pressure_plate' is not used
+        self.run_stages(('pickup_health', 'pickup_sword', 'pickup_keys_or_open_doors', 'attack', 'explore',
+                         'wait_at_pressure_plate_door_1', 'wait_at_pressure_plate_door_2'))
 
-        self.map = old_map
+        self.clear_blocked()
 
 
     def step_level22(self) -> None:
-        old_map = self.map
-
         player_1_on_plate = self.plate_color_1 is not None and self.remain_on_plate_counter_1 > 0
 
         if self.level22_state is None:
             self.level22_state = 'explore'
 
         avoid_boss = False
-        boss_positions = np.argwhere(self.map == swoq_pb2.TILE_BOSS)
+        boss_positions = self.tiles().positions(swoq_pb2.TILE_BOSS)
         if np.any(boss_positions):
             boss_pos = tuple(boss_positions[0])
-            boss_pos_y, boss_pos_x = boss_pos
             # Stop avoiding boss when player 1 is on the plate
             avoid_boss = not player_1_on_plate
         else:
@@ -373,19 +568,11 @@ class GamePlayer:
 
         # stay away from boss if not done yet
         if avoid_boss:
-            new_map = self.map.copy()
-            for my in range(boss_pos_y-self.visibility_range, boss_pos_y+self.visibility_range+1):
-                for mx in range(boss_pos_x-self.visibility_range, boss_pos_x+self.visibility_range+1):
-                    if 0 <= my < self.height and 0 <= mx < self.width:
-                        new_map[my, mx] = swoq_pb2.TILE_WALL
-                        if (my, mx) in self.player1_distances:
-                            del self.player1_distances[(my, mx)]
-                        if (my, mx) in self.player2_distances:
-                            del self.player2_distances[(my, mx)]
-            self.map = new_map
+            self.view.block_box(boss_pos, self.visibility_range)
+            self.forget_blocked_distances()
 
         if self.level22_state == 'explore':
-            if np.any(self.plate_door_positions):
+            if self.plate_door_positions:
                 self.level22_state = 'move_to_plate'
 
         if self.level22_state == 'move_to_plate':
@@ -407,7 +594,7 @@ class GamePlayer:
                 if self.can_act2():
                     is_adjacent = any(are_adjacent(self.player2_pos, pos) for pos in self.plate_door_positions)
                     if not is_adjacent:
-                        self.move_to_closest_2(self.plate_door_positions, 'boss_door')
+                        self.move_to_closest(1, self.plate_door_positions, 'boss_door')
 
         if self.level22_state == 'trigger_boss':
             self.remain_on_plate_counter_1 = 100 # keep player 1 on plate
@@ -437,7 +624,7 @@ class GamePlayer:
         if self.level22_state == 'open_exit':
             self.pickup_keys_or_open_doors()
 
-            if np.any(self.map == swoq_pb2.TILE_EXIT):
+            if self.tiles().has(swoq_pb2.TILE_EXIT):
                 self.level22_state = 'pickup_treasure'
 
         if self.level22_state == 'pickup_treasure':
@@ -450,35 +637,71 @@ class GamePlayer:
 
         self.explore()
 
-        self.map = old_map
+        self.clear_blocked()
 
 
-    def get_direction_towards_closest_unknown(self, from_pos, distances, paths) -> str:
-        closest_empty = None
-        closest_dist = None
+    @property
+    def blocked(self) -> np.ndarray[bool]|None:
+        # Cells the level handlers keep the players out of, for now
+        return self.view.blocked
 
-        # find closest empty with UNKNOWN neighbors
-        for pos_y, pos_x in np.argwhere(self.map == swoq_pb2.TILE_UNKNOWN):
-            pos = None
-            if (pos_y, pos_x-1) in distances and self.map[pos_y, pos_x-1] == swoq_pb2.TILE_EMPTY:
-                pos = (pos_y, pos_x-1)
-            elif (pos_y, pos_x+1) in distances and self.map[pos_y, pos_x+1] == swoq_pb2.TILE_EMPTY:
-                pos = (pos_y, pos_x+1)
-            elif (pos_y-1, pos_x) in distances and self.map[pos_y-1, pos_x] == swoq_pb2.TILE_EMPTY:
-                pos = (pos_y-1, pos_x)
-            elif (pos_y+1, pos_x) in distances and self.map[pos_y+1, pos_x] == swoq_pb2.TILE_EMPTY:
-                pos = (pos_y+1, pos_x)
 
-            if pos is not None:
-                dist = distances[pos]
-                if closest_dist is None or dist < closest_dist:
-                    closest_dist = dist
-                    closest_empty = pos
+    def forget_blocked_distances(self) -> None:
+        # Blocked cells are unreachable for the rest of the tick, the other
+        # distances and the paths are left as they are. Strategies that rank
+        # by distance keep the choices they made when the level handlers drew
+        # walls on a copy of the map. The distance fields are written again
+        # by the next update.
+        blocked = self.blocked
+        for distances in (self.player1_distances, self.player2_distances):
+            distances.distances[blocked] = -1
+        self.map_generation += 1
+        self._forgot_distances = True
 
-        if closest_empty is None:
-            return None
 
-        return get_direction_towards(paths, from_pos, closest_empty)
+    def clear_blocked(self) -> None:
+        # Removes the overlays of the level handlers, paths are looked up again
+        self.view.clear()
+        self.map_generation += 1
+
+
+    def tiles(self) -> TileIndex:
+        # Cached per map and overlays, the level handlers temporarily block parts of the map
+        blocked = self.blocked
+        if self._tiles is None or self._tiles.map is not self.map or self._tiles.blocked is not blocked:
+            self._tiles = TileIndex(self.map, blocked)
+        return self._tiles
+
+
+    def nearest_targets(self) -> NearestTargets:
+        blocked = self.blocked
+        if self._nearest_targets is None or self._nearest_targets.map is not self.map or self._nearest_targets.blocked is not blocked:
+            self._nearest_targets = NearestTargets(self.map, self.tiles(), self.planes, blocked, self.arena)
+        return self._nearest_targets
+
+
+    def get_direction_towards_closest_unknown(self, from_pos) -> str:
+        # Frontier cells are ranked by the distance field of the player.
+        # The frontier is kept for the map itself, the blocked cells of the
+        # level handlers count as walls, so unknown cells behind them do not
+        # make a frontier
+        if from_pos == self.player1_pos:
+            i = 0
+        elif from_pos == self.player2_pos:
+            i = 1
+        else:
+            # Any frontier cell can be the target, the old scan only took the first
+            # empty neighbour of each unknown cell, so the choice may differ
+            _, dir, _ = self.nearest_targets().closest('frontier', from_pos)
+            return dir
+        distances, _ = self.player_paths(i)
+
+        if self.explore_by_information_gain:
+            target = self.frontier.most_informative(distances.distances, self.visibility_range, self.blocked)
+        else:
+            target = self.frontier.closest(distances.distances, self.blocked)
+        if target is None: return None
+        return self.direction(i, target)
 
 
     def can_act1(self) -> bool:
@@ -489,131 +712,152 @@ class GamePlayer:
         return valid_pos(self.player2_pos) and self.action2 is None and self.remain_on_plate_counter_2 <= 0
 
 
-    def move_to_1(self, pos:tuple[int,int]) -> None:
-        dir = get_direction(self.player1_pos, pos, self.player1_distances, self.player1_paths)
-        self.queue_move1(dir)
+    def can_act(self, i:int) -> bool:
+        return self.can_act1() if i == 0 else self.can_act2()
+
+
+    def queue_move(self, i:int, direction:str) -> None:
+        if i == 0: self.queue_move1(direction)
+        else: self.queue_move2(direction)
+
+
+    def queue_use(self, i:int, direction:str) -> None:
+        if i == 0: self.queue_use1(direction)
+        else: self.queue_use2(direction)
+
+
+    def player_paths(self, i:int) -> tuple[DistanceMap, PathMap]:
+        return (self.player1_distances, self.player1_paths) if i == 0 else (self.player2_distances, self.player2_paths)
+
 
+    def direction(self, i:int, pos:tuple[int,int]) -> str|None:
+        # With blocked cells the distances of those cells are forgotten, but the
+        # paths are kept, as the level handlers did when they drew walls on a
+        # copy of the map. A path to a target outside them can cross them.
+        player_pos = self.players[i].pos
+        dir, _ = self.direction_and_distance(player_pos, pos, *self.player_paths(i))
+        return dir
 
-    def move_to_2(self, pos:tuple[int,int]) -> None:
-        dir = get_direction(self.player2_pos, pos, self.player2_distances, self.player2_paths)
-        self.queue_move2(dir)
 
+    def direction_and_distance(self, from_pos, to_pos, distances, paths) -> tuple[str|None, int|float]:
+        # Memoised per map generation, the strategies ask for the same paths many times.
+        # The distances and paths must be those of a player at from_pos.
+        if self._path_cache_generation != self.map_generation:
+            self._path_cache.clear()
+            self._path_cache_generation = self.map_generation
+        key = (from_pos, to_pos)
+        result = self._path_cache.get(key)
+        if result is None:
+            result = get_direction_and_distance(from_pos, to_pos, distances, paths)
+            self._path_cache[key] = result
+        return result
 
-    def use_1(self, pos:tuple[int,int]) -> None:
-        if self.player1_pos[0] < pos[0]: self.queue_use1('S')
-        if self.player1_pos[0] > pos[0]: self.queue_use1('N')
-        if self.player1_pos[1] < pos[1]: self.queue_use1('E')
-        if self.player1_pos[1] > pos[1]: self.queue_use1('W')
 
+    def move_to(self, i:int, pos:tuple[int,int]) -> None:
+        self.queue_move(i, self.direction(i, pos))
 
-    def use_2(self, pos:tuple[int,int]) -> None:
-        if self.player2_pos[0] < pos[0]: self.queue_use2('S')
-        if self.player2_pos[0] > pos[0]: self.queue_use2('N')
-        if self.player2_pos[1] < pos[1]: self.queue_use2('E')
-        if self.player2_pos[1] > pos[1]: self.queue_use2('W')
+
+    def use(self, i:int, pos:tuple[int,int]) -> None:
+        player_pos = self.players[i].pos
+        if player_pos[0] < pos[0]: self.queue_use(i, 'S')
+        if player_pos[0] > pos[0]: self.queue_use(i, 'N')
+        if player_pos[1] < pos[1]: self.queue_use(i, 'E')
+        if player_pos[1] > pos[1]: self.queue_use(i, 'W')
 
 
     def pickup_key_or_open_door(self, key:int, door:int, item:int) -> None:
-        doors = np.argwhere(self.map == door)
+        if not self.can_act_any(): return
+        doors = self.tiles().positions(door)
         if np.any(doors):
 
             # open door
             if self.can_act1() and self.player1_inventory == item:
-                self.use_closest_1(doors, 'door')
+                self.use_closest(0, door, 'door')
 
             if self.can_act2() and self.player2_inventory == item:
-                self.use_closest_2(doors, 'door')
+                self.use_closest(1, door, 'door')
 
             # pick up keys for doors visible
-            keys = np.argwhere(self.map == key)
+            keys = self.tiles().positions(key)
             if np.any(keys):
                 if self.can_act1() and self.player1_inventory == 0:
-                    self.move_to_closest_1(keys, 'key')
+                    self.move_to_closest(0, key, 'key')
 
                 if self.can_act2() and self.player2_inventory == 0:
-                    self.move_to_closest_2(keys, 'key')
+                    self.move_to_closest(1, key, 'key')
 
 
     def move_to_exit(self) -> None:
+        if not self.can_act_any(): return
+
         # Move to exit if possible
-        exits = np.argwhere(self.map == swoq_pb2.TILE_EXIT)
+        exits = self.tiles().positions(swoq_pb2.TILE_EXIT)
         if np.any(exits):
             exit_pos = tuple(exits[0])
 
             # Only move when both players can reach the exit (or each other)
             can_reach = False
             if valid_pos(self.player1_pos) and valid_pos(self.player2_pos):
-                can_reach = (self.can_1_reach(exit_pos) and self.can_2_reach(self.player1_pos)) or \
-                    (self.can_1_reach(self.player2_pos) and self.can_2_reach(exit_pos))
+                can_reach = (self.can_reach(0, exit_pos) and self.can_reach(1, self.player1_pos)) or \
+                    (self.can_reach(0, self.player2_pos) and self.can_reach(1, exit_pos))
             elif valid_pos(self.player1_pos):
-                can_reach = self.can_1_reach(exit_pos)
+                can_reach = self.can_reach(0, exit_pos)
             elif valid_pos(self.player2_pos):
-                can_reach = self.can_2_reach(exit_pos)
+                can_reach = self.can_reach(1, exit_pos)
 
             if can_reach:
                 if self.can_act1():
                     # drop boulder before entering exit
                     if self.player1_inventory == swoq_pb2.INVENTORY_BOULDER:
                         if self.boulder_drop_pos_1 is None:
-                            self.boulder_drop_pos_1 = self.get_closest_clearing(self.player1_pos, self.player1_distances, self.player1_paths)
+                            self.boulder_drop_pos_1 = self.get_closest_clearing(self.player1_pos)
                         if self.boulder_drop_pos_1 is not None:
                             if are_adjacent(self.player1_pos, self.boulder_drop_pos_1):
                                 if self.print: print('boulder_drop1')
-                                self.use_1(self.boulder_drop_pos_1)
+                                self.use(0, self.boulder_drop_pos_1)
                                 self.boulder_drop_pos_1 = None
                             else:
                                 if self.print: print('boulder_drop_move1')
-                                self.move_to_1(self.boulder_drop_pos_1)
+                                self.move_to(0, self.boulder_drop_pos_1)
                     else:
                         if self.print: print('exit1')
-                        self.move_to_1(exit_pos)
+                        self.move_to(0, exit_pos)
                 if self.can_act2():
                     # drop boulder before entering exit
                     if self.player2_inventory == swoq_pb2.INVENTORY_BOULDER:
                         if self.boulder_drop_pos_2 is None:
-                            self.boulder_drop_pos_2 = self.get_closest_clearing(self.player2_pos, self.player2_distances, self.player2_paths)
+                            self.boulder_drop_pos_2 = self.get_closest_clearing(self.player2_pos)
                         if self.boulder_drop_pos_2 is not None:
                             if are_adjacent(self.player2_pos, self.boulder_drop_pos_2):
                                 if self.print: print('boulder_drop2')
-                                self.use_2(self.boulder_drop_pos_2)
+                                self.use(1, self.boulder_drop_pos_2)
                                 self.boulder_drop_pos_2 = None
                             else:
                                 if self.print: print('boulder_drop_move2')
-                                self.move_to_2(self.boulder_drop_pos_2)
+                                self.move_to(1, self.boulder_drop_pos_2)
                     else:
                         if self.print: print('exit2')
-                        self.move_to_2(exit_pos)
+                        self.move_to(1, exit_pos)
 
 
-    def get_closest_clearing(self, from_pos, distances, paths) -> tuple[str, tuple]:
-        closest_empty = None
-        closest_dist = None
-
+    def get_closest_clearing(self, from_pos) -> tuple[int,int]|None:
         # find closest empty with EMPTY neighbors
-        for pos_y, pos_x in np.argwhere(self.map == swoq_pb2.TILE_EMPTY):
-            if (pos_y, pos_x-1) in distances and self.map[pos_y, pos_x-1] == swoq_pb2.TILE_EMPTY and \
-               (pos_y, pos_x+1) in distances and self.map[pos_y, pos_x+1] == swoq_pb2.TILE_EMPTY and \
-               (pos_y-1, pos_x) in distances and self.map[pos_y-1, pos_x] == swoq_pb2.TILE_EMPTY and \
-               (pos_y+1, pos_x) in distances and self.map[pos_y+1, pos_x] == swoq_pb2.TILE_EMPTY:
-                pos = (pos_y, pos_x)
-                dist = distances[pos]
-                if closest_dist is None or dist < closest_dist:
-                    closest_dist = dist
-                    closest_empty = pos
-
-        return closest_empty
+        pos, _, _ = self.nearest_targets().closest('clearing', from_pos)
+        return pos
 
 
     def attack(self) -> None:
         can_attack_1 = self.player1_has_sword and self.player1_health > 1
         can_attack_2 = self.player2_has_sword and self.player2_health > 1
 
+        # Keep track of a seen enemy, also when no player can act this tick
+        enemies = self.tiles().positions(swoq_pb2.TILE_ENEMY)
+        if np.any(enemies) and self.expected_enemy_health is None:
+            self.expected_enemy_health = 6
+        if not self.can_act_any(): return
+
         # Attack
-        enemies = np.argwhere(self.map == swoq_pb2.TILE_ENEMY)
         if np.any(enemies):
-            if self.expected_enemy_health is None:
-                self.expected_enemy_health = 6
-
             # If both can still attack, then coordinate by moving closer together
             if can_attack_1 and can_attack_2:
                 # make sure players are close to each other so they can both attack
@@ -630,18 +874,18 @@ class GamePlayer:
 
                 if self.can_act1() and dist_players is not None and dist_players > 10:
                     if self.print: print('move_closer_1')
-                    self.move_to_1(self.player2_pos)
+                    self.move_to(0, self.player2_pos)
                 if self.can_act2() and dist_players is not None and dist_players > 4:
                     if self.print: print('move_closer_2')
-                    self.move_to_2(self.player1_pos)
+                    self.move_to(1, self.player1_pos)
 
             if self.can_act1() and can_attack_1:
-                _, attacked = self.use_closest_1(enemies, 'attack')
+                _, attacked = self.use_closest(0, 'enemy', 'attack')
                 if attacked:
                     self.expected_enemy_health -= 1
 
             if self.can_act2() and can_attack_2:
-                _, attacked = self.use_closest_2(enemies, 'attack')
+                _, attacked = self.use_closest(1, 'enemy', 'attack')
                 if attacked:
                     self.expected_enemy_health -= 1
 
@@ -665,7 +909,7 @@ class GamePlayer:
 
         enemy_at_plate_door = False
 
-        enemies = np.argwhere((self.map == swoq_pb2.TILE_ENEMY) | (self.map == swoq_pb2.TILE_BOSS))
+        enemies = self.tiles().positions(swoq_pb2.TILE_ENEMY, swoq_pb2.TILE_BOSS)
         for enemy_pos in enemies:
             enemy_pos = tuple(enemy_pos)
             if enemy_pos in self.plate_door_positions:
@@ -685,26 +929,30 @@ class GamePlayer:
 
 
     def pickup_health(self) -> None:
+        if not self.can_act_any(): return
+
         # Pickup health
-        healths = np.argwhere(self.map == swoq_pb2.TILE_HEALTH)
+        healths = self.tiles().positions(swoq_pb2.TILE_HEALTH)
         if np.any(healths):
             # let player 1 pickup health first
             if self.can_act1() and (self.player2_health is None or self.player1_health <= self.player2_health):
-                self.move_to_closest_1(healths, 'health')
+                self.move_to_closest(0, 'health', 'health')
             elif self.can_act2() and (self.player1_health is None or self.player1_health > self.player2_health):
-                self.move_to_closest_2(healths, 'health')
+                self.move_to_closest(1, 'health', 'health')
 
 
     def pickup_sword(self) -> None:
+        if not self.can_act_any(): return
+
         # Pickup sword
-        swords = np.argwhere(self.map == swoq_pb2.TILE_SWORD)
+        swords = self.tiles().positions(swoq_pb2.TILE_SWORD)
         if np.any(swords):
             if self.can_act1() and not self.player1_has_sword:
-                self.move_to_closest_1(swords, 'sword1')
+                self.move_to_closest(0, 'sword', 'sword1')
 
             # let player 1 pickup sword first
             if self.can_act2() and not self.player2_has_sword and self.player1_has_sword:
-                self.move_to_closest_2(swords, 'sword2')
+                self.move_to_closest(1, 'sword', 'sword2')
 
 
     def pickup_keys_or_open_doors(self) -> None:
@@ -715,141 +963,133 @@ class GamePlayer:
 
 
     def pickup_treasure(self) -> None:
-        treasures = np.argwhere(self.map == swoq_pb2.TILE_TREASURE)
+        if not self.can_act_any(): return
+        treasures = self.tiles().positions(swoq_pb2.TILE_TREASURE)
         if np.any(treasures):
             if self.can_act1() and self.player1_inventory == 0:
-                self.move_to_closest_1(treasures, 'treasure')
+                self.move_to_closest(0, 'treasure', 'treasure')
             if self.can_act2() and self.player2_inventory == 0:
-                self.move_to_closest_2(treasures, 'treasure')
+                self.move_to_closest(1, 'treasure', 'treasure')
 
 
     def explore(self) -> None:
         # Explore
         if self.can_act1():
-            dir = self.get_direction_towards_closest_unknown(self.player1_pos, self.player1_distances, self.player1_paths)
+            dir = self.get_direction_towards_closest_unknown(self.player1_pos)
             if dir is not None:
                 if self.print: print('explore1')
                 self.queue_move1(dir)
         if self.can_act2():
-            dir = self.get_direction_towards_closest_unknown(self.player2_pos, self.player2_distances, self.player2_paths)
+            dir = self.get_direction_towards_closest_unknown(self.player2_pos)
             if dir is not None:
                 if self.print: print('explore2')
                 self.queue_move2(dir)
 
 
     def random_walk(self) -> None:
+        # Forget reached or unreachable targets, also when no player can act this tick
         if self.random_pos1 is not None:
-            if self.player1_pos == self.random_pos1 or not self.can_1_reach(self.random_pos1):
+            if self.player1_pos == self.random_pos1 or not self.can_reach(0, self.random_pos1):
                 self.random_pos1 = None
 
         if self.random_pos2 is not None:
-            if self.player2_pos == self.random_pos2 or not self.can_2_reach(self.random_pos2):
+            if self.player2_pos == self.random_pos2 or not self.can_reach(1, self.random_pos2):
                 self.random_pos2 = None
 
+        if not self.can_act_any(): return
+
         if self.can_act1():
             if self.random_pos1 is None:
                 self.random_pos1 = find_random_pos(self.player1_pos, self.player1_distances)
             if self.random_pos1 is not None:
                 if self.print: print(f'random1 {self.random_pos1}')
-                self.move_to_1(self.random_pos1)
+                self.move_to(0, self.random_pos1)
         if self.can_act2():
             if self.random_pos2 is None:
                 self.random_pos2 = find_random_pos(self.player2_pos, self.player2_distances)
             if self.random_pos2 is not None:
                 if self.print: print(f'random2 {self.random_pos2}')
-                self.move_to_2(self.random_pos2)
+                self.move_to(1, self.random_pos2)
 
 
     def move_to_pressure_plate(self) -> None:
-        plates = np.argwhere((self.map == swoq_pb2.TILE_PRESSURE_PLATE_RED) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_GREEN) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_BLUE))
+        plates = self.tiles().positions('plate')
         if np.any(plates):
             if self.can_act1():
                 if self.player1_inventory == 4:
                     # place boulders on plates
-                    plate_pos, placed = self.use_closest_1(plates, 'plate_boulder')
+                    plate_pos, placed = self.use_closest(0, 'plate', 'plate_boulder')
                     if plate_pos is not None:
                         self.plate_pos_1 = plate_pos
                         self.plate_color_1 = self.map[self.plate_pos_1]
                     if placed:
-                        self.plates_with_boulders.append(self.plate_pos_1)
+                        self.plates_with_boulders.add(self.plate_pos_1)
                 elif self.two_players or self.level == 9:
                     # only player 1 will stand on plates with two players
-                    plate_pos = self.move_to_closest_1(plates, 'plate')
+                    plate_pos = self.move_to_closest(0, 'plate', 'plate')
                     if plate_pos is not None:
                         self.plate_pos_1 = plate_pos
                         self.plate_color_1 = self.map[self.plate_pos_1]
 
             if self.can_act2() and self.player2_inventory == 4:
                 # place boulders on plates
-                plate_pos, placed = self.use_closest_2(plates, 'plate_boulder')
+                plate_pos, placed = self.use_closest(1, 'plate', 'plate_boulder')
                 if plate_pos is not None:
                     self.plate_pos_2 = plate_pos
                     self.plate_color_2 = self.map[self.plate_pos_2]
                 if placed:
-                    self.plates_with_boulders.append(self.plate_pos_2)
-
-
-    def wait_at_pressure_plate_door_1(self) -> None:
-        if self.plate_color_2 == swoq_pb2.TILE_PRESSURE_PLATE_RED:
-            plate_doors = np.argwhere(self.map == swoq_pb2.TILE_DOOR_RED)
-        elif self.plate_color_2  == swoq_pb2.TILE_PRESSURE_PLATE_GREEN:
-            plate_doors = np.argwhere(self.map == swoq_pb2.TILE_DOOR_GREEN)
-        elif self.plate_color_2  == swoq_pb2.TILE_PRESSURE_PLATE_BLUE:
-            plate_doors = np.argwhere(self.map == swoq_pb2.TILE_DOOR_BLUE)
+                    self.plates_with_boulders.add(self.plate_pos_2)
+
+
+    # Player i moves to the doors of the plate the other player stands on, only with two players
+    def wait_at_pressure_plate_door(self, i:int) -> None:
+        other = 1 - i
+        if not self.can_act(i) or not valid_pos(self.players[other].pos): return
+        plate_color = self.plate_color_2 if i == 0 else self.plate_color_1
+        if plate_color == swoq_pb2.TILE_PRESSURE_PLATE_RED:
+            plate_doors = self.tiles().positions(swoq_pb2.TILE_DOOR_RED)
+        elif plate_color == swoq_pb2.TILE_PRESSURE_PLATE_GREEN:
+            plate_doors = self.tiles().positions(swoq_pb2.TILE_DOOR_GREEN)
+        elif plate_color == swoq_pb2.TILE_PRESSURE_PLATE_BLUE:
+            plate_doors = self.tiles().positions(swoq_pb2.TILE_DOOR_BLUE)
         else:
             plate_doors = []
 
         if np.any(plate_doors):
-            # player 2 stands on plates
-            # player 1 moves to plate doors
-            if self.can_act1() and valid_pos(self.player2_pos): # Only with two players
-                in_front_positions = []
-                for d in plate_doors:
-                    d = tuple(d)
-                    if self.map[d[0]-1, d[1]] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0]-1, d[1]))
-                    if self.map[d[0]+1, d[1]] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0]+1, d[1]))
-                    if self.map[d[0], d[1]-1] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0], d[1]-1))
-                    if self.map[d[0], d[1]+1] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0], d[1]+1))
-                
-                self.move_to_closest_1(in_front_positions, 'plate_door')
+            in_front_positions = []
+            for d in plate_doors:
+                d = tuple(d)
+                if self.map[d[0]-1, d[1]] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0]-1, d[1]))
+                if self.map[d[0]+1, d[1]] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0]+1, d[1]))
+                if self.map[d[0], d[1]-1] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0], d[1]-1))
+                if self.map[d[0], d[1]+1] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0], d[1]+1))
 
-    def wait_at_pressure_plate_door_2(self) -> None:
-        if self.plate_color_1 == swoq_pb2.TILE_PRESSURE_PLATE_RED:
-            plate_doors = np.argwhere(self.map == swoq_pb2.TILE_DOOR_RED)
-        elif self.plate_color_1  == swoq_pb2.TILE_PRESSURE_PLATE_GREEN:
-            plate_doors = np.argwhere(self.map == swoq_pb2.TILE_DOOR_GREEN)
-        elif self.plate_color_1  == swoq_pb2.TILE_PRESSURE_PLATE_BLUE:
-            plate_doors = np.argwhere(self.map == swoq_pb2.TILE_DOOR_BLUE)
-        else:
-            plate_doors = []
+            self.move_to_closest(i, in_front_positions, 'plate_door')
 
-        if np.any(plate_doors):
-            # player 1 stands on plates
-            # player 2 moves to plate doors
-            if self.can_act2() and valid_pos(self.player1_pos): # Only with two players
-                in_front_positions = []
-                for d in plate_doors:
-                    d = tuple(d)
-                    if self.map[d[0]-1, d[1]] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0]-1, d[1]))
-                    if self.map[d[0]+1, d[1]] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0]+1, d[1]))
-                    if self.map[d[0], d[1]-1] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0], d[1]-1))
-                    if self.map[d[0], d[1]+1] == swoq_pb2.TILE_EMPTY: in_front_positions.append((d[0], d[1]+1))
 
-                self.move_to_closest_2(in_front_positions, 'plate_door')
+    # Stages by name, so they can be timed separately
+    def wait_at_pressure_plate_door_1(self) -> None:
+        self.wait_at_pressure_plate_door(0)
+
+
+    def wait_at_pressure_plate_door_2(self) -> None:
+        self.wait_at_pressure_plate_door(1)
 
 
     def pickup_boulder(self) -> None:
-        boulders = np.argwhere(self.map == swoq_pb2.TILE_BOULDER)
+        if not (self.can_act1() and self.player1_inventory == 0) and not (self.can_act2() and self.player2_inventory == 0): return
+        boulders = self.tiles().positions(swoq_pb2.TILE_BOULDER)
         boulders = [b for b in boulders if tuple(b) not in self.plates_with_boulders]
         if np.any(boulders):
             if self.can_act1() and self.player1_inventory == 0:
-                self.use_closest_1(boulders, 'boulder')
+                self.use_closest(0, boulders, 'boulder')
             if self.can_act2() and self.player2_inventory == 0:
-                self.use_closest_2(boulders, 'boulder')
+                self.use_closest(1, boulders, 'boulder')
 
 
     def wait_at_random_door(self) -> None:
-        doors = np.argwhere((self.map == swoq_pb2.TILE_DOOR_RED) | (self.map == swoq_pb2.TILE_DOOR_GREEN) | (self.map == swoq_pb2.TILE_DOOR_BLUE))
+        if not self.can_act_any(): return
+        doors = self.tiles().positions('door')
         for door_pos in doors:
             door_pos = tuple(door_pos)
 
@@ -864,112 +1104,93 @@ class GamePlayer:
                 (door_tile == swoq_pb2.TILE_DOOR_GREEN and self.player2_inventory == swoq_pb2.INVENTORY_KEY_GREEN) or \
                 (door_tile == swoq_pb2.TILE_DOOR_BLUE and self.player2_inventory == swoq_pb2.INVENTORY_KEY_BLUE)
 
-            if self.can_act1() and not player2_has_key and self.can_1_reach(door_pos):
+            if self.can_act1() and not player2_has_key and self.can_reach(0, door_pos):
                 if euclid_dist(self.player1_pos, door_pos) > 1:
                     if self.print: print('move_random_door1')
-                    self.move_to_1(door_pos)
-            elif self.can_act2() and not player1_has_key and self.can_2_reach(door_pos):
+                    self.move_to(0, door_pos)
+            elif self.can_act2() and not player1_has_key and self.can_reach(1, door_pos):
                 if euclid_dist(self.player2_pos, door_pos) > 1:
                     if self.print: print('move_random_door2')
-                    self.move_to_2(door_pos)
+                    self.move_to(1, door_pos)
 
 
     def handle_level20(self) -> None:
         if valid_pos(self.player1_pos) and self.player1_pos[1] < 8:
             # Move player 2 to plate
-            plates = np.argwhere((self.map == swoq_pb2.TILE_PRESSURE_PLATE_RED) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_GREEN) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_BLUE))
+            plates = self.tiles().positions('plate')
             plates = list([p for p in plates if p[1] < 8])
             if np.any(plates) and self.can_act2():
                 self.plate_pos_2 = tuple(plates[0])
                 self.plate_color_2 = self.map[self.plate_pos_2]
                 if self.print: print('plate2_18')
-                self.move_to_2(self.plate_pos_2)
+                self.move_to(1, self.plate_pos_2)
         else:
             self.remain_on_plate_counter_2 = 0
 
         if valid_pos(self.player2_pos) and self.player2_pos[0] < 11:
             # Move player 1 to second plate
-            plates = np.argwhere((self.map == swoq_pb2.TILE_PRESSURE_PLATE_RED) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_GREEN) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_BLUE))
+            plates = self.tiles().positions('plate')
             plates = list([p for p in plates if p[1] >= 8])
             if np.any(plates) and self.can_act1():
                 self.plate_pos_1 = tuple(plates[0])
                 self.plate_color_1 = self.map[self.plate_pos_1]
                 if self.print: print('plate1_18')
-                self.move_to_1(self.plate_pos_1)
+                self.move_to(0, self.plate_pos_1)
         else:
             self.remain_on_plate_counter_1 = 0
 
 
-    def can_1_reach(self, pos) -> bool:
-        return get_direction(self.player1_pos, pos, self.player1_distances, self.player1_paths) is not None
+    def can_reach(self, i:int, pos) -> bool:
+        return self.direction(i, pos) is not None
 
-    def can_2_reach(self, pos) -> bool:
-        return get_direction(self.player2_pos, pos, self.player2_distances, self.player2_paths) is not None
 
-
-    def use_closest_1(self, positions, name) -> tuple[tuple[int, int]|None, bool]:
-        if not self.can_act1():
+    def use_closest(self, i:int, positions, name) -> tuple[tuple[int, int]|None, bool]:
+        if not self.can_act(i):
             return None, False
-        pos, dir = self.find_closest(positions, self.player1_pos, self.player1_distances, self.player1_paths)
+        player_pos = self.players[i].pos
+        pos, dir = self.find_closest(positions, player_pos, *self.player_paths(i))
         if dir is None or pos is None:
             return None, False
 
-        if are_adjacent(self.player1_pos, pos):
-            if self.print: print(f'{name}_use_1')
-            self.queue_use1(dir)
+        if are_adjacent(player_pos, pos):
+            if self.print: print(f'{name}_use_{i+1}')
+            self.queue_use(i, dir)
             return pos, True
         else:
-            if self.print: print(f'{name}_move_1')
-            self.queue_move1(dir)
+            if self.print: print(f'{name}_move_{i+1}')
+            self.queue_move(i, dir)
             return pos, False
 
-    def use_closest_2(self, positions, name) -> tuple[tuple[int, int]|None, bool]:
-        if not self.can_act2():
-            return None, False
-        pos, dir = self.find_closest(positions, self.player2_pos, self.player2_distances, self.player2_paths)
-        if dir is None or pos is None:
-            return None, False
-
-        if are_adjacent(self.player2_pos, pos):
-            if self.print: print(f'{name}_use_2')
-            self.queue_use2(dir)
-            return pos, True
-        else:
-            if self.print: print(f'{name}_move_2')
-            self.queue_move2(dir)
-            return pos, False
 
-    def move_to_closest_1(self, positions, name):
-        if not self.can_act1():
+    def move_to_closest(self, i:int, positions, name):
+        if not self.can_act(i):
             return None
 
-        pos, dir = self.find_closest(positions, self.player1_pos, self.player1_distances, self.player1_paths)
+        pos, dir = self.find_closest(positions, self.players[i].pos, *self.player_paths(i))
         if dir is None or pos is None:
             return None
 
-        if self.print: print(f'{name}_move_1')
-        self.queue_move1(dir)
+        if self.print: print(f'{name}_move_{i+1}')
+        self.queue_move(i, dir)
         return pos
 
-    def move_to_closest_2(self, positions, name):
-        if not self.can_act2():
-            return None
-
-        pos, dir = self.find_closest(positions, self.player2_pos, self.player2_distances, self.player2_paths)
-        if dir is None or pos is None:
-            return None
-
-        if self.print: print(f'{name}_move_2')
-        self.queue_move2(dir)
-        return pos
 
     def find_closest(self, positions, player_pos, player_distances, player_paths) -> tuple[tuple[int,int]|None, str|None]:
+        # A tile kind instead of positions is looked up in one go. That gives
+        # the target a scan of the positions would pick, the first step is
+        # taken from the paths of the player like for the scan.
+        if isinstance(positions, (str, int)):
+            pos, dir, _ = self.nearest_targets().closest(positions, player_pos)
+            if pos is not None:
+                dir, _ = self.direction_and_distance(player_pos, pos, player_distances, player_paths)
+            return pos, dir
+
         min_dist = None
         min_dir = None
         min_pos = None
         for pos in positions:
             pos = tuple(pos)
-            dir, dist = get_direction_and_distance(player_pos, pos, player_distances, player_paths)
+            dir, dist = self.direction_and_distance(player_pos, pos, player_distances, player_paths)
             if min_dist is None or dist < min_dist:
                 min_dist = dist
                 min_dir = dir
@@ -996,56 +1217,58 @@ class GamePlayer:
 
     def level21_wait_at_plate_2(self) -> None:
         if self.can_act2():
-            plates = np.argwhere((self.map == swoq_pb2.TILE_PRESSURE_PLATE_RED) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_GREEN) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_BLUE))
+            plates = self.tiles().positions('plate')
             if np.any(plates):
-                plate_pos = self.move_to_closest_2(plates, 'plate')
+                plate_pos = self.move_to_closest(1, 'plate', 'plate')
                 if plate_pos is not None:
                     self.plate_pos_2 = plate_pos
                     self.plate_color_2 = self.map[self.plate_pos_2]
 
     def level21_wait_at_plate_1(self) -> None:
         if self.can_act1():
-            plates = np.argwhere((self.map == swoq_pb2.TILE_PRESSURE_PLATE_RED) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_GREEN) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_BLUE))
+            plates = self.tiles().positions('plate')
             if np.any(plates):
-                plate_pos = self.move_to_closest_1(plates, 'plate')
+                plate_pos = self.move_to_closest(0, 'plate', 'plate')
                 if plate_pos is not None:
                     self.plate_pos_1 = plate_pos
                     self.plate_color_1 = self.map[self.plate_pos_1]
 
     def level21_place_boulder(self) -> None:
-        plates = np.argwhere((self.map == swoq_pb2.TILE_PRESSURE_PLATE_RED) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_GREEN) | (self.map == swoq_pb2.TILE_PRESSURE_PLATE_BLUE))
+        if not self.can_act_any(): return
+
+        plates = self.tiles().positions('plate')
         if np.any(plates):
             if self.can_act1() and self.player1_inventory == swoq_pb2.INVENTORY_BOULDER:
-                plate_pos, placed = self.use_closest_1(plates, 'plate_boulder')
+                plate_pos, placed = self.use_closest(0, 'plate', 'plate_boulder')
                 if plate_pos is not None:
                     self.plate_pos_1 = plate_pos
                     self.plate_color_1 = self.map[self.plate_pos_1]
                 if placed:
-                    self.plates_with_boulders.append(self.plate_pos_1)
+                    self.plates_with_boulders.add(self.plate_pos_1)
             if self.can_act2() and self.player2_inventory == swoq_pb2.INVENTORY_BOULDER:
-                plate_pos, placed = self.use_closest_2(plates, 'plate_boulder')
+                plate_pos, placed = self.use_closest(1, 'plate', 'plate_boulder')
                 if plate_pos is not None:
                     self.plate_pos_2 = plate_pos
                     self.plate_color_2 = self.map[self.plate_pos_2]
                 if placed:
-                    self.plates_with_boulders.append(self.plate_pos_2)
+                    self.plates_with_boulders.add(self.plate_pos_2)
 
 
     def store_plate_door_positions(self) -> None:
-        plates = np.argwhere(self.map == swoq_pb2.TILE_PRESSURE_PLATE_RED)
-        doors = np.argwhere(self.map == swoq_pb2.TILE_DOOR_RED)
+        plates = self.tiles().positions(swoq_pb2.TILE_PRESSURE_PLATE_RED)
+        doors = self.tiles().positions(swoq_pb2.TILE_DOOR_RED)
         if np.any(plates) and np.any(doors):
             for pos in doors:
                 self.plate_door_positions.add(tuple(pos))
 
-        plates = np.argwhere(self.map == swoq_pb2.TILE_PRESSURE_PLATE_GREEN)
-        doors = np.argwhere(self.map == swoq_pb2.TILE_DOOR_GREEN)
+        plates = self.tiles().positions(swoq_pb2.TILE_PRESSURE_PLATE_GREEN)
+        doors = self.tiles().positions(swoq_pb2.TILE_DOOR_GREEN)
         if np.any(plates) and np.any(doors):
             for pos in doors:
                 self.plate_door_positions.add(tuple(pos))
 
-        plates = np.argwhere(self.map == swoq_pb2.TILE_PRESSURE_PLATE_BLUE)
-        doors = np.argwhere(self.map == swoq_pb2.TILE_DOOR_BLUE)
+        plates = self.tiles().positions(swoq_pb2.TILE_PRESSURE_PLATE_BLUE)
+        doors = self.tiles().positions(swoq_pb2.TILE_DOOR_BLUE)
         if np.any(plates) and np.any(doors):
             for pos in doors:
                 self.plate_door_positions.add(tuple(pos))
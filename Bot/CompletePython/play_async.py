@@ -0,0 +1,155 @@
+import asyncio
+import sys
+import grpc
+import swoq_pb2
+import swoq_pb2_grpc
+import numpy as np
+from collections import Counter
+from collections.abc import Iterable
+from metrics import Metrics
+from channels import ChannelPool, PooledStub, default_target, shared_pool
+from play import GamePlayer
+import random_train
+from time import perf_counter_ns
+
+
+class AsyncGamePlayer(GamePlayer):
+
+    # The stub must come from a grpc.aio channel, which is shared between players
+    def __init__(self, user_id:str, user_name:str, stub:swoq_pb2_grpc.GameServiceStub, plot:bool=False, print:bool=False, replays_folder:str|None=None, compress_replays:bool=False, metrics:Metrics|None=None, pipeline:bool=False):
+        super().__init__(user_id, user_name, plot=plot, print=print, stub=stub, replays_folder=replays_folder, compress_replays=compress_replays, metrics=metrics, pipeline=pipeline)
+
+
+    async def __aenter__(self) -> object:
+        return self
+
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+    async def start(self, level:int=None, seed:int=None, queue_timeout:float|None=None) -> None:
+        startRequest = self._start_request(level, seed)
+        startResponse = await self.stub.Start(startRequest)
+        self._print_start_result(startResponse)
+
+        # Other sessions continue while this one waits in the queue
+        delays = self._queue_delays(queue_timeout)
+        while startResponse.result == swoq_pb2.START_RESULT_QUEST_QUEUED:
+            await asyncio.sleep(next(delays))
+            startResponse = await self.stub.Start(startRequest)
+            self._print_start_result(startResponse)
+
+        self._handle_start_response(startRequest, startResponse)
+
+
+    async def act(self):
+        request = self._act_request()
+        if self.metrics is None:
+            response = await self._call_act(request)
+        else:
+            start = perf_counter_ns()
+            response = await self._call_act(request)
+            self.metrics.add_act(self, perf_counter_ns() - start)
+        return self._handle_act_response(request, response)
+
+
+    async def _call_act(self, request:swoq_pb2.ActRequest) -> swoq_pb2.ActResponse:
+        call = self.stub.Act(request)
+        if self.pipeline:
+            # Let the call be sent first, the speculation does not yield to the event loop
+            await asyncio.sleep(0)
+            self._speculate(request)
+        return await call
+
+
+    async def step(self) -> None:
+        if self.finished: return
+        self.plan()
+        await self.act()
+        self.update_remain_on_plate()
+
+
+    async def step_randomly(self) -> None:
+        self.plan_randomly()
+        await self.act()
+        self.update_remain_on_plate()
+
+
+async def play_game(stub:swoq_pb2_grpc.GameServiceStub, user_id:str, user_name:str, level:int|None=None, random_rate:float=0.05) -> int:
+    async with AsyncGamePlayer(user_id, user_name, stub) as player:
+        await player.start(level)
+        while not player.finished:
+            if np.random.uniform() < random_rate:
+                await player.step_randomly()
+            else:
+                await player.step()
+        return player.status
+
+
+async def run_sessions(games:Iterable[tuple[str,str,int|None]], target:str=default_target, max_concurrent:int=64, channels:ChannelPool|None=None) -> Counter:
+    results = Counter()
+
+    # An aio channel belongs to the event loop, only the settings of the pool are shared
+    pool = channels or shared_pool()
+    async with grpc.aio.insecure_channel(target, options=pool.options(), compression=pool.grpc_compression()) as channel:
+        stub = PooledStub(channel, pool.timeout)
+
+        # A bounded queue, so an endless stream of games only gets ahead of the workers by a little
+        queue = asyncio.Queue(maxsize=max_concurrent)
+
+        async def worker() -> None:
+            while True:
+                game = await queue.get()
+                if game is None: break
+                try:
+                    status = await play_game(stub, *game)
+                    results[swoq_pb2.GameStatus.Name(status)] += 1
+                except Exception as e:
+                    print(f'Game {game} failed: {e}')
+                    results['ERROR'] += 1
+
+        workers = [asyncio.create_task(worker()) for _ in range(max_concurrent)]
+        try:
+            for game in games:
+                await queue.put(game)
+            for _ in workers:
+                await queue.put(None)
+            await asyncio.gather(*workers)
+        finally:
+            for w in workers:
+                w.cancel()
+
+    return results
+
+
+def random_games(users:list[tuple[str,str]]) -> Iterable[tuple[str,str,int|None]]:
+    if not users:
+        raise ValueError('No users to play with')
+    while True:
+        user_id, user_name = users[np.random.choice(len(users))]
+        level = np.random.randint(23)
+        yield user_id, user_name, level
+
+
+def parse_users(args:list[str]) -> list[tuple[str,str]]:
+    # Users as user_id or user_id:user_name, the name defaults to the one of random_train (SWOQ_USER_NAME).
+    # Without arguments the users of random_train are used, like orchestrate does.
+    if not args:
+        return [(user_id, random_train.user_name) for user_id in random_train.user_ids]
+    users = []
+    for arg in args:
+        user_id, _, user_name = arg.partition(':')
+        users.append((user_id, user_name or random_train.user_name))
+    return users
+
+
+def main() -> None:
+    users = parse_users(sys.argv[1:])
+    if not users or not all(user_id and user_name for user_id, user_name in users):
+        sys.exit('usage: python play_async.py [user_id[:user_name] ...], the name defaults to SWOQ_USER_NAME')
+    asyncio.run(run_sessions(random_games(users), max_concurrent=128))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,23 +1,30 @@
+import os
+import sys
 from play import GamePlayer
 import numpy as np
 
 user_ids = ['6616b1c5bd0a697480a68319', '663d47788054476b438b61f4', '66ae2054d052c6450c7b989a', '66cc90ae4c4ef9502593aed0', '679236542b33d1e958d4ed8e']
+# The server looks users up by id and name, the name is that of the user ids
+user_name = os.environ.get('SWOQ_USER_NAME')
 
 
-def quest(user_id:str) -> None:
-    with GamePlayer(user_id=user_id, plot=False, print=False) as player:
+def quest(user_id:str, user_name:str) -> tuple[int,dict[int,int]]:
+    with GamePlayer(user_id=user_id, user_name=user_name, plot=False, print=False) as player:
         player.start()
         while not player.finished:
             if np.random.uniform() < 0.05: # 1 in 20 steps random
                 player.step_randomly()
             else:
                 player.step()
+        return player.status, player.level_ticks
 
 
 def main() -> None:
+    if not user_name:
+        sys.exit('Set SWOQ_USER_NAME to the user name of the user ids')
     while True:
         user_id = np.random.choice(user_ids)
-        quest(user_id)
+        quest(user_id, user_name)
 
 
 if __name__ == '__main__':
@@ -0,0 +1,32 @@
+import swoq_pb2
+
+
+class PlayerView:
+
+    # One player as decoded from the state of a tick. Everything is None when
+    # the player is not in the game (anymore).
+    __slots__ = ('pos', 'health', 'inventory', 'has_sword')
+
+    def __init__(self, pos:tuple[int,int]|None=None, health:int|None=None, inventory:int|None=None, has_sword:bool|None=None):
+        self.pos = pos
+        self.health = health
+        self.inventory = inventory
+        self.has_sword = has_sword
+
+
+    @classmethod
+    def decode(cls, state:swoq_pb2.State, field:str) -> 'PlayerView':
+        # Field is 'playerState' or 'player2State', looked up once
+        if not state.HasField(field):
+            return cls()
+        player_state = getattr(state, field)
+        position = player_state.position
+        return cls((position.y, position.x), player_state.health, player_state.inventory, player_state.hasSword)
+
+
+    def __repr__(self) -> str:
+        return f'pos={self.pos}, health={self.health}, inventory={self.inventory}, has_sword={self.has_sword}'
+
+
+def decode_players(state:swoq_pb2.State) -> tuple[PlayerView, PlayerView]:
+    return PlayerView.decode(state, 'playerState'), PlayerView.decode(state, 'player2State')
@@ -1,24 +1,31 @@
+import os
+import sys
 from play import GamePlayer
 import numpy as np
 
 user_ids = ['6616b1c5bd0a697480a68319', '663d47788054476b438b61f4', '66ae2054d052c6450c7b989a']
+# The server looks users up by id and name, the name is that of the user ids
+user_name = os.environ.get('SWOQ_USER_NAME')
 
 
-def train(user_id:str, level:(int|None)) -> None:
-    with GamePlayer(user_id=user_id, plot=False, print=False) as player:
+def train(user_id:str, user_name:str, level:(int|None), stub=None) -> tuple[int,dict[int,int]]:
+    with GamePlayer(user_id=user_id, user_name=user_name, plot=False, print=False, stub=stub) as player:
         player.start(level)
         while not player.finished:
             if np.random.uniform() < 0.05: # 1 in 20 steps random
                 player.step_randomly()
             else:
                 player.step()
+        return player.status, player.level_ticks
 
 
 def main() -> None:
+    if not user_name:
+        sys.exit('Set SWOQ_USER_NAME to the user name of the user ids')
     while True:
         user_id = np.random.choice(user_ids)
         level = np.random.randint(23)
-        train(user_id, level)
+        train(user_id, user_name, level)
 
 
 if __name__ == '__main__':
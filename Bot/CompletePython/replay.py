@@ -0,0 +1,302 @@
+import gzip
+import mmap
+import multiprocessing as mp
+import numpy as np
+import os
+import threading
+from datetime import datetime
+from glob import glob
+from google.protobuf.message import Message
+import swoq_pb2
+
+
+def encode_varint(value:int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def encode_delimited(message:Message) -> bytes:
+    # Same as WriteDelimitedTo in C#, a varint length followed by the message
+    data = message.SerializeToString()
+    return encode_varint(len(data)) + data
+
+
+def replay_filename(folder:str, request:swoq_pb2.StartRequest, response:swoq_pb2.StartResponse, compress:bool=False) -> str:
+    # Same name as the C# bot uses
+    date_time = datetime.now().strftime('%Y%m%d-%H%M%S')
+    filename = f'{request.userName} - {date_time} - {response.gameId}.swoq'
+    if compress:
+        filename += '.gz'
+    return os.path.join(folder, filename)
+
+
+class ReplayWriter:
+
+    # Writes a replay in the same format as ReplayFile of the C# bot: the delimited
+    # StartRequest and StartResponse, followed by delimited ActRequest and ActResponse pairs.
+    # Messages are only serialized on the calling thread, a background thread
+    # writes them to the file in batches.
+    def __init__(self, path:str, request:swoq_pb2.StartRequest, response:swoq_pb2.StartResponse, compress:bool=False, flush_interval:float=1.0, max_buffered:int=1 << 20):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.file = gzip.open(path, 'xb') if compress else open(path, 'xb')
+        self.flush_interval = flush_interval
+        self.max_buffered = max_buffered
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._pending = []
+        self._pending_size = 0
+        self._closed = False
+        self._error = None
+
+        self._write(encode_delimited(request) + encode_delimited(response))
+        self._thread = threading.Thread(target=self._run, name=f'ReplayWriter({os.path.basename(path)})', daemon=True)
+        self._thread.start()
+
+
+    @classmethod
+    def create(cls, folder:str, request:swoq_pb2.StartRequest, response:swoq_pb2.StartResponse, compress:bool=False, **kwargs) -> object:
+        return cls(replay_filename(folder, request, response, compress), request, response, compress=compress, **kwargs)
+
+
+    def append(self, request:swoq_pb2.ActRequest, response:swoq_pb2.ActResponse) -> None:
+        self._write(encode_delimited(request) + encode_delimited(response))
+
+
+    def _write(self, data:bytes) -> None:
+        if self._error is not None: raise self._error
+        if self._closed: raise ValueError('Replay is closed')
+        with self._lock:
+            self._pending.append(data)
+            self._pending_size += len(data)
+            full = self._pending_size >= self.max_buffered
+        if full:
+            self._wakeup.set()
+
+
+    def _run(self) -> None:
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self._flush_pending()
+            except Exception as e:
+                # Reported on the next append or on close
+                self._error = e
+                return
+
+
+    def _flush_pending(self) -> None:
+        with self._lock:
+            pending = self._pending
+            self._pending = []
+            self._pending_size = 0
+        if pending:
+            self.file.write(b''.join(pending))
+            self.file.flush()
+
+
+    def close(self) -> None:
+        if self._closed: return
+        self._closed = True
+        self._wakeup.set()
+        self._thread.join()
+        try:
+            if self._error is None:
+                self._flush_pending()
+        finally:
+            self.file.close()
+        if self._error is not None:
+            raise self._error
+
+
+    def __enter__(self) -> object:
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+# Reading
+
+def decode_varint(data, offset:int) -> tuple[int,int]:
+    value = 0
+    shift = 0
+    while True:
+        b = data[offset]
+        offset += 1
+        value |= (b & 0x7F) << shift
+        if b < 0x80:
+            return value, offset
+        shift += 7
+
+
+def index_messages(data) -> tuple[np.ndarray[np.int64], np.ndarray[np.int64]]:
+    # Start and end of every delimited message. A truncated last message, of a
+    # replay that is still being written, is left out.
+    starts = []
+    ends = []
+    offset = 0
+    size = len(data)
+    while offset < size:
+        try:
+            length, start = decode_varint(data, offset)
+        except IndexError:
+            break
+        if start + length > size: break
+        starts.append(start)
+        ends.append(start + length)
+        offset = start + length
+    return np.array(starts, dtype=np.int64), np.array(ends, dtype=np.int64)
+
+
+table_columns = ('tick', 'level', 'status', 'result', 'action1', 'action2',
+                 'player1_y', 'player1_x', 'player1_health', 'player2_y', 'player2_x', 'player2_health')
+
+
+class ReplayReader:
+
+    # Memory maps a replay and indexes the message offsets once. Messages are
+    # only parsed when asked for, so seeking to any tick is cheap.
+    # Compressed replays are decompressed into memory instead.
+    def __init__(self, path:str):
+        self.path = path
+        self._mmap = None
+        if path.endswith('.gz'):
+            with gzip.open(path, 'rb') as f:
+                self._data = f.read()
+        else:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size > 0:
+                    self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                    self._data = self._mmap
+                else:
+                    self._data = b''
+        self._starts, self._ends = index_messages(self._data)
+        if len(self._starts) < 2:
+            self.close()
+            raise ValueError(f'Not a replay: {path}')
+
+
+    def close(self) -> None:
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._data = b''
+
+
+    def __enter__(self) -> object:
+        return self
+
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+    def _parse(self, index:int, message_type:type) -> Message:
+        return message_type.FromString(self._data[self._starts[index]:self._ends[index]])
+
+
+    @property
+    def start_request(self) -> swoq_pb2.StartRequest:
+        return self._parse(0, swoq_pb2.StartRequest)
+
+
+    @property
+    def start_response(self) -> swoq_pb2.StartResponse:
+        return self._parse(1, swoq_pb2.StartResponse)
+
+
+    # Number of acts, an act without its response is left out
+    def __len__(self) -> int:
+        return (len(self._starts) - 2) // 2
+
+
+    def act(self, index:int) -> tuple[swoq_pb2.ActRequest, swoq_pb2.ActResponse]:
+        if not -len(self) <= index < len(self): raise IndexError(index)
+        index %= len(self)
+        return self._parse(2 + 2*index, swoq_pb2.ActRequest), self._parse(3 + 2*index, swoq_pb2.ActResponse)
+
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self.act(index)
+
+
+    # The state at the given tick, with the act that led to it (None for the start state)
+    def seek(self, tick:int) -> tuple[swoq_pb2.ActRequest|None, swoq_pb2.State]:
+        state = self.start_response.state
+        if state.tick == tick: return None, state
+
+        # Ticks never decrease, so a binary search only parses a few responses.
+        # The first act with the tick is the one that led to it.
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._parse(3 + 2*mid, swoq_pb2.ActResponse).state.tick < tick:
+                lo = mid + 1
+            else:
+                hi = mid
+        if lo < len(self):
+            request, response = self.act(lo)
+            if response.state.tick == tick: return request, response.state
+        raise KeyError(f'Tick {tick} not in replay')
+
+
+    def to_table(self) -> dict[str,np.ndarray]:
+        # One row per state, the first is the start state. Missing values are -1.
+        n = len(self) + 1
+        table = {name: np.full(n, -1, dtype=np.int32) for name in table_columns}
+
+        def set_state(row:int, state:swoq_pb2.State) -> None:
+            table['tick'][row] = state.tick
+            table['level'][row] = state.level
+            table['status'][row] = state.status
+            if state.HasField('playerState'):
+                table['player1_y'][row] = state.playerState.position.y
+                table['player1_x'][row] = state.playerState.position.x
+                table['player1_health'][row] = state.playerState.health
+            if state.HasField('player2State'):
+                table['player2_y'][row] = state.player2State.position.y
+                table['player2_x'][row] = state.player2State.position.x
+                table['player2_health'][row] = state.player2State.health
+
+        set_state(0, self.start_response.state)
+        for row, (request, response) in enumerate(self, start=1):
+            if request.HasField('action'): table['action1'][row] = request.action
+            if request.HasField('action2'): table['action2'][row] = request.action2
+            table['result'][row] = response.result
+            if response.HasField('state'):
+                set_state(row, response.state)
+        return table
+
+
+def read_table(path:str) -> tuple[str,dict[str,np.ndarray]|None]:
+    try:
+        with ReplayReader(path) as reader:
+            return path, reader.to_table()
+    except Exception as e:
+        print(f'Failed to read {path}: {e}')
+        return path, None
+
+
+def scan_archive(folder:str, processes:int|None=None, chunksize:int=8) -> tuple[list[str],dict[str,np.ndarray]]:
+    # Tables of all replays in the folder, read by a pool of processes and
+    # concatenated into one. The game column is the index in the returned paths.
+    paths = sorted(glob(os.path.join(folder, '**', '*.swoq'), recursive=True) + glob(os.path.join(folder, '**', '*.swoq.gz'), recursive=True))
+    with mp.Pool(processes) as pool:
+        results = [(path, table) for path, table in pool.imap(read_table, paths, chunksize=chunksize) if table is not None]
+
+    games = [path for path, _ in results]
+    tables = [table for _, table in results]
+    combined = {name: np.concatenate([t[name] for t in tables]) if tables else np.zeros(0, dtype=np.int32) for name in table_columns}
+    combined['game'] = np.concatenate([np.full(len(t['tick']), i, dtype=np.int32) for i, t in enumerate(tables)]) if tables else np.zeros(0, dtype=np.int32)
+    return games, combined
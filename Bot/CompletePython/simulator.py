@@ -0,0 +1,927 @@
+import itertools
+import numpy as np
+from collections import deque
+from math import ceil, floor
+import swoq_pb2
+import swoq_pb2_grpc
+from distance_field import compute_target_field
+
+# Same parameters as the server
+map_height = 48
+map_width = 64
+visibility_range = 8
+enemy_visibility_range = 5
+extra_health = 3
+max_level = 22
+max_level_ticks = 10000
+max_no_progress_ticks = 1000
+max_inactivity_ticks = 500
+min_idle_move_distance = 5
+player_health = 5
+enemy_health = 6
+enemy_damage = 1
+boss_health = 100
+boss_damage = 100
+
+# Cells as stored by the server, these include the state hidden from the tiles
+(CELL_UNKNOWN, CELL_EMPTY, CELL_WALL, CELL_EXIT,
+ CELL_DOOR_RED_CLOSED, CELL_DOOR_RED_OPEN, CELL_KEY_RED, CELL_PLATE_RED,
+ CELL_DOOR_GREEN_CLOSED, CELL_DOOR_GREEN_OPEN, CELL_KEY_GREEN, CELL_PLATE_GREEN,
+ CELL_DOOR_BLUE_CLOSED, CELL_DOOR_BLUE_OPEN, CELL_KEY_BLUE, CELL_PLATE_BLUE,
+ CELL_SWORD, CELL_HEALTH, CELL_BOULDER,
+ CELL_PLATE_RED_BOULDER, CELL_PLATE_GREEN_BOULDER, CELL_PLATE_BLUE_BOULDER,
+ CELL_TREASURE) = range(23)
+
+# Per color (red, green, blue)
+closed_doors = (CELL_DOOR_RED_CLOSED, CELL_DOOR_GREEN_CLOSED, CELL_DOOR_BLUE_CLOSED)
+open_doors = (CELL_DOOR_RED_OPEN, CELL_DOOR_GREEN_OPEN, CELL_DOOR_BLUE_OPEN)
+keys = (CELL_KEY_RED, CELL_KEY_GREEN, CELL_KEY_BLUE)
+plates = (CELL_PLATE_RED, CELL_PLATE_GREEN, CELL_PLATE_BLUE)
+plates_with_boulder = (CELL_PLATE_RED_BOULDER, CELL_PLATE_GREEN_BOULDER, CELL_PLATE_BLUE_BOULDER)
+key_inventory = (swoq_pb2.INVENTORY_KEY_RED, swoq_pb2.INVENTORY_KEY_GREEN, swoq_pb2.INVENTORY_KEY_BLUE)
+
+_cell_tiles = np.array([
+    swoq_pb2.TILE_UNKNOWN, swoq_pb2.TILE_EMPTY, swoq_pb2.TILE_WALL, swoq_pb2.TILE_EXIT,
+    swoq_pb2.TILE_DOOR_RED, swoq_pb2.TILE_EMPTY, swoq_pb2.TILE_KEY_RED, swoq_pb2.TILE_PRESSURE_PLATE_RED,
+    swoq_pb2.TILE_DOOR_GREEN, swoq_pb2.TILE_EMPTY, swoq_pb2.TILE_KEY_GREEN, swoq_pb2.TILE_PRESSURE_PLATE_GREEN,
+    swoq_pb2.TILE_DOOR_BLUE, swoq_pb2.TILE_EMPTY, swoq_pb2.TILE_KEY_BLUE, swoq_pb2.TILE_PRESSURE_PLATE_BLUE,
+    swoq_pb2.TILE_SWORD, swoq_pb2.TILE_HEALTH, swoq_pb2.TILE_BOULDER,
+    swoq_pb2.TILE_BOULDER, swoq_pb2.TILE_BOULDER, swoq_pb2.TILE_BOULDER,
+    swoq_pb2.TILE_TREASURE,
+], dtype=np.int8)
+
+_walkable = np.zeros(len(_cell_tiles), dtype=bool)
+_walkable[[CELL_EMPTY, CELL_EXIT, *open_doors, *keys, *plates, CELL_SWORD, CELL_HEALTH, CELL_TREASURE]] = True
+
+# Enemies only enter cells that appear empty
+_enemy_walkable = np.zeros(len(_cell_tiles), dtype=bool)
+_enemy_walkable[[CELL_EMPTY, *open_doors]] = True
+
+_cell_inventory = np.zeros(len(_cell_tiles), dtype=np.int8)
+_cell_inventory[list(keys)] = key_inventory
+_cell_inventory[[CELL_BOULDER, *plates_with_boulder]] = swoq_pb2.INVENTORY_BOULDER
+_cell_inventory[CELL_TREASURE] = swoq_pb2.INVENTORY_TREASURE
+
+_inventory_loot = {
+    swoq_pb2.INVENTORY_KEY_RED: CELL_KEY_RED,
+    swoq_pb2.INVENTORY_KEY_GREEN: CELL_KEY_GREEN,
+    swoq_pb2.INVENTORY_KEY_BLUE: CELL_KEY_BLUE,
+    swoq_pb2.INVENTORY_BOULDER: CELL_BOULDER,
+    swoq_pb2.INVENTORY_TREASURE: CELL_TREASURE,
+}
+
+_moves = {
+    swoq_pb2.DIRECTED_ACTION_MOVE_NORTH: (-1, 0),
+    swoq_pb2.DIRECTED_ACTION_MOVE_EAST: (0, 1),
+    swoq_pb2.DIRECTED_ACTION_MOVE_SOUTH: (1, 0),
+    swoq_pb2.DIRECTED_ACTION_MOVE_WEST: (0, -1),
+}
+_uses = {
+    swoq_pb2.DIRECTED_ACTION_USE_NORTH: (-1, 0),
+    swoq_pb2.DIRECTED_ACTION_USE_EAST: (0, 1),
+    swoq_pb2.DIRECTED_ACTION_USE_SOUTH: (1, 0),
+    swoq_pb2.DIRECTED_ACTION_USE_WEST: (0, -1),
+}
+
+
+class ActError(Exception):
+
+    def __init__(self, result:int):
+        super().__init__(swoq_pb2.ActResult.Name(result))
+        self.result = result
+
+
+def _ray_cells(src_x:float, src_y:float, dst_x:float, dst_y:float) -> list[tuple[int,int]]:
+    # The cells that have to be walkable for a ray to pass, the same steps as
+    # MapVisibility.IsVisible on the server. Coordinates are never negative,
+    # so truncating is the same as on the server.
+    cells = []
+    dx = dst_x - src_x
+    dy = dst_y - src_y
+    if abs(dx) > 1e-6:
+        step_x = 1 if dx > 0 else -1
+        x = ceil(src_x) if step_x > 0 else floor(src_x)
+        step_y = step_x * dy / dx
+        y = src_y + (x - src_x) * dy / dx
+        while not (src_x < dst_x and x >= dst_x) and not (src_x > dst_x and x <= dst_x):
+            cells.append((int(y), int(x + step_x * 0.5)))
+            x += step_x
+            y += step_y
+    if abs(dy) > 1e-6:
+        step_y = 1 if dy > 0 else -1
+        y = ceil(src_y) if step_y > 0 else floor(src_y)
+        step_x = step_y * dx / dy
+        x = src_x + (y - src_y) * dx / dy
+        while not (src_y < dst_y and y >= dst_y) and not (src_y > dst_y and y <= dst_y):
+            cells.append((int(y + step_y * 0.5), int(x)))
+            y += step_y
+            x += step_x
+    return cells
+
+
+class VisibilityTable:
+
+    # The rays from the center of a window to every cell in it, precomputed once,
+    # so visibility of a whole window is a single gather over its walkable cells.
+    def __init__(self, visibility_range:int):
+        r = visibility_range
+        size = 2*r + 1
+        self.range = r
+        self.size = size
+
+        rays = [[] for _ in range(size*size)]
+        for ty in range(size):
+            for tx in range(size):
+                if (ty, tx) == (r, r) or (ty-r)**2 + (tx-r)**2 > r*r: continue
+                src = r + 0.5
+                target_rays = []
+                if r < tx: target_rays.append(_ray_cells(src, src, tx, ty + 0.5))
+                if r > tx: target_rays.append(_ray_cells(src, src, tx + 1, ty + 0.5))
+                if r < ty: target_rays.append(_ray_cells(src, src, tx + 0.5, ty))
+                if r > ty: target_rays.append(_ray_cells(src, src, tx + 0.5, ty + 1))
+                rays[ty*size + tx] = [[cy*size + cx for cy, cx in ray] for ray in target_rays]
+
+        # Unused rays never pass, padding of used rays always passes
+        self.always = size*size
+        self.never = size*size + 1
+        length = max([len(ray) for target_rays in rays for ray in target_rays] + [1])
+        self.rays = np.full((size*size, 4, length), self.never, dtype=np.intp)
+        for t, target_rays in enumerate(rays):
+            for i, ray in enumerate(target_rays):
+                self.rays[t, i, :] = self.always
+                self.rays[t, i, :len(ray)] = ray
+        self.rays[r*size + r, 0, :] = self.always
+
+
+    def visible(self, walkable_window:np.ndarray[bool]) -> np.ndarray[bool]:
+        passable = np.concatenate((walkable_window.ravel(), (True, False)))
+        return passable[self.rays].all(axis=2).any(axis=1).reshape(self.size, self.size)
+
+
+    def is_visible(self, walkable_window:np.ndarray[bool], offset:tuple[int,int]) -> bool:
+        dy, dx = offset
+        if abs(dy) > self.range or abs(dx) > self.range: return False
+        passable = np.concatenate((walkable_window.ravel(), (True, False)))
+        return bool(passable[self.rays[(dy + self.range)*self.size + dx + self.range]].all(axis=1).any())
+
+
+_player_visibility = VisibilityTable(visibility_range)
+_enemy_visibility = VisibilityTable(enemy_visibility_range)
+
+
+class Character:
+
+    def __init__(self, pos:tuple[int,int], health:int, inventory:int=swoq_pb2.INVENTORY_NONE, has_sword:bool=False, damage:int=0, is_boss:bool=False):
+        self.pos = pos # None when not present
+        self.health = health
+        self.inventory = inventory
+        self.has_sword = has_sword
+        self.damage = damage
+        self.is_boss = is_boss
+        self.is_triggered = False
+
+
+    @property
+    def alive(self) -> bool:
+        return self.health > 0
+
+
+    @property
+    def present(self) -> bool:
+        return self.pos is not None
+
+
+class PositionWindow:
+
+    # The last positions of a player, with their extent per axis kept up to
+    # date in monotonic queues, so the inactivity check needs no pass over them
+    def __init__(self, size:int):
+        self.size = size
+        self.count = 0
+        self._lowest = (deque(), deque())
+        self._highest = (deque(), deque())
+
+
+    def __len__(self) -> int:
+        return min(self.count, self.size)
+
+
+    def append(self, pos:tuple[int,int]) -> None:
+        index = self.count
+        self.count += 1
+        for axis in (0, 1):
+            value = pos[axis]
+            lowest, highest = self._lowest[axis], self._highest[axis]
+            while lowest and lowest[-1][1] >= value: lowest.pop()
+            while highest and highest[-1][1] <= value: highest.pop()
+            lowest.append((index, value))
+            highest.append((index, value))
+            if lowest[0][0] <= index - self.size: lowest.popleft()
+            if highest[0][0] <= index - self.size: highest.popleft()
+
+
+    def extent(self, axis:int) -> int:
+        return self._highest[axis][0][1] - self._lowest[axis][0][1]
+
+
+def _adjacent(a:tuple[int,int]|None, b:tuple[int,int]|None) -> bool:
+    return a is not None and b is not None and abs(a[0]-b[0]) + abs(a[1]-b[1]) == 1
+
+
+def _distance(a:tuple[int,int], b:tuple[int,int]) -> float:
+    return ((a[0]-b[0])**2 + (a[1]-b[1])**2) ** 0.5
+
+
+# Level generation, simplified from the server's generator. Every level is a
+# maze of rooms and corridors with the features of its level introduced in the
+# same order as on the server.
+
+def _carve_rooms(cells:np.ndarray[np.int8], rng:np.random.Generator, max_rooms:int, min_size:int, max_size:int) -> list[tuple[int,int,int,int]]:
+    height, width = cells.shape
+    taken = np.zeros(cells.shape, dtype=bool)
+    rooms = []
+    for _ in range(max_rooms):
+        h, w = (int(v) for v in rng.integers(min_size, max_size+1, size=2))
+        y = int(rng.integers(1, height - h - 1))
+        x = int(rng.integers(1, width - w - 1))
+        # Keep at least one wall between rooms
+        if taken[y-1:y+h+1, x-1:x+w+1].any(): continue
+        taken[y:y+h, x:x+w] = True
+        cells[y:y+h, x:x+w] = CELL_EMPTY
+        rooms.append((y, x, h, w))
+    return rooms
+
+
+def _connect_rooms(cells:np.ndarray[np.int8], rng:np.random.Generator, rooms:list[tuple[int,int,int,int]]) -> None:
+    # Connecting every room to the closest earlier room makes a spanning tree
+    centers = [(y + h//2, x + w//2) for y, x, h, w in rooms]
+    for i in range(1, len(rooms)):
+        y0, x0 = centers[i]
+        y1, x1 = min(centers[:i], key=lambda c: abs(c[0]-y0) + abs(c[1]-x0))
+        if rng.integers(2):
+            cells[y0, min(x0,x1):max(x0,x1)+1] = CELL_EMPTY
+            cells[min(y0,y1):max(y0,y1)+1, x1] = CELL_EMPTY
+        else:
+            cells[min(y0,y1):max(y0,y1)+1, x0] = CELL_EMPTY
+            cells[y1, min(x0,x1):max(x0,x1)+1] = CELL_EMPTY
+
+
+def _path_to_open(cells:np.ndarray[np.int8], reserved:np.ndarray[bool], start:tuple[int,int]) -> list[tuple[int,int]]|None:
+    # Shortest path through walls to the closest empty cell, for a corridor
+    height, width = cells.shape
+    prev = {start: None}
+    todo = deque([start])
+    while todo:
+        pos = todo.popleft()
+        if cells[pos] == CELL_EMPTY:
+            path = []
+            while pos is not None:
+                path.append(pos)
+                pos = prev[pos]
+            return path
+        y, x = pos
+        for n in ((y-1, x), (y+1, x), (y, x-1), (y, x+1)):
+            if 1 <= n[0] < height-1 and 1 <= n[1] < width-1 and n not in prev and not reserved[n]:
+                prev[n] = pos
+                todo.append(n)
+    return None
+
+
+def _add_chamber(cells:np.ndarray[np.int8], reserved:np.ndarray[bool], rng:np.random.Generator, away_from:list[tuple[int,int]], door:int, size:int=3, attempts:int=300) -> tuple[int,int]|None:
+    # A walled room with a single door, connected to the maze by a corridor.
+    # Of the candidates, the one farthest from the given positions is used.
+    height, width = cells.shape
+    block = size + 2
+    mid = block // 2
+    best = None
+    for _ in range(attempts):
+        y = int(rng.integers(0, height - block + 1))
+        x = int(rng.integers(0, width - block + 1))
+        if reserved[y:y+block, x:x+block].any() or np.any(cells[y:y+block, x:x+block] != CELL_WALL): continue
+        door_pos, outside = [
+            ((y, x+mid), (y-1, x+mid)),
+            ((y+block-1, x+mid), (y+block, x+mid)),
+            ((y+mid, x), (y+mid, x-1)),
+            ((y+mid, x+block-1), (y+mid, x+block)),
+        ][rng.integers(4)]
+        if not (1 <= outside[0] < height-1 and 1 <= outside[1] < width-1) or reserved[outside]: continue
+        dist = min((_distance(outside, p) for p in away_from), default=0)
+        if best is None or dist > best[0]:
+            best = (dist, y, x, door_pos, outside)
+    if best is None: return None
+
+    _, y, x, door_pos, outside = best
+    reserved[y:y+block, x:x+block] = True
+    path = _path_to_open(cells, reserved, outside)
+    if path is None:
+        reserved[y:y+block, x:x+block] = False
+        return None
+    for pos in path:
+        cells[pos] = CELL_EMPTY
+    cells[y+1:y+block-1, x+1:x+block-1] = CELL_EMPTY
+    cells[door_pos] = door
+    return (y+mid, x+mid)
+
+
+def _free_cells(cells:np.ndarray[np.int8], reserved:np.ndarray[bool], occupied:list[tuple[int,int]], inner:bool=False) -> np.ndarray[bool]:
+    free = (cells == CELL_EMPTY) & ~reserved
+    if inner:
+        # Only cells surrounded by empty cells, so they never block a corridor
+        empty = np.pad(cells == CELL_EMPTY, 1)
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                free &= empty[1+dy:empty.shape[0]-1+dy, 1+dx:empty.shape[1]-1+dx]
+    for pos in occupied:
+        free[pos] = False
+    return free
+
+
+def _claim_far_cell(cells:np.ndarray[np.int8], free:np.ndarray[bool], rng:np.random.Generator, away_from:list[tuple[int,int]]) -> tuple[int,int]:
+    # A random free cell among the quarter farthest from the given positions
+    walk_map = np.where(_walkable[cells], swoq_pb2.TILE_EMPTY, swoq_pb2.TILE_WALL).astype(np.int8)
+    sources = np.zeros(cells.shape, dtype=bool)
+    for pos in away_from:
+        sources[pos] = True
+    distances, _ = compute_target_field(walk_map, sources)
+    candidates = free & (distances >= 0)
+    if not candidates.any():
+        candidates = free
+    cutoff = np.percentile(distances[candidates], 75)
+    positions = np.argwhere(candidates & (distances >= cutoff))
+    pos = tuple(int(v) for v in positions[rng.integers(len(positions))])
+    free[pos] = False
+    return pos
+
+
+def generate_level(level:int, rng:np.random.Generator, height:int=map_height, width:int=map_width) -> tuple[np.ndarray[np.int8], list[Character|None], list[Character], bool]:
+    cells = np.full((height, width), CELL_WALL, dtype=np.int8)
+    reserved = np.zeros((height, width), dtype=bool)
+    enemies = []
+
+    if level == 0:
+        # Simple single room
+        y, x = height//2 - 5, width//2 - 5
+        cells[y:y+10, x:x+10] = CELL_EMPTY
+        player1 = Character((y, x), player_health)
+        ey, ex = (int(v) for v in rng.integers(1, 10, size=2))
+        cells[y+ey, x+ex] = CELL_EXIT
+        return cells, [player1, None], enemies, False
+
+    n_locks = 0 if level < 2 else 1 if level == 2 else 2 if level < 5 else 3
+    plate_lock = level >= 7 # the outer lock is opened with a pressure plate
+    n_boulders = 0 if level < 6 else 2
+    n_enemies = 0 if level < 8 else 1 if level < 11 else 2
+    swords_and_health = level >= 10
+    two_players = level >= 12
+    is_final = level == max_level
+
+    rooms = _carve_rooms(cells, rng, max_rooms=60, min_size=3, max_size=8)
+    _connect_rooms(cells, rng, rooms)
+
+    # Players start together in a random room
+    y, x, h, w = rooms[rng.integers(len(rooms))]
+    start = (y + int(rng.integers(h)), x + int(rng.integers(w)))
+    player1 = Character(start, player_health)
+    player2 = None
+    occupied = [start]
+    if two_players:
+        sy, sx = start
+        for pos in ((sy, sx+1), (sy, sx-1), (sy+1, sx), (sy-1, sx)):
+            if cells[pos] == CELL_EMPTY:
+                player2 = Character(pos, player_health)
+                occupied.append(pos)
+                break
+
+    # Chain of locked chambers, the exit in the inner one, every other one holds
+    # the key of the previous one. The key of the outer one is in the maze.
+    colors = [int(c) for c in rng.permutation(3)[:n_locks]]
+    content = CELL_EXIT
+    away_from = list(occupied)
+    locked_colors = []
+    for color in colors:
+        center = _add_chamber(cells, reserved, rng, away_from, closed_doors[color])
+        if center is None: break
+        cells[center] = content
+        away_from.append(center)
+        content = keys[color]
+        locked_colors.append(color)
+
+    free = _free_cells(cells, reserved, occupied)
+    if not locked_colors:
+        cells[_claim_far_cell(cells, free, rng, occupied)] = CELL_EXIT
+    elif plate_lock:
+        # The outer chamber is opened with a plate instead of a key
+        cells[_claim_far_cell(cells, free, rng, away_from)] = plates[locked_colors[-1]]
+        n_boulders += 1
+    else:
+        cells[_claim_far_cell(cells, free, rng, away_from)] = content
+
+    inner = _free_cells(cells, reserved, occupied, inner=True)
+    for _ in range(n_boulders):
+        if inner.any(): cells[_claim_far_cell(cells, inner, rng, occupied)] = CELL_BOULDER
+    free &= cells == CELL_EMPTY
+
+    if swords_and_health:
+        for _ in range(2 if two_players else 1):
+            cells[_claim_far_cell(cells, free, rng, occupied)] = CELL_SWORD
+            cells[_claim_far_cell(cells, free, rng, occupied)] = CELL_HEALTH
+
+    # Enemies carry a sword in two player levels
+    for _ in range(n_enemies):
+        pos = _claim_far_cell(cells, free, rng, occupied)
+        enemies.append(Character(pos, enemy_health, has_sword=two_players, damage=enemy_damage))
+    if is_final:
+        pos = _claim_far_cell(cells, free, rng, occupied)
+        enemies.append(Character(pos, boss_health, damage=boss_damage, is_boss=True))
+
+    return cells, [player1, player2], enemies, is_final
+
+
+class Game:
+
+    def __init__(self, level:int, seed:int):
+        self.level = level
+        self.rng = np.random.default_rng(seed + level)
+        cells, self.players, self.enemies, self.is_final = generate_level(level, self.rng)
+
+        # Padded, so the surroundings of any cell are a plain slice
+        pad = visibility_range
+        self.cells = np.pad(cells, pad, constant_values=CELL_UNKNOWN)
+        self.map = self.cells[pad:-pad, pad:-pad]
+
+        # The present characters by position, kept up to date by place()
+        self.occupants = {c.pos: c for c in self.players + self.enemies if c is not None and c.present}
+        # Cells out of sight per player position, until the walkable cells change
+        self.hidden = {}
+        # Changes made by the actions of the players while they are performed
+        self.undo = None
+
+        self.ticks = 0
+        self.last_change_tick = 0
+        self.status = swoq_pb2.GAME_STATUS_ACTIVE
+        self.positions = [PositionWindow(max_inactivity_ticks), PositionWindow(max_inactivity_ticks)]
+        self.doors_to_open = set()
+        self.doors_to_close = set()
+        self.has_usable_items = len(self.enemies) > 0 or bool(np.isin(self.map, (CELL_BOULDER, *closed_doors)).any())
+
+
+    @property
+    def finished(self) -> bool:
+        self.process_timeouts()
+        return self.status != swoq_pb2.GAME_STATUS_ACTIVE
+
+
+    def characters(self) -> list[Character]:
+        return list(self.occupants.values())
+
+
+    def act(self, action1:int|None, action2:int|None) -> None:
+        if self.finished: raise ActError(swoq_pb2.ACT_RESULT_GAME_FINISHED)
+
+        player1, player2 = self.players
+        if action1 not in (None, swoq_pb2.DIRECTED_ACTION_NONE) and (player1 is None or not player1.present):
+            raise ActError(swoq_pb2.ACT_RESULT_PLAYER_NOT_PRESENT)
+        if action2 not in (None, swoq_pb2.DIRECTED_ACTION_NONE) and (player2 is None or not player2.present):
+            raise ActError(swoq_pb2.ACT_RESULT_PLAYER2_NOT_PRESENT)
+
+        # Only the actions of the players can fail, when one does the changes
+        # made so far are undone, so the actions can be tried again
+        prev_positions = [p.pos if p is not None else None for p in self.players]
+        last_change_tick = self.last_change_tick
+        self.undo = []
+        try:
+            self.perform_player_action(action1, player1)
+            self.perform_player_action(action2, player2)
+        except ActError:
+            self.revert(self.undo, last_change_tick)
+            raise
+        finally:
+            self.undo = None
+        self.process_doors()
+
+        # Enemies use the positions of the players before this tick
+        for enemy in self.enemies:
+            if enemy.present and enemy.alive:
+                self.process_enemy(enemy, prev_positions)
+
+        self.cleanup_dead_characters()
+        for player, positions in zip(self.players, self.positions):
+            if player is not None and player.present:
+                positions.append(player.pos)
+
+        self.ticks += 1
+        self.update_status()
+
+
+    def revert(self, undo:list[tuple], last_change_tick:int) -> None:
+        for kind, target, value in reversed(undo):
+            if kind == 'cell':
+                self.set_cell(target, value)
+            else:
+                pos, target.health, target.inventory, target.has_sword = value
+                self.place(target, pos)
+        self.last_change_tick = last_change_tick
+        self.doors_to_open.clear()
+        self.doors_to_close.clear()
+
+
+    def set_cell(self, pos:tuple[int,int], cell:int) -> None:
+        old = self.map[pos]
+        if self.undo is not None:
+            self.undo.append(('cell', pos, old))
+        if _walkable[old] != _walkable[cell]:
+            self.hidden.clear()
+        self.map[pos] = cell
+
+
+    def save_character(self, character:Character) -> None:
+        if self.undo is not None:
+            self.undo.append(('character', character, (character.pos, character.health, character.inventory, character.has_sword)))
+
+
+    def place(self, character:Character, pos:tuple[int,int]|None) -> None:
+        # None takes the character off the map
+        if character.pos is not None and self.occupants.get(character.pos) is character:
+            del self.occupants[character.pos]
+        character.pos = pos
+        if pos is not None:
+            self.occupants[pos] = character
+
+
+    def perform_player_action(self, action:int|None, player:Character|None) -> None:
+        if action is None: return
+        if player is None or not player.alive or not player.present: return
+        if action == swoq_pb2.DIRECTED_ACTION_NONE: return
+
+        self.save_character(player)
+        if action in _moves:
+            dy, dx = _moves[action]
+            self.move(player, (player.pos[0]+dy, player.pos[1]+dx))
+        elif action in _uses:
+            if not self.has_usable_items: raise ActError(swoq_pb2.ACT_RESULT_UNKNOWN_ACTION)
+            dy, dx = _uses[action]
+            self.use(player, (player.pos[0]+dy, player.pos[1]+dx))
+        else:
+            raise ActError(swoq_pb2.ACT_RESULT_UNKNOWN_ACTION)
+
+
+    def in_map(self, pos:tuple[int,int]) -> bool:
+        return 0 <= pos[0] < self.map.shape[0] and 0 <= pos[1] < self.map.shape[1]
+
+
+    def can_move_to(self, pos:tuple[int,int], is_enemy:bool=False) -> bool:
+        if not self.in_map(pos): return False
+        if pos in self.occupants: return False
+        return (_enemy_walkable if is_enemy else _walkable)[self.map[pos]]
+
+
+    def move(self, player:Character, pos:tuple[int,int]) -> None:
+        if not self.can_move_to(pos): raise ActError(swoq_pb2.ACT_RESULT_MOVE_NOT_ALLOWED)
+
+        # Position changes first, so a door closing by leaving the cell can crush the player
+        prev_pos = player.pos
+        self.place(player, pos)
+        cell = self.map[prev_pos]
+        if cell in plates:
+            self.close_all_doors(open_doors[plates.index(cell)])
+        self.enter_cell(player, pos)
+
+
+    def enter_cell(self, player:Character, pos:tuple[int,int]) -> None:
+        cell = self.map[pos]
+        if cell in plates:
+            self.open_all_doors(closed_doors[plates.index(cell)])
+        elif cell == CELL_EXIT:
+            self.exit_map(player)
+        elif cell in keys or cell == CELL_TREASURE:
+            self.pickup_inventory(player, pos, CELL_EMPTY)
+        elif cell == CELL_SWORD:
+            if player.has_sword: raise ActError(swoq_pb2.ACT_RESULT_INVENTORY_FULL)
+            player.has_sword = True
+            self.set_cell(pos, CELL_EMPTY)
+            self.last_change_tick = self.ticks
+        elif cell == CELL_HEALTH:
+            player.health += extra_health
+            self.set_cell(pos, CELL_EMPTY)
+            self.last_change_tick = self.ticks
+
+
+    def use(self, player:Character, pos:tuple[int,int]) -> None:
+        character = self.occupants.get(pos)
+        if character is not None:
+            if not player.has_sword: raise ActError(swoq_pb2.ACT_RESULT_NO_SWORD)
+            self.deal_damage(character, 1)
+            return
+
+        if not self.in_map(pos): raise ActError(swoq_pb2.ACT_RESULT_USE_NOT_ALLOWED)
+        cell = self.map[pos]
+        if cell == CELL_EMPTY:
+            self.place_boulder(player, pos, CELL_BOULDER)
+        elif cell in plates:
+            color = plates.index(cell)
+            self.place_boulder(player, pos, plates_with_boulder[color])
+            self.open_all_doors(closed_doors[color])
+        elif cell == CELL_BOULDER:
+            self.pickup_inventory(player, pos, CELL_EMPTY)
+        elif cell in plates_with_boulder:
+            color = plates_with_boulder.index(cell)
+            self.pickup_inventory(player, pos, plates[color])
+            self.close_all_doors(open_doors[color])
+        elif cell in closed_doors:
+            color = closed_doors.index(cell)
+            if player.inventory == swoq_pb2.INVENTORY_NONE: raise ActError(swoq_pb2.ACT_RESULT_INVENTORY_EMPTY)
+            if player.inventory != key_inventory[color]: raise ActError(swoq_pb2.ACT_RESULT_USE_NOT_ALLOWED)
+            self.open_all_doors(cell)
+            player.inventory = swoq_pb2.INVENTORY_NONE
+            self.last_change_tick = self.ticks
+        else:
+            raise ActError(swoq_pb2.ACT_RESULT_USE_NOT_ALLOWED)
+
+
+    def pickup_inventory(self, player:Character, pos:tuple[int,int], remaining_cell:int) -> None:
+        if player.inventory != swoq_pb2.INVENTORY_NONE: raise ActError(swoq_pb2.ACT_RESULT_INVENTORY_FULL)
+        player.inventory = int(_cell_inventory[self.map[pos]])
+        self.set_cell(pos, remaining_cell)
+        self.last_change_tick = self.ticks
+
+
+    def place_boulder(self, player:Character, pos:tuple[int,int], cell:int) -> None:
+        if player.inventory == swoq_pb2.INVENTORY_NONE: raise ActError(swoq_pb2.ACT_RESULT_INVENTORY_EMPTY)
+        if player.inventory != swoq_pb2.INVENTORY_BOULDER: raise ActError(swoq_pb2.ACT_RESULT_USE_NOT_ALLOWED)
+        player.inventory = swoq_pb2.INVENTORY_NONE
+        self.set_cell(pos, cell)
+        self.last_change_tick = self.ticks
+
+
+    # Doors change at the end of the tick, opening and closing in the same tick cancel out
+    def open_all_doors(self, closed_door:int) -> None:
+        for pos in map(tuple, np.argwhere(self.map == closed_door).tolist()):
+            if pos in self.doors_to_close:
+                self.doors_to_close.remove(pos)
+            else:
+                self.doors_to_open.add(pos)
+
+
+    def close_all_doors(self, open_door:int) -> None:
+        for pos in map(tuple, np.argwhere(self.map == open_door).tolist()):
+            if pos in self.doors_to_open:
+                self.doors_to_open.remove(pos)
+            else:
+                self.doors_to_close.add(pos)
+
+
+    def process_doors(self) -> None:
+        for pos in self.doors_to_open:
+            self.set_cell(pos, open_doors[closed_doors.index(self.map[pos])])
+            self.last_change_tick = self.ticks
+        self.doors_to_open.clear()
+
+        for pos in self.doors_to_close:
+            self.set_cell(pos, closed_doors[open_doors.index(self.map[pos])])
+            self.last_change_tick = self.ticks
+            character = self.occupants.get(pos)
+            if character is not None:
+                self.deal_damage(character, character.health)
+        self.doors_to_close.clear()
+
+
+    def exit_map(self, player:Character) -> None:
+        # Carrying a boulder, or no treasure in the final level, is deadly
+        if player.inventory == swoq_pb2.INVENTORY_BOULDER or (self.is_final and player.inventory != swoq_pb2.INVENTORY_TREASURE):
+            player.health = 0
+        else:
+            self.place(player, None)
+        self.last_change_tick = self.ticks
+
+
+    def deal_damage(self, character:Character, damage:int) -> None:
+        self.save_character(character)
+        character.health = max(0, character.health - damage)
+        self.last_change_tick = self.ticks
+
+
+    def walkable_window(self, pos:tuple[int,int], table:VisibilityTable) -> np.ndarray[bool]:
+        pad = visibility_range
+        r = table.range
+        return _walkable[self.cells[pos[0]+pad-r:pos[0]+pad+r+1, pos[1]+pad-r:pos[1]+pad+r+1]]
+
+
+    def process_enemy(self, enemy:Character, prev_positions:list[tuple[int,int]|None]) -> None:
+        # Attack a player that was adjacent in the previous tick as well,
+        # but do not move while any player is adjacent.
+        adjacent = [i for i, p in enumerate(self.players) if p is not None and p.present and _adjacent(enemy.pos, p.pos)]
+        if adjacent:
+            attackable = [i for i in adjacent if _adjacent(enemy.pos, prev_positions[i])]
+            if attackable:
+                target = attackable[self.rng.integers(len(attackable))]
+                self.deal_damage(self.players[target], enemy.damage)
+            return
+
+        # Once in a while do not move
+        if self.rng.integers(100) < 10: return
+
+        players = sorted((p for p in self.players if p is not None and p.present), key=lambda p: _distance(p.pos, enemy.pos))
+        window = self.walkable_window(enemy.pos, _enemy_visibility)
+        visible = [p for p in players if _enemy_visibility.is_visible(window, (p.pos[0]-enemy.pos[0], p.pos[1]-enemy.pos[1]))]
+        if visible:
+            enemy.is_triggered = True
+            self.move_enemy_towards(enemy, visible[0].pos)
+        elif enemy.is_triggered and players:
+            # Follow at a slower pace
+            if self.rng.integers(100) > 50:
+                self.move_enemy_towards(enemy, players[0].pos)
+
+
+    def move_enemy_towards(self, enemy:Character, target:tuple[int,int]) -> None:
+        y, x = enemy.pos
+        dy, dx = target[0] - y, target[1] - x
+        candidates = []
+        if dy != 0 and self.can_move_to((y + (1 if dy > 0 else -1), x), is_enemy=True):
+            candidates.append((y + (1 if dy > 0 else -1), x))
+        if dx != 0 and self.can_move_to((y, x + (1 if dx > 0 else -1)), is_enemy=True):
+            candidates.append((y, x + (1 if dx > 0 else -1)))
+        if candidates:
+            self.place(enemy, candidates[self.rng.integers(len(candidates))])
+
+
+    def cleanup_dead_characters(self) -> None:
+        for character in [p for p in self.players if p is not None] + self.enemies:
+            if character.alive or not character.present: continue
+            pos = character.pos
+            self.place(character, None)
+            if character.is_boss:
+                self.drop_item(pos, CELL_TREASURE)
+                self.drop_item(pos, CELL_TREASURE)
+            if character.inventory != swoq_pb2.INVENTORY_NONE:
+                self.drop_item(pos, _inventory_loot[character.inventory])
+                character.inventory = swoq_pb2.INVENTORY_NONE
+            if character.has_sword:
+                self.drop_item(pos, CELL_SWORD)
+                character.has_sword = False
+            self.last_change_tick = self.ticks
+
+
+    def is_occupied(self, pos:tuple[int,int]) -> bool:
+        return not self.in_map(pos) or self.map[pos] != CELL_EMPTY or pos in self.occupants
+
+
+    def drop_item(self, pos:tuple[int,int], item:int) -> None:
+        # Only on an empty cell, otherwise around it as close as possible to a player
+        if self.is_occupied(pos):
+            y, x = pos
+            choices = [p for p in ((y-1,x-1), (y-1,x), (y-1,x+1), (y,x-1), (y,x+1), (y+1,x-1), (y+1,x), (y+1,x+1)) if not self.is_occupied(p)]
+            if not choices: return
+            players = [p.pos for p in self.players if p is not None and p.present]
+            pos = min(choices, key=lambda p: min((_distance(p, q) for q in players), default=float('inf')))
+        self.set_cell(pos, item)
+
+
+    def player_active(self, player:Character|None, positions:PositionWindow) -> bool:
+        if player is None or not player.present or len(positions) == 0: return False
+        if len(positions) == max_inactivity_ticks:
+            if positions.extent(0) < min_idle_move_distance and positions.extent(1) < min_idle_move_distance:
+                return False
+        return True
+
+
+    def change_status(self, status:int) -> None:
+        if self.status == swoq_pb2.GAME_STATUS_ACTIVE:
+            self.status = status
+
+
+    def process_timeouts(self) -> None:
+        if self.ticks >= max_level_ticks:
+            self.change_status(swoq_pb2.GAME_STATUS_FINISHED_NO_PROGRESS)
+
+
+    def update_status(self) -> None:
+        if self.status != swoq_pb2.GAME_STATUS_ACTIVE: return
+        player1, player2 = self.players
+        if player1 is not None and not player1.alive:
+            self.change_status(swoq_pb2.GAME_STATUS_FINISHED_PLAYER_DIED)
+        elif player2 is not None and not player2.alive:
+            self.change_status(swoq_pb2.GAME_STATUS_FINISHED_PLAYER2_DIED)
+        elif all(p is None or not p.present for p in self.players):
+            self.change_status(swoq_pb2.GAME_STATUS_FINISHED_SUCCESS)
+        elif self.ticks - self.last_change_tick > max_no_progress_ticks:
+            self.change_status(swoq_pb2.GAME_STATUS_FINISHED_NO_PROGRESS)
+        elif any(len(p) > 0 for p in self.positions):
+            if not any(self.player_active(p, q) for p, q in zip(self.players, self.positions)):
+                self.change_status(swoq_pb2.GAME_STATUS_FINISHED_NO_PROGRESS)
+
+
+    def surroundings(self, player:Character) -> np.ndarray[np.int8]:
+        size = 2*visibility_range + 1
+        if not player.present:
+            return np.zeros(size*size, dtype=np.int8)
+
+        y, x = player.pos
+        tiles = _cell_tiles[self.cells[y:y+size, x:x+size]]
+        for (cy, cx), character in self.occupants.items():
+            cy, cx = cy - y + visibility_range, cx - x + visibility_range
+            if 0 <= cy < size and 0 <= cx < size:
+                tiles[cy, cx] = swoq_pb2.TILE_PLAYER if character in self.players else swoq_pb2.TILE_BOSS if character.is_boss else swoq_pb2.TILE_ENEMY
+        hidden = self.hidden.get(player.pos)
+        if hidden is None:
+            hidden = ~_player_visibility.visible(self.walkable_window(player.pos, _player_visibility))
+            self.hidden[player.pos] = hidden
+        tiles[hidden] = swoq_pb2.TILE_UNKNOWN
+        return tiles.ravel()
+
+
+    def player_state(self, player:Character) -> swoq_pb2.PlayerState:
+        y, x = player.pos if player.present else (-1, -1)
+        return swoq_pb2.PlayerState(
+            position=swoq_pb2.Position(y=y, x=x),
+            surroundings=self.surroundings(player).tolist(),
+            inventory=player.inventory,
+            health=player.health,
+            hasSword=player.has_sword)
+
+
+    def state(self, tick:int|None=None) -> swoq_pb2.State:
+        self.process_timeouts()
+        player1, player2 = self.players
+        return swoq_pb2.State(
+            tick=self.ticks if tick is None else tick,
+            level=self.level,
+            status=self.status,
+            playerState=self.player_state(player1) if player1 is not None else None,
+            player2State=self.player_state(player2) if player2 is not None else None)
+
+
+class Quest:
+
+    # All levels in a row, every level with the same seed
+    def __init__(self, seed:int):
+        self.seed = seed
+        self.ticks = 0
+        self.game = Game(0, seed)
+
+
+    @property
+    def finished(self) -> bool:
+        return self.game.finished
+
+
+    def act(self, action1:int|None, action2:int|None) -> None:
+        if self.finished: raise ActError(swoq_pb2.ACT_RESULT_GAME_FINISHED)
+        self.game.act(action1, action2)
+        self.ticks += 1
+        if self.game.status == swoq_pb2.GAME_STATUS_FINISHED_SUCCESS and self.game.level < max_level:
+            self.game = Game(self.game.level + 1, self.seed)
+
+
+    def state(self) -> swoq_pb2.State:
+        return self.game.state(self.ticks)
+
+
+class GameSimulator(swoq_pb2_grpc.GameServiceServicer):
+
+    # Can be used in place of a GameServiceStub, or be served as a GameService.
+    # Extra call arguments of a stub, like timeout, are ignored.
+    def __init__(self, seed:int|None=None):
+        self.games = {}
+        self.game_ids = itertools.count()
+        self.rng = np.random.default_rng(seed)
+
+
+    def Start(self, request:swoq_pb2.StartRequest, context=None, **kwargs) -> swoq_pb2.StartResponse:
+        # Forget about finished games
+        self.games = {game_id: game for game_id, game in self.games.items() if not game.finished}
+
+        seed = int(self.rng.integers(2**31))
+        if request.HasField('level'):
+            if not 0 <= request.level <= max_level:
+                return swoq_pb2.StartResponse(result=swoq_pb2.START_RESULT_INVALID_LEVEL)
+            if request.HasField('seed'):
+                seed = request.seed
+            game = Game(request.level, seed)
+        else:
+            game = Quest(seed)
+
+        game_id = str(next(self.game_ids))
+        self.games[game_id] = game
+        return swoq_pb2.StartResponse(
+            result=swoq_pb2.START_RESULT_OK,
+            gameId=game_id,
+            mapHeight=map_height,
+            mapWidth=map_width,
+            visibilityRange=visibility_range,
+            state=game.state(),
+            seed=seed)
+
+
+    def Act(self, request:swoq_pb2.ActRequest, context=None, **kwargs) -> swoq_pb2.ActResponse:
+        game = self.games.get(request.gameId)
+        if game is None:
+            return swoq_pb2.ActResponse(result=swoq_pb2.ACT_RESULT_UNKNOWN_GAME_ID)
+
+        action1 = request.action if request.HasField('action') else None
+        action2 = request.action2 if request.HasField('action2') else None
+        try:
+            game.act(action1, action2)
+            result = swoq_pb2.ACT_RESULT_OK
+        except ActError as e:
+            result = e.result
+        return swoq_pb2.ActResponse(result=result, state=game.state())
@@ -0,0 +1,39 @@
+import os
+import sys
+import numpy as np
+import pytest
+
+# The bot modules are imported flat, like the scripts and notebooks do
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import swoq_pb2
+
+
+def random_map(rng: np.random.Generator, height: int = 24, width: int = 32, wall_fraction: float = 0.3) -> np.ndarray[np.int8]:
+    # Empty cells and walls only
+    walls = rng.random((height, width)) < wall_fraction
+    return np.where(walls, swoq_pb2.TILE_WALL, swoq_pb2.TILE_EMPTY).astype(np.int8)
+
+
+@pytest.fixture
+def rng() -> np.random.Generator:
+    return np.random.default_rng(1234)
+
+
+# Tiles of a partly explored map, by how often they occur
+_map_tiles = [swoq_pb2.TILE_EMPTY, swoq_pb2.TILE_WALL, swoq_pb2.TILE_UNKNOWN, swoq_pb2.TILE_DOOR_RED, swoq_pb2.TILE_KEY_BLUE,
+              swoq_pb2.TILE_PRESSURE_PLATE_GREEN, swoq_pb2.TILE_BOULDER, swoq_pb2.TILE_ENEMY, swoq_pb2.TILE_BOSS, swoq_pb2.TILE_EXIT]
+_map_tile_weights = [0.5, 0.2, 0.2, 0.02, 0.02, 0.02, 0.01, 0.01, 0.01, 0.01]
+
+
+def random_tiles(rng: np.random.Generator, height: int = 24, width: int = 32) -> np.ndarray[np.int8]:
+    return rng.choice(_map_tiles, size=(height, width), p=_map_tile_weights).astype(np.int8)
+
+
+def random_changes(rng: np.random.Generator, game_map: np.ndarray[np.int8], max_changes: int = 6) -> np.ndarray[np.intp]:
+    # Sets a few random cells to random tiles, returns their (N, 2) positions
+    height, width = game_map.shape
+    changes = np.stack([rng.integers(height, size=max_changes), rng.integers(width, size=max_changes)], axis=1)
+    changes = changes[:rng.integers(max_changes + 1)]
+    game_map[changes[:, 0], changes[:, 1]] = rng.choice(_map_tiles, size=len(changes), p=_map_tile_weights)
+    return changes
@@ -0,0 +1,37 @@
+import numpy as np
+from arena import BufferArena
+from play import GamePlayer
+from simulator import GameSimulator
+
+
+def test_buffers_are_reused_by_name():
+    arena = BufferArena(4, 5)
+    distances = arena.get('distances', fill=-1)
+    assert distances.shape == (4, 5) and np.all(distances == -1)
+    distances[0, 0] = 7
+
+    # The old contents stay unless a fill is given
+    assert arena.get('distances') is distances and distances[0, 0] == 7
+    assert arena.get('distances', fill=0) is distances and not np.any(distances)
+    assert arena.get('mask', bool) is not distances
+    assert arena.stats() == {'allocations': 2, 'requests': 4, 'buffers': 2, 'bytes': 4 * 5 * 4 + 4 * 5}
+
+    # Another shape or type replaces the buffer
+    assert arena.get('distances', np.int16).dtype == np.int16
+    assert arena.get('distances', np.int16, shape=(2,)).shape == (2,)
+    assert arena.allocations == 4 and len(arena._buffers) == 2
+
+
+def test_buffers_are_reused_across_levels():
+    np.random.seed(0)
+    with GamePlayer('test', 'test', plot=False, print=False, stub=GameSimulator(seed=0)) as player:
+        player.start(None, 0)
+        game_map = player.map
+        levels = set()
+        while not player.finished and player.level < 4:
+            player.step()
+            levels.add(player.level)
+            # Every buffer is allocated once for the whole game
+            assert player.arena.allocations == len(player.arena._buffers)
+            assert player.map is game_map
+    assert levels >= {0, 1, 2, 3}
@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+from benchmark import compare, parse_levels, run_cases, summarize
+from play import GamePlayer
+from simulator import GameSimulator
+
+
+def test_parse_levels():
+    assert parse_levels('3') == [3]
+    assert parse_levels('0-2,5,7-8') == [0, 1, 2, 5, 7, 8]
+
+
+def test_summary_percentiles_per_level_and_all():
+    samples = {('tick', 0): [1000 * i for i in range(1, 101)], ('tick', 1): [5000] * 10, ('plan', None): [2000]}
+    summary = summarize(samples)
+    assert summary['tick']['0']['p50'] == pytest.approx(50.5)
+    assert summary['tick']['0']['max'] == 100
+    assert summary['tick']['1']['count'] == 10
+    assert summary['tick']['all']['count'] == 110
+    assert summary['plan']['None']['p99'] == 2
+
+
+def test_compare_reports_slower_routines_only():
+    def results(p50, p90, count=100, rss=1000):
+        return {'routines': {'tick': {'0': {'p50': p50, 'p90': p90, 'count': count}}}, 'memory': {'max_rss_kb': rss}}
+
+    assert compare(results(10, 20), results(10, 20)) == []
+    assert compare(results(12, 24), results(10, 20)) == []
+    assert compare(results(5, 10), results(10, 20)) == []
+    assert compare(results(20, 20), results(10, 20)) == ['tick level 0 p50: 10.0us -> 20.0us']
+    assert compare(results(20, 40, count=5), results(10, 20)) == []
+    assert compare(results(10, 20, rss=2000), results(10, 20)) == ['max rss: 1000kB -> 2000kB']
+
+
+def test_run_cases_on_seeds_and_replays(tmp_path):
+    np.random.seed(0)
+    with GamePlayer('test', 'test', plot=False, print=False, stub=GameSimulator(seed=0), replays_folder=str(tmp_path)) as player:
+        player.start(5, 0)
+        for _ in range(30):
+            player.step()
+    [replay] = tmp_path.iterdir()
+
+    results = run_cases([('seeded', (0, 0)), ('replay', str(replay))], max_ticks=50)
+    seeded, replayed = results['cases']
+    assert seeded['status'] == 'GAME_STATUS_FINISHED_SUCCESS' and seeded['level'] == 0
+    assert replayed['level'] == 5 and replayed['ticks'] == 30
+    ticks = results['routines']['tick']
+    assert ticks['all']['count'] == seeded['ticks'] + replayed['ticks']
+    assert ticks['5']['count'] == 30
+    assert 'update_global_state' in results['routines']
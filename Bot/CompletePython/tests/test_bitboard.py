@@ -0,0 +1,48 @@
+import numpy as np
+from conftest import random_tiles, random_changes
+from bitboard import BitPlanes, plane_names, plane_tiles
+from nearest_targets import _frontier_mask, _clearing_mask
+
+
+def assert_planes_match(planes, game_map):
+    for name in plane_names:
+        expected = np.isin(game_map, plane_tiles[name])
+        np.testing.assert_array_equal(planes.mask(name), expected, err_msg=name)
+        np.testing.assert_array_equal(planes.positions(name), np.argwhere(expected), err_msg=name)
+        assert planes.count(name) == np.count_nonzero(expected)
+    np.testing.assert_array_equal(planes.mask(planes.frontier()), _frontier_mask(game_map))
+    np.testing.assert_array_equal(planes.mask(planes.clearing()), _clearing_mask(game_map))
+
+
+def test_planes_match_the_map(rng):
+    for _ in range(10):
+        game_map = random_tiles(rng)
+        assert_planes_match(BitPlanes(game_map), game_map)
+
+
+def test_update_cells_matches_new_planes(rng):
+    game_map = random_tiles(rng)
+    planes = BitPlanes(game_map)
+    for _ in range(50):
+        planes.update_cells(random_changes(rng, game_map))
+        assert_planes_match(planes, game_map)
+
+
+def test_single_cells(rng):
+    game_map = random_tiles(rng, 7, 9)
+    planes = BitPlanes(game_map)
+    walls = np.isin(game_map, plane_tiles['wall'])
+    for y in range(-1, 8):
+        for x in range(-1, 10):
+            inside = 0 <= y < 7 and 0 <= x < 9
+            assert planes.is_wall((y, x)) == (inside and walls[y, x])
+
+
+def test_pack_and_mask_round_trip(rng):
+    game_map = random_tiles(rng)
+    planes = BitPlanes(game_map)
+    mask = rng.random(game_map.shape) < 0.3
+    np.testing.assert_array_equal(planes.mask(planes.pack(mask)), mask)
+    out = np.ones(game_map.shape, dtype=bool)
+    assert planes.mask(planes.pack(mask), out) is out
+    np.testing.assert_array_equal(out, mask)
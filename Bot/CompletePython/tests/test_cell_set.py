@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+from cell_set import CellSet
+
+
+def test_same_as_a_set(rng):
+    shape = (12, 17)
+    cells = CellSet(shape)
+    expected = set()
+    for _ in range(500):
+        pos = (int(rng.integers(shape[0])), int(rng.integers(shape[1])))
+        if rng.random() < 0.6:
+            cells.add(np.array(pos) if rng.random() < 0.5 else pos)
+            expected.add(pos)
+        else:
+            cells.discard(pos)
+            expected.discard(pos)
+        assert len(cells) == len(expected)
+        assert pos in cells if pos in expected else pos not in cells
+
+    # Row-major order, like np.argwhere
+    assert list(cells) == sorted(expected)
+    assert list(cells) == [tuple(p) for p in np.argwhere(cells.mask).tolist()]
+
+    cells.clear()
+    assert len(cells) == 0 and list(cells) == []
+
+
+def test_outside_positions_are_never_contained():
+    cells = CellSet((3, 4), [(0, 0), (2, 3)])
+    assert len(cells) == 2
+    for pos in (None, (-1, 0), (0, -1), (3, 0), (0, 4)):
+        assert pos not in cells
+        cells.discard(pos)
+    assert len(cells) == 2
+
+
+def test_outside_positions_cannot_be_added():
+    cells = CellSet((3, 4))
+    for pos in ((-1, 0), (0, -1), (3, 0), (0, 4), np.array([-1, -1])):
+        with pytest.raises(IndexError):
+            cells.add(pos)
+    assert len(cells) == 0 and not np.any(cells.mask)
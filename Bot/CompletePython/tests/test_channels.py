@@ -0,0 +1,71 @@
+import grpc
+import os
+import channels
+from channels import ChannelPool
+
+
+class FakeChannel:
+
+    def __init__(self, target, options, compression):
+        self.target = target
+        self.options = dict(options)
+        self.compression = compression
+        self.closed = False
+        self.calls = []
+
+    def unary_unary(self, method, **kwargs):
+        channel = self
+        class Method:
+            def __call__(self, request, **kwargs):
+                channel.calls.append((method, kwargs))
+            def future(self, request, **kwargs):
+                channel.calls.append((method, kwargs))
+        return Method()
+
+    def close(self):
+        self.closed = True
+
+
+def test_channels_are_reused_per_target_and_closed(monkeypatch):
+    monkeypatch.setattr(channels.grpc, 'insecure_channel', FakeChannel)
+    pool = ChannelPool(max_message_bytes=1024, compression=True)
+
+    channel = pool.channel('a:1')
+    assert pool.channel('a:1') is channel
+    assert pool.channel('b:2') is not channel
+    assert channel.options['grpc.max_receive_message_length'] == 1024
+    assert channel.compression == grpc.Compression.Gzip
+
+    pool.close()
+    assert channel.closed
+    # A closed pool opens new channels when asked again
+    assert pool.channel('a:1') is not channel
+
+
+def test_forked_process_does_not_reuse_the_channels(monkeypatch):
+    monkeypatch.setattr(channels.grpc, 'insecure_channel', FakeChannel)
+    pool = ChannelPool()
+    channel = pool.channel()
+    pid = os.getpid()
+    monkeypatch.setattr(channels.os, 'getpid', lambda: pid + 1)
+    assert pool.channel() is not channel
+    assert not channel.closed
+
+
+def test_stub_calls_have_the_default_deadline(monkeypatch):
+    monkeypatch.setattr(channels.grpc, 'insecure_channel', FakeChannel)
+    pool = ChannelPool(timeout=2.5)
+    stub = pool.stub('a:1')
+    stub.Start(None)
+    stub.Act.future(None)
+    stub.Act(None, timeout=1.0)
+    assert [kwargs.get('timeout') for _, kwargs in pool.channel('a:1').calls] == [2.5, 2.5, 1.0]
+
+
+def test_configure_replaces_the_shared_pool(monkeypatch):
+    monkeypatch.setattr(channels, '_shared_pool', None)
+    pool = channels.shared_pool()
+    assert channels.shared_pool() is pool
+    configured = channels.configure(timeout=1.0)
+    assert channels.shared_pool() is configured and configured is not pool
+    assert configured.timeout == 1.0
@@ -0,0 +1,151 @@
+import numpy as np
+import swoq_pb2
+from conftest import random_map
+from distance_field import compute_distance_field, IncrementalDistanceField
+from map_util import compute_distances_quick
+
+
+def assert_valid_field(game_map, source, distance_map, path_map):
+    expected, _ = compute_distance_field(game_map, source)
+    np.testing.assert_array_equal(distance_map.distances, expected)
+
+    # Ties can be broken differently than by a fresh search, so every
+    # predecessor only has to be a neighbour that is one step closer
+    predecessors = path_map.predecessors
+    ys, xs = np.nonzero(expected > 0)
+    pred_ys, pred_xs = np.divmod(predecessors[ys, xs], game_map.shape[1])
+    assert np.all(np.abs(pred_ys - ys) + np.abs(pred_xs - xs) == 1)
+    assert np.all(expected[pred_ys, pred_xs] == expected[ys, xs] - 1)
+    assert np.all(predecessors[expected <= 0] == -1)
+
+
+def random_edits(rng, game_map, source, nr_ticks):
+    # Per tick the source moves to a neighbouring empty cell or stays, and a
+    # few other cells flip between empty and wall. The player is on the map,
+    # like in the game. Yields the source and the changed positions.
+    game_map[source] = swoq_pb2.TILE_PLAYER
+    height, width = game_map.shape
+    for _ in range(nr_ticks):
+        changes = []
+        y, x = source
+        steps = [(y+dy, x+dx) for dy, dx in ((-1, 0), (1, 0), (0, -1), (0, 1))
+                 if 0 <= y+dy < height and 0 <= x+dx < width and game_map[y+dy, x+dx] == swoq_pb2.TILE_EMPTY]
+        if steps and rng.random() < 0.5:
+            game_map[source] = swoq_pb2.TILE_EMPTY
+            changes.append(source)
+            source = steps[rng.integers(len(steps))]
+            game_map[source] = swoq_pb2.TILE_PLAYER
+            changes.append(source)
+        for _ in range(rng.integers(0, 4)):
+            pos = (int(rng.integers(height)), int(rng.integers(width)))
+            if game_map[pos] == swoq_pb2.TILE_PLAYER: continue
+            game_map[pos] = swoq_pb2.TILE_WALL if game_map[pos] == swoq_pb2.TILE_EMPTY else swoq_pb2.TILE_EMPTY
+            changes.append(pos)
+        yield source, np.array(changes, dtype=np.intp).reshape(-1, 2)
+
+
+def test_update_matches_full_search(rng):
+    for _ in range(5):
+        game_map = random_map(rng, wall_fraction=0.25)
+        source = tuple(int(v) for v in np.argwhere(game_map == swoq_pb2.TILE_EMPTY)[0])
+        field = IncrementalDistanceField()
+        field.update(game_map, source)
+        for source, changes in random_edits(rng, game_map, source, 100):
+            distance_map, path_map = field.update(game_map, source, changes)
+            assert_valid_field(game_map, source, distance_map, path_map)
+        assert field.repairs > 0
+
+
+def test_negative_repair_fraction_gives_the_paths_of_a_full_search(rng):
+    game_map = random_map(rng, wall_fraction=0.25)
+    source = tuple(int(v) for v in np.argwhere(game_map == swoq_pb2.TILE_EMPTY)[0])
+    field = IncrementalDistanceField(max_repair_fraction=-1)
+    field.update(game_map, source)
+    for source, changes in random_edits(rng, game_map, source, 50):
+        _, path_map = field.update(game_map, source, changes)
+        _, expected = compute_distance_field(game_map, source)
+        np.testing.assert_array_equal(path_map.predecessors, expected)
+    assert field.repairs == 0
+
+
+def test_update_without_changes(rng):
+    game_map = random_map(rng)
+    source = tuple(int(v) for v in np.argwhere(game_map == swoq_pb2.TILE_EMPTY)[0])
+    field = IncrementalDistanceField()
+    for source, _ in random_edits(rng, game_map, source, 20):
+        distance_map, path_map = field.update(game_map, source)
+        assert_valid_field(game_map, source, distance_map, path_map)
+
+
+def test_update_into_buffers(rng):
+    game_map = random_map(rng)
+    source = tuple(int(v) for v in np.argwhere(game_map == swoq_pb2.TILE_EMPTY)[0])
+    out = np.empty(game_map.shape, dtype=np.int32), np.empty(game_map.shape, dtype=np.int32)
+    distance_map, path_map = IncrementalDistanceField().update(game_map, source, out=out)
+    assert distance_map.distances is out[0] and path_map.predecessors is out[1]
+    assert_valid_field(game_map, source, distance_map, path_map)
+
+
+def test_speculate_gives_the_same_update(rng):
+    game_map = random_map(rng, wall_fraction=0.25)
+    source = tuple(int(v) for v in np.argwhere(game_map == swoq_pb2.TILE_EMPTY)[0])
+    field = IncrementalDistanceField()
+    field.update(game_map, source)
+    nr_speculated = 0
+    for source, changes in random_edits(rng, game_map, source, 200):
+        speculated = field.speculate(source) if source != field.source else None
+        distance_map, path_map = field.update(game_map, source, changes)
+        assert_valid_field(game_map, source, distance_map, path_map)
+        if speculated is not None:
+            nr_speculated += 1
+            speculated_distances, speculated_paths = speculated.update(game_map, source, changes)
+            np.testing.assert_array_equal(speculated_distances.distances, distance_map.distances)
+            np.testing.assert_array_equal(speculated_paths.predecessors, path_map.predecessors)
+    assert nr_speculated > 0
+
+
+def test_speculate_only_a_single_step(rng):
+    game_map = random_map(rng, wall_fraction=0.0)
+    field = IncrementalDistanceField()
+    assert field.speculate((0, 0)) is None
+    field.update(game_map, (5, 5))
+    assert field.speculate((5, 7)) is None
+    assert field.speculate((5, 6)).source == (5, 6)
+    assert field.source == (5, 5)
+
+
+def dict_search(game_map, source):
+    # The dict based search of the old compute_distances_quick
+    height, width = game_map.shape
+    distances = {source: 0}
+    paths = {}
+    todo = [source]
+    head = 0
+    while head < len(todo):
+        y, x = cur = todo[head]
+        head += 1
+        for next_pos in ((y-1, x), (y+1, x), (y, x-1), (y, x+1)):
+            if 0 <= next_pos[0] < height and 0 <= next_pos[1] < width and next_pos not in distances \
+               and game_map[next_pos] == swoq_pb2.TILE_EMPTY:
+                distances[next_pos] = distances[cur] + 1
+                paths[next_pos] = cur
+                todo.append(next_pos)
+    return distances, paths
+
+
+def test_keys_in_search_order(rng):
+    for _ in range(5):
+        game_map = random_map(rng, wall_fraction=0.25)
+        source = tuple(int(v) for v in np.argwhere(game_map == swoq_pb2.TILE_EMPTY)[0])
+        expected_distances, expected_paths = dict_search(game_map, source)
+        distance_map, path_map = compute_distances_quick(game_map, source)
+        assert distance_map.keys() == list(expected_distances)
+        assert path_map.keys() == list(expected_paths)
+        assert {pos: path_map[pos] for pos in path_map} == expected_paths
+
+        # Deleted positions drop out, the others keep their order
+        deleted = list(expected_distances)[1::3]
+        for pos in deleted:
+            del distance_map[pos]
+            del expected_distances[pos]
+        assert distance_map.keys() == list(expected_distances)
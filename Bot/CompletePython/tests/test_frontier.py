@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+import swoq_pb2
+from conftest import random_tiles, random_changes
+from arena import BufferArena
+from bitboard import BitPlanes
+from frontier import Frontier
+from nearest_targets import _frontier_mask
+
+
+def random_distances(rng, shape):
+    distances = rng.integers(0, 40, size=shape).astype(np.int32)
+    distances[rng.random(shape) < 0.3] = -1
+    return distances
+
+
+def test_update_matches_frontier_of_the_map(rng):
+    game_map = random_tiles(rng)
+    planes = BitPlanes(game_map)
+    frontier = Frontier(planes)
+    for _ in range(50):
+        changes = random_changes(rng, game_map)
+        planes.update_cells(changes)
+        frontier.update(changes)
+        expected = _frontier_mask(game_map)
+        np.testing.assert_array_equal(frontier.mask(), expected)
+        assert len(frontier) == np.count_nonzero(expected)
+
+
+def scan_closest(game_map, distances):
+    # The unknown-cell scan that picked the exploration target before the frontier was kept
+    closest, closest_distance = None, None
+    for y, x in np.argwhere(game_map == swoq_pb2.TILE_UNKNOWN):
+        for ny, nx in ((y, x-1), (y, x+1), (y-1, x), (y+1, x)):
+            if not (0 <= ny < game_map.shape[0] and 0 <= nx < game_map.shape[1]): continue
+            if distances[ny, nx] >= 0 and game_map[ny, nx] == swoq_pb2.TILE_EMPTY:
+                if closest_distance is None or distances[ny, nx] < closest_distance:
+                    closest, closest_distance = (int(ny), int(nx)), distances[ny, nx]
+                break
+    return closest
+
+
+@pytest.mark.parametrize('with_arena', [False, True])
+@pytest.mark.parametrize('with_blocked', [False, True])
+def test_closest_picks_the_same_cell_as_the_unknown_cell_scan(rng, with_arena, with_blocked):
+    for _ in range(20):
+        game_map = random_tiles(rng)
+        arena = BufferArena(*game_map.shape) if with_arena else None
+        frontier = Frontier(BitPlanes(game_map), arena)
+        distances = random_distances(rng, game_map.shape)
+        blocked = rng.random(game_map.shape) < 0.1 if with_blocked else None
+
+        # Blocked cells are drawn as walls on a copy, like the level handlers used to
+        walled_map = game_map.copy()
+        if blocked is not None:
+            walled_map[blocked] = swoq_pb2.TILE_WALL
+        target = frontier.closest(distances, blocked)
+        assert target == scan_closest(walled_map, distances)
+        if target is not None:
+            candidates = _frontier_mask(walled_map) & (distances >= 0)
+            assert candidates[target]
+
+
+def test_unknown_cells_behind_a_blocked_rectangle_do_not_make_a_frontier():
+    game_map = np.full((8, 12), swoq_pb2.TILE_EMPTY, dtype=np.int8)
+    game_map[0, 0] = swoq_pb2.TILE_UNKNOWN
+    game_map[3:6, 10:] = swoq_pb2.TILE_UNKNOWN
+    blocked = np.zeros(game_map.shape, dtype=bool)
+    blocked[2:7, 10:] = True
+    # Distances from (4, 8), the blocked rectangle is much closer than the unknown corner
+    ys, xs = np.indices(game_map.shape)
+    distances = (np.abs(ys - 4) + np.abs(xs - 8)).astype(np.int32)
+
+    frontier = Frontier(BitPlanes(game_map))
+    assert frontier.closest(distances, blocked) == (0, 1)
+    assert frontier.closest(distances) == (4, 9)
+
+
+def test_information_gain_counts_unknown_cells_in_range(rng):
+    game_map = random_tiles(rng)
+    frontier = Frontier(BitPlanes(game_map))
+    unknown = frontier.planes.mask('unknown')
+    gain = frontier.information_gain(3)
+    for y in range(game_map.shape[0]):
+        for x in range(game_map.shape[1]):
+            assert gain[y, x] == np.count_nonzero(unknown[max(y-3, 0):y+4, max(x-3, 0):x+4])
+
+
+@pytest.mark.parametrize('with_blocked', [False, True])
+def test_most_informative_has_the_best_gain_per_step(rng, with_blocked):
+    for _ in range(20):
+        game_map = random_tiles(rng)
+        frontier = Frontier(BitPlanes(game_map))
+        distances = random_distances(rng, game_map.shape)
+        blocked = None
+        walled_map = game_map.copy()
+        if with_blocked:
+            blocked = np.zeros(game_map.shape, dtype=bool)
+            top, left = rng.integers(game_map.shape[0] - 6), rng.integers(game_map.shape[1] - 6)
+            blocked[top:top+6, left:left+6] = True
+            walled_map[blocked] = swoq_pb2.TILE_WALL
+        candidates = _frontier_mask(walled_map) & (distances >= 0)
+        target = frontier.most_informative(distances, 3, blocked)
+        if not np.any(candidates):
+            assert target is None
+            continue
+        score = frontier.information_gain(3)[candidates] / (distances[candidates] + 1.0)
+        assert candidates[target]
+        assert frontier.information_gain(3)[target] / (distances[target] + 1.0) == score.max()
@@ -0,0 +1,103 @@
+import numpy as np
+import swoq_pb2
+from conftest import random_tiles
+from map_util import _cell_colors, get_map_image, merge_surroundings, changed_cells
+
+
+def image_cell_by_cell(game_map):
+    # The renderer get_map_image replaces
+    height, width = game_map.shape
+    map_img = np.zeros((height, width, 3), dtype=np.float32)
+    for y in range(height):
+        for x in range(width):
+            map_img[y, x] = (np.array(_cell_colors[game_map[y, x]]) / 255).astype(np.float32)
+    return map_img
+
+
+def all_tiles(rng, height, width):
+    return rng.choice(list(_cell_colors), size=(height, width)).astype(np.int8)
+
+
+def test_map_image_matches_the_cell_by_cell_renderer(rng):
+    game_map = all_tiles(rng, 10, 12)
+    image = get_map_image(game_map)
+    assert image.dtype == np.float32
+    np.testing.assert_array_equal(image, image_cell_by_cell(game_map))
+
+
+def test_map_image_into_buffer_with_changes(rng):
+    game_map = all_tiles(rng, 10, 12)
+    out = np.zeros((10, 12, 3), dtype=np.float32)
+    assert get_map_image(game_map, out) is out
+    np.testing.assert_array_equal(out, image_cell_by_cell(game_map))
+
+    # Only the changed cells are rendered again
+    changes = np.array([[0, 0], [4, 7], [9, 11]], dtype=np.intp)
+    game_map[changes[:, 0], changes[:, 1]] = all_tiles(rng, 1, 3)
+    game_map[5, 5] = swoq_pb2.TILE_EXIT if game_map[5, 5] != swoq_pb2.TILE_EXIT else swoq_pb2.TILE_WALL
+    stale = out[5, 5].copy()
+    assert get_map_image(game_map, out, changes) is out
+    expected = image_cell_by_cell(game_map)
+    expected[5, 5] = stale
+    np.testing.assert_array_equal(out, expected)
+
+
+def merge_cell_by_cell(game_map, surroundings, center, visibility_range):
+    # The loop merge_surroundings replaces
+    top = center[0] - visibility_range
+    left = center[1] - visibility_range
+    i = 0
+    for y in range(visibility_range*2 + 1):
+        for x in range(visibility_range*2 + 1):
+            s = surroundings[i]
+            if s != swoq_pb2.TILE_UNKNOWN:
+                map_y, map_x = top + y, left + x
+                if 0 <= map_y < game_map.shape[0] and 0 <= map_x < game_map.shape[1]:
+                    game_map[map_y, map_x] = s
+            i += 1
+
+
+def test_merge_surroundings_clips_at_the_edges(rng):
+    visibility_range = 3
+    size = visibility_range*2 + 1
+    base = random_tiles(rng, 10, 12)
+    # Centers on, next to and just outside every edge and corner of the map
+    for center in [(y, x) for y in (-4, -3, -1, 0, 1, 5, 8, 9, 10, 12, 13) for x in (-4, -3, 0, 2, 6, 10, 11, 12, 14, 15)]:
+        surroundings = random_tiles(rng, size, size).ravel().tolist()
+        expected = base.copy()
+        merge_cell_by_cell(expected, surroundings, center, visibility_range)
+        game_map = base.copy()
+        region = merge_surroundings(game_map, surroundings, center, visibility_range)
+        np.testing.assert_array_equal(game_map, expected, err_msg=str(center))
+
+        # The region is the part of the window on the map
+        inside = np.zeros(base.shape, dtype=bool)
+        inside[max(center[0]-visibility_range, 0):max(center[0]+visibility_range+1, 0),
+               max(center[1]-visibility_range, 0):max(center[1]+visibility_range+1, 0)] = True
+        if not np.any(inside):
+            assert region is None
+        else:
+            mask = np.zeros(base.shape, dtype=bool)
+            mask[region] = True
+            np.testing.assert_array_equal(mask, inside, err_msg=str(center))
+
+
+def test_merge_without_surroundings_changes_nothing(rng):
+    game_map = random_tiles(rng, 10, 12)
+    expected = game_map.copy()
+    assert merge_surroundings(game_map, [], (5, 5), 3) is None
+    np.testing.assert_array_equal(game_map, expected)
+
+
+def test_changed_cells_in_regions_and_positions(rng):
+    prev_map = random_tiles(rng, 10, 12)
+    game_map = random_tiles(rng, 10, 12)
+    regions = [(slice(0, 4), slice(2, 7)), (slice(3, 6), slice(5, 12))]
+    positions = [(9, 0), (8, 11), (0, 3)]
+    considered = np.zeros(game_map.shape, dtype=bool)
+    for region in regions:
+        considered[region] = True
+    for pos in positions:
+        considered[pos] = True
+    expected = np.argwhere(considered & (prev_map != game_map))
+    np.testing.assert_array_equal(changed_cells(prev_map, game_map, regions, positions), expected)
@@ -0,0 +1,30 @@
+import numpy as np
+import swoq_pb2
+from conftest import random_tiles
+from map_view import MapView
+
+
+def test_overlays_are_clipped_and_combined(rng):
+    game_map = random_tiles(rng, 10, 12)
+    view = MapView(game_map)
+    assert not view and view.blocked is None
+
+    view.block_rect(-2, 9, 3, 20).block_box((8, 1), 2).block_cells([(5, 5), (-1, 3), (10, 0)])
+    expected = np.zeros(game_map.shape, dtype=bool)
+    expected[0:3, 9:12] = True
+    expected[6:10, 0:4] = True
+    expected[5, 5] = True
+    np.testing.assert_array_equal(view.blocked, expected)
+    assert view.tile((5, 5)) == swoq_pb2.TILE_WALL
+    assert view.tile((5, 6)) == game_map[5, 6]
+
+    # Outside the map nothing is added
+    view.block_rect(10, 0, 12, 4).block_cells([(-1, -1)])
+    assert len(view.overlays) == 3
+
+    view.pop()
+    expected[5, 5] = False
+    np.testing.assert_array_equal(view.blocked, expected)
+    view.clear()
+    assert view.blocked is None
+    np.testing.assert_array_equal(view.map, game_map)
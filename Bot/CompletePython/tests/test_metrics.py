@@ -0,0 +1,69 @@
+import numpy as np
+from metrics import Metrics, buckets, max_rss_kb, prometheus_file
+from play import GamePlayer
+from simulator import GameSimulator
+
+
+def parse(text):
+    # Samples by metric name with labels, and the declared types
+    samples = {}
+    types = {}
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, name, kind = line.split()
+            types[name] = kind
+        else:
+            name, value = line.rsplit(' ', 1)
+            samples[name] = float(value)
+    return samples, types
+
+
+def test_text_format():
+    metrics = Metrics(labels={'worker': '3'})
+    metrics.round_trip.add(20_000)
+    metrics.round_trip.add(3_000_000)
+    metrics.round_trip.add(5_000_000_000)
+    metrics.ticks = 3
+    metrics.decided_by[(1, 'explore')] = 2
+    metrics.decided_by[(2, 'random_walk')] = 1
+    text = metrics.to_prometheus()
+    assert text.endswith('\n')
+
+    samples, types = parse(text)
+    assert types == {'swoq_bot_ticks_total': 'counter', 'swoq_bot_act_seconds': 'histogram',
+                     'swoq_bot_routine_seconds': 'histogram', 'swoq_bot_max_rss_bytes': 'gauge',
+                     'swoq_bot_decided_total': 'counter'}
+    assert 0 < samples['swoq_bot_max_rss_bytes{worker="3"}'] <= max_rss_kb() * 1024
+    assert samples['swoq_bot_ticks_total{worker="3"}'] == 3
+    # Cumulative buckets, the last one counts everything
+    assert samples['swoq_bot_act_seconds_bucket{worker="3",le="1e-05"}'] == 0
+    assert samples['swoq_bot_act_seconds_bucket{worker="3",le="2.5e-05"}'] == 1
+    assert samples['swoq_bot_act_seconds_bucket{worker="3",le="0.005"}'] == 2
+    assert samples['swoq_bot_act_seconds_bucket{worker="3",le="1.0"}'] == 2
+    assert samples['swoq_bot_act_seconds_bucket{worker="3",le="+Inf"}'] == 3
+    assert samples['swoq_bot_act_seconds_count{worker="3"}'] == 3
+    assert samples['swoq_bot_act_seconds_sum{worker="3"}'] == 5.00302
+    assert samples['swoq_bot_decided_total{worker="3",player="1",routine="explore"}'] == 2
+    assert samples['swoq_bot_decided_total{worker="3",player="2",routine="random_walk"}'] == 1
+    assert len([name for name in samples if name.startswith('swoq_bot_act_seconds_bucket')]) == len(buckets) + 1
+    # Routines that never ran are left out
+    assert not any(name.startswith('swoq_bot_routine_seconds') for name in samples)
+
+
+def test_instrumented_game_is_exported(tmp_path):
+    path = tmp_path / 'swoq.prom'
+    metrics = Metrics(sinks=[prometheus_file(str(path))], export_interval=0)
+    np.random.seed(0)
+    with GamePlayer('test', 'test', plot=False, print=False, stub=GameSimulator(seed=0), metrics=metrics) as player:
+        player.start(0, 0)
+        while not player.finished:
+            player.step()
+
+    samples, _ = parse(path.read_text())
+    assert samples['swoq_bot_ticks_total'] == player.tick
+    assert samples['swoq_bot_act_seconds_count'] == player.tick
+    # Every action of the single player was decided by some routine
+    decided = sum(count for name, count in samples.items() if name.startswith('swoq_bot_decided_total{player="1"'))
+    assert decided == player.tick
+    assert samples['swoq_bot_routine_seconds_count{routine="explore"}'] > 0
+    assert list(tmp_path.iterdir()) == [path]
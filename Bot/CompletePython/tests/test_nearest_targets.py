@@ -0,0 +1,38 @@
+import numpy as np
+import swoq_pb2
+from conftest import random_tiles
+from map_util import compute_distances_quick, get_direction_and_distance
+from nearest_targets import NearestTargets
+
+
+def scan_closest(game_map, player_pos, targets):
+    # The closest target like the loop of GamePlayer.find_closest, the first
+    # in row-major order wins ties
+    distances, paths = compute_distances_quick(game_map, player_pos)
+    min_pos = None
+    min_dist = np.inf
+    for pos in np.argwhere(targets):
+        pos = tuple(int(v) for v in pos)
+        _, dist = get_direction_and_distance(player_pos, pos, distances, paths)
+        if dist < min_dist:
+            min_dist = dist
+            min_pos = pos
+    return min_pos, min_dist
+
+
+def test_closest_matches_scan(rng):
+    # Small maps, so that targets are often equally close
+    for _ in range(200):
+        game_map = random_tiles(rng, 8, 10)
+        empty = np.argwhere(game_map == swoq_pb2.TILE_EMPTY)
+        player_pos = tuple(int(v) for v in empty[rng.integers(len(empty))])
+        game_map[player_pos] = swoq_pb2.TILE_PLAYER
+        nearest = NearestTargets(game_map)
+        for kind in ('key', 'plate', 'exit', swoq_pb2.TILE_ENEMY, 'clearing'):
+            expected_pos, expected_dist = scan_closest(game_map, player_pos, nearest.target_mask(kind))
+            pos, dir, dist = nearest.closest(kind, player_pos)
+            if expected_pos is None:
+                assert (pos, dir, dist) == (None, None, None)
+            else:
+                assert (pos, dist) == (expected_pos, expected_dist), kind
+                assert dir is not None
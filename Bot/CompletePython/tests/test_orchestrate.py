@@ -0,0 +1,24 @@
+from orchestrate import Stats, restart_exited
+
+
+class FakeProcess:
+    def __init__(self, exitcode: int|None = None):
+        self.exitcode = exitcode
+
+    def is_alive(self) -> bool:
+        return self.exitcode is None
+
+
+def test_recycled_workers_are_not_counted_as_restarts():
+    stats = Stats()
+    processes = [FakeProcess(), FakeProcess(0), FakeProcess(1), FakeProcess(-9)]
+    started = []
+    def start_worker(i):
+        started.append(i)
+        return FakeProcess()
+
+    restart_exited(processes, start_worker, stats)
+    assert started == [1, 2, 3]
+    assert all(p.is_alive() for p in processes)
+    assert stats.recycles == 1 and stats.restarts == 2
+    assert 'restarts=2, recycles=1' in stats.report()
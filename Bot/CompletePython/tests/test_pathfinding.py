@@ -0,0 +1,71 @@
+from collections import deque
+import numpy as np
+import pytest
+import swoq_pb2
+from conftest import random_map
+from pathfinding import find_path
+
+_steps = {'N': (-1, 0), 'S': (1, 0), 'W': (0, -1), 'E': (0, 1)}
+
+
+def distances_to_goal(game_map, goal, blocked):
+    # Plain breadth first search from the goal over the empty cells that are
+    # not blocked, the goal itself can be any tile
+    open_cells = game_map == swoq_pb2.TILE_EMPTY
+    if blocked is not None:
+        open_cells &= ~blocked
+    height, width = game_map.shape
+    distances = np.full(game_map.shape, -1, dtype=np.int32)
+    distances[goal] = 0
+    todo = deque([goal])
+    while todo:
+        y, x = todo.popleft()
+        for dy, dx in _steps.values():
+            n = (y+dy, x+dx)
+            if 0 <= n[0] < height and 0 <= n[1] < width and open_cells[n] and distances[n] < 0:
+                distances[n] = distances[y, x] + 1
+                todo.append(n)
+    return distances, open_cells
+
+
+def expected_length(game_map, start, distances):
+    # The start is the player, it does not have to be empty itself
+    lengths = [distances[n] + 1 for n in neighbours(game_map, start) if distances[n] >= 0]
+    return min(lengths) if lengths else None
+
+
+def neighbours(game_map, pos):
+    height, width = game_map.shape
+    return [(pos[0]+dy, pos[1]+dx) for dy, dx in _steps.values() if 0 <= pos[0]+dy < height and 0 <= pos[1]+dx < width]
+
+
+@pytest.mark.parametrize('bidirectional', [False, True])
+@pytest.mark.parametrize('with_blocked', [False, True])
+def test_shortest_path_like_breadth_first_search(rng, bidirectional, with_blocked):
+    for _ in range(10):
+        game_map = random_map(rng, wall_fraction=0.3)
+        blocked = rng.random(game_map.shape) < 0.05 if with_blocked else None
+        empty = np.argwhere(game_map == swoq_pb2.TILE_EMPTY)
+        for _ in range(30):
+            start = tuple(int(v) for v in empty[rng.integers(len(empty))])
+            goal = (int(rng.integers(game_map.shape[0])), int(rng.integers(game_map.shape[1])))
+            if goal == start: continue
+            distances, open_cells = distances_to_goal(game_map, goal, blocked)
+            length = expected_length(game_map, start, distances)
+
+            direction, found_length = find_path(game_map, start, goal, blocked, bidirectional)
+            assert found_length == length
+            if length is None:
+                assert direction is None
+                continue
+
+            # The first step is on a shortest path
+            step = (start[0] + _steps[direction][0], start[1] + _steps[direction][1])
+            assert step == goal or (open_cells[step] and distances[step] == length - 1)
+
+
+def test_start_is_goal_or_goal_outside_map(rng):
+    game_map = random_map(rng, wall_fraction=0.0)
+    assert find_path(game_map, (3, 3), (3, 3)) == (None, 0)
+    assert find_path(game_map, (3, 3), (-1, 3)) == (None, None)
+    assert find_path(game_map, (3, 3), (3, game_map.shape[1])) == (None, None)
@@ -0,0 +1,105 @@
+import numpy as np
+import pytest
+import swoq_pb2
+import play
+from bitboard import plane_names, plane_tiles
+from nearest_targets import _frontier_mask
+from play import GamePlayer, backoff_delays
+from simulator import GameSimulator
+
+
+def test_backoff_delays_grow_up_to_the_maximum():
+    np.random.seed(0)
+    limits = [0.1, 0.2, 0.4, 0.8, 1.0, 1.0, 1.0]
+    samples = np.array([[next(delays) for _ in limits] for delays in (backoff_delays(0.1, 1.0) for _ in range(200))])
+
+    # Full jitter: every delay is drawn between zero and its limit
+    assert np.all(samples >= 0)
+    assert np.all(samples <= limits)
+    # and they are spread over that range instead of sitting at the limit
+    assert np.all(samples.min(axis=0) < 0.1 * np.array(limits))
+    assert np.all(samples.max(axis=0) > 0.9 * np.array(limits))
+
+
+def test_queue_delays_stop_at_the_timeout(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(play, 'monotonic', lambda: now[0])
+    np.random.seed(0)
+    player = GamePlayer.__new__(GamePlayer)
+
+    delays = player._queue_delays(queue_timeout=1.0)
+    waited = 0.0
+    with pytest.raises(TimeoutError):
+        while True:
+            delay = next(delays)
+            assert 0 <= delay <= 1.0 - waited + 1e-9
+            waited += delay
+            now[0] += delay
+    assert waited == pytest.approx(1.0)
+
+
+def test_queue_delays_without_timeout_never_stop(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(play, 'monotonic', lambda: now[0])
+    player = GamePlayer.__new__(GamePlayer)
+
+    delays = player._queue_delays(queue_timeout=None)
+    for _ in range(100):
+        now[0] += next(delays)
+    assert now[0] > 100.0
+
+
+class RecordingSimulator(GameSimulator):
+    # Keeps the last start response, to hand the same state to the player again
+    def Start(self, request, context=None, **kwargs):
+        self.start_response = super().Start(request, context, **kwargs)
+        return self.start_response
+
+
+def test_path_cache_follows_the_blocked_cells_on_an_unchanged_map():
+    stub = RecordingSimulator(seed=0)
+    with GamePlayer('test', 'test', plot=False, print=False, stub=stub) as player:
+        player.start(12, 1)
+        # Start resets the map afterwards, the same state is merged again
+        player.update_global_state(stub.start_response.state)
+
+        def direction_and_distance(pos):
+            return player.direction_and_distance(player.player1_pos, pos, *player.player_paths(0))
+
+        distances = player.player1_distances.distances
+        target = tuple(int(v) for v in np.argwhere(distances >= 3)[0])
+        dir, dist = direction_and_distance(target)
+        assert dist == distances[target] and dir is not None
+        assert player.find_closest([target], player.player1_pos, *player.player_paths(0)) == (target, dir)
+
+        # Blocked around the target while the map and the players stay the same
+        player.view.block_box(target, 1)
+        player.forget_blocked_distances()
+        assert direction_and_distance(target) == (None, np.inf)
+        assert not player.can_reach(0, target)
+        player.clear_blocked()
+        assert direction_and_distance(target) == (None, np.inf)
+
+        # The next tick writes the distances again, with the same map and positions
+        player.update_global_state(stub.start_response.state)
+        assert player.map_changes is not None and len(player.map_changes) == 0
+        assert direction_and_distance(target) == (dir, dist)
+
+
+@pytest.mark.parametrize('level', [3, 12])
+def test_caches_follow_the_map_after_a_reset(level):
+    stub = RecordingSimulator(seed=0)
+    with GamePlayer('test', 'test', plot=False, print=False, stub=stub) as player:
+        player.start(level, 1)
+        # The first state was merged before the map was cleared
+        assert np.all(player.map == swoq_pb2.TILE_UNKNOWN)
+        for name in plane_names:
+            np.testing.assert_array_equal(player.planes.mask(name), np.isin(player.map, plane_tiles[name]), err_msg=name)
+        np.testing.assert_array_equal(player.frontier.mask(), _frontier_mask(player.map))
+        assert player.tiles().count(swoq_pb2.TILE_EMPTY) == 0
+        assert player.nearest_targets().map is player.map
+
+        # And from the next state on they follow the merged map again
+        player.step()
+        np.testing.assert_array_equal(player.frontier.mask(), _frontier_mask(player.map))
+        assert player.tiles().count(swoq_pb2.TILE_EMPTY) == np.count_nonzero(player.map == swoq_pb2.TILE_EMPTY)
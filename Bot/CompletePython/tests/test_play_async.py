@@ -0,0 +1,60 @@
+import asyncio
+import swoq_pb2
+import play_async
+from play_async import play_game, run_sessions
+
+
+class FakeGames:
+    # An async stub with open maps that finish after a number of acts.
+    # Counts how many games are played at the same time.
+
+    def __init__(self, nr_acts: int = 3, fail_user: str|None = None):
+        self.nr_acts = nr_acts
+        self.fail_user = fail_user
+        self.acts = {}
+        self.active = 0
+        self.max_active = 0
+        self.next_id = 0
+
+    def state(self, game_id: str) -> swoq_pb2.State:
+        tick = self.acts[game_id]
+        status = swoq_pb2.GAME_STATUS_FINISHED_SUCCESS if tick >= self.nr_acts else swoq_pb2.GAME_STATUS_ACTIVE
+        position = swoq_pb2.Position(y=4, x=2 + tick % 2)
+        player = swoq_pb2.PlayerState(position=position, surroundings=[swoq_pb2.TILE_EMPTY] * 25)
+        return swoq_pb2.State(tick=tick, level=0, status=status, playerState=player)
+
+    async def Start(self, request: swoq_pb2.StartRequest, **kwargs) -> swoq_pb2.StartResponse:
+        await asyncio.sleep(0)
+        if request.userId == self.fail_user:
+            raise RuntimeError('unknown user')
+        game_id = str(self.next_id)
+        self.next_id += 1
+        self.acts[game_id] = 0
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        return swoq_pb2.StartResponse(result=swoq_pb2.START_RESULT_OK, gameId=game_id, mapHeight=8, mapWidth=8, visibilityRange=2,
+                                      state=self.state(game_id))
+
+    async def Act(self, request: swoq_pb2.ActRequest, **kwargs) -> swoq_pb2.ActResponse:
+        await asyncio.sleep(0)
+        self.acts[request.gameId] += 1
+        state = self.state(request.gameId)
+        if state.status != swoq_pb2.GAME_STATUS_ACTIVE:
+            self.active -= 1
+        return swoq_pb2.ActResponse(result=swoq_pb2.ACT_RESULT_OK, state=state)
+
+
+def test_play_game_until_finished():
+    games = FakeGames(nr_acts=5)
+    status = asyncio.run(play_game(games, 'user', 'name', level=0, random_rate=0.0))
+    assert status == swoq_pb2.GAME_STATUS_FINISHED_SUCCESS
+    assert games.acts == {'0': 5}
+
+
+def test_run_sessions_bounds_the_games_in_flight(monkeypatch):
+    games = FakeGames(fail_user='unknown')
+    monkeypatch.setattr(play_async.swoq_pb2_grpc, 'GameServiceStub', lambda channel: games)
+    sessions = [('user', 'name', 0)] * 9 + [('unknown', 'name', 0)]
+    results = asyncio.run(run_sessions(sessions, max_concurrent=3))
+    assert results == {'GAME_STATUS_FINISHED_SUCCESS': 9, 'ERROR': 1}
+    assert games.max_active == 3
@@ -0,0 +1,37 @@
+import pytest
+import swoq_pb2
+from player_view import PlayerView, decode_players
+
+
+def player_state(y, x, health, inventory, has_sword):
+    return swoq_pb2.PlayerState(position=swoq_pb2.Position(y=y, x=x), health=health, inventory=inventory, hasSword=has_sword)
+
+
+@pytest.mark.parametrize('with_player2', [False, True])
+def test_decode_players_round_trip(with_player2):
+    state = swoq_pb2.State(tick=3, playerState=player_state(4, 7, 5, swoq_pb2.INVENTORY_KEY_RED, True))
+    if with_player2:
+        state.player2State.CopyFrom(player_state(0, 2, 1, swoq_pb2.INVENTORY_NONE, False))
+    # Through the wire format, like a response of the server
+    state = swoq_pb2.State.FromString(state.SerializeToString())
+
+    player1, player2 = decode_players(state)
+    assert (player1.pos, player1.health, player1.inventory, player1.has_sword) == ((4, 7), 5, swoq_pb2.INVENTORY_KEY_RED, True)
+    if with_player2:
+        assert (player2.pos, player2.health, player2.inventory, player2.has_sword) == ((0, 2), 1, swoq_pb2.INVENTORY_NONE, False)
+    else:
+        assert (player2.pos, player2.health, player2.inventory, player2.has_sword) == (None, None, None, None)
+
+    # And back into the state it came from
+    for view, field in ((player1, 'playerState'), (player2, 'player2State')):
+        if view.pos is None:
+            assert not state.HasField(field)
+            continue
+        assert player_state(*view.pos, view.health, view.inventory, view.has_sword) == getattr(state, field)
+
+
+def test_views_have_slots_only():
+    view = PlayerView((1, 2), 3)
+    with pytest.raises(AttributeError):
+        view.position = (1, 2)
+    assert repr(view) == 'pos=(1, 2), health=3, inventory=None, has_sword=None'
@@ -0,0 +1,102 @@
+import numpy as np
+import pytest
+import swoq_pb2
+from replay import ReplayWriter, ReplayReader, scan_archive
+
+
+def play_messages(level=12, seed=5, nr_acts=40):
+    # Start and act messages of a short game on the simulator
+    from simulator import GameSimulator
+    stub = GameSimulator(seed=0)
+    request = swoq_pb2.StartRequest(userId='test', userName='test', level=level, seed=seed)
+    response = stub.Start(request)
+    rng = np.random.default_rng(seed)
+    acts = []
+    for _ in range(nr_acts):
+        action1, action2 = (int(a) for a in rng.choice([swoq_pb2.DIRECTED_ACTION_MOVE_NORTH, swoq_pb2.DIRECTED_ACTION_MOVE_EAST,
+                                                        swoq_pb2.DIRECTED_ACTION_MOVE_SOUTH, swoq_pb2.DIRECTED_ACTION_MOVE_WEST], size=2))
+        act_request = swoq_pb2.ActRequest(gameId=response.gameId, action=action1, action2=action2)
+        act_response = stub.Act(act_request)
+        acts.append((act_request, act_response))
+        if act_response.state.status != swoq_pb2.GAME_STATUS_ACTIVE: break
+    return request, response, acts
+
+
+def write_replay(folder, compress, messages=None, **kwargs):
+    request, response, acts = messages or play_messages()
+    with ReplayWriter.create(str(folder), request, response, compress=compress, **kwargs) as writer:
+        for act_request, act_response in acts:
+            writer.append(act_request, act_response)
+    return writer.path, (request, response, acts)
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_written_replay_reads_back(tmp_path, compress):
+    path, (request, response, acts) = write_replay(tmp_path, compress)
+    assert path.endswith('.swoq.gz' if compress else '.swoq')
+
+    with ReplayReader(path) as reader:
+        assert reader.start_request == request
+        assert reader.start_response == response
+        assert len(reader) == len(acts)
+        assert list(reader) == acts
+        assert reader.act(-1) == acts[-1]
+        with pytest.raises(IndexError):
+            reader.act(len(acts))
+
+
+@pytest.mark.parametrize('compress', [False, True])
+def test_small_buffer_writes_in_order(tmp_path, compress):
+    # Every append wakes up the writer thread
+    path, (_, _, acts) = write_replay(tmp_path, compress, max_buffered=1, flush_interval=0.001)
+    with ReplayReader(path) as reader:
+        assert list(reader) == acts
+
+
+def test_seek_finds_the_state_of_a_tick(tmp_path):
+    path, (_, response, acts) = write_replay(tmp_path, False)
+    with ReplayReader(path) as reader:
+        assert reader.seek(response.state.tick) == (None, response.state)
+        for act_request, act_response in acts:
+            if act_response.result == swoq_pb2.ACT_RESULT_OK:
+                assert reader.seek(act_response.state.tick) == (act_request, act_response.state)
+        with pytest.raises(KeyError):
+            reader.seek(acts[-1][1].state.tick + 1)
+
+
+def test_table_has_a_row_per_state(tmp_path):
+    path, (_, response, acts) = write_replay(tmp_path, True)
+    with ReplayReader(path) as reader:
+        table = reader.to_table()
+    assert list(table['tick']) == [response.state.tick] + [r.state.tick for _, r in acts]
+    assert list(table['action1']) == [-1] + [q.action for q, _ in acts]
+    assert list(table['player2_x']) == [response.state.player2State.position.x] + [r.state.player2State.position.x for _, r in acts]
+
+
+def test_not_a_replay(tmp_path):
+    path = tmp_path / 'empty.swoq'
+    path.write_bytes(b'')
+    with pytest.raises(ValueError):
+        ReplayReader(str(path))
+
+
+def test_scan_archive_combines_the_tables(tmp_path):
+    # Plain and compressed replays in nested folders, and a file that is not a replay
+    paths = []
+    for i, compress in enumerate([False, True, False, True]):
+        messages = play_messages(seed=i, nr_acts=10 + i)
+        path, _ = write_replay(tmp_path / f'run{i % 2}' / str(i), compress, messages)
+        paths.append(path)
+    (tmp_path / 'broken.swoq').write_bytes(b'\x05abc')
+
+    games, table = scan_archive(str(tmp_path), processes=2, chunksize=1)
+    assert games == sorted(paths)
+    nr_rows = 0
+    for game, path in enumerate(games):
+        with ReplayReader(path) as reader:
+            expected = reader.to_table()
+        rows = table['game'] == game
+        for name, column in expected.items():
+            np.testing.assert_array_equal(table[name][rows], column)
+        nr_rows += len(expected['tick'])
+    assert len(table['game']) == nr_rows
@@ -0,0 +1,82 @@
+import numpy as np
+import pytest
+import swoq_pb2
+import simulator
+from simulator import ActError, Game, GameSimulator, PositionWindow
+from play import GamePlayer
+from replay import ReplayReader
+
+
+def play(level, seed, max_steps=1500, **kwargs):
+    np.random.seed(seed)
+    trace = []
+    with GamePlayer('test', 'test', plot=False, print=False, stub=GameSimulator(seed=0), **kwargs) as player:
+        player.start(level, seed)
+        while not player.finished and len(trace) < max_steps:
+            player.step()
+            trace.append((player.tick, player.player1_pos, player.player2_pos))
+    return player, trace
+
+
+@pytest.mark.parametrize('level', [0, 1, 2])
+def test_player_finishes_simple_levels(level):
+    player, trace = play(level, 0)
+    assert player.status == swoq_pb2.GAME_STATUS_FINISHED_SUCCESS
+    assert [tick for tick, _, _ in trace] == list(range(1, len(trace) + 1))
+
+
+def test_same_seed_gives_the_same_game():
+    _, trace = play(12, 1, max_steps=150)
+    _, same_trace = play(12, 1, max_steps=150)
+    assert same_trace == trace
+    assert all(pos2 is not None for _, _, pos2 in trace[:10])
+
+
+def test_played_game_is_recorded(tmp_path):
+    player, trace = play(5, 0, max_steps=100, replays_folder=str(tmp_path))
+    [path] = tmp_path.iterdir()
+    with ReplayReader(str(path)) as reader:
+        assert len(reader) == len(trace)
+        assert reader.start_request.level == 5
+        assert reader.act(-1)[1].state.tick == player.tick
+
+
+def test_pipelined_play_is_the_same():
+    _, trace = play(12, 1, max_steps=150)
+    _, pipelined_trace = play(12, 1, max_steps=150, pipeline=True)
+    assert pipelined_trace == trace
+
+
+def test_failed_action_is_undone():
+    game = Game(12, 3)
+    player1, player2 = game.players
+    cells = game.map.copy()
+    positions = player1.pos, player2.pos
+
+    # Player 1 moves, player 2 uses a cell without carrying anything or having a sword
+    move = next(action for action, (dy, dx) in simulator._moves.items() if game.can_move_to((player1.pos[0]+dy, player1.pos[1]+dx)))
+    use = next(action for action, (dy, dx) in simulator._uses.items() if game.map[player2.pos[0]+dy, player2.pos[1]+dx] == simulator.CELL_EMPTY)
+    with pytest.raises(ActError):
+        game.act(move, use)
+
+    np.testing.assert_array_equal(game.map, cells)
+    assert (player1.pos, player2.pos) == positions
+    assert game.occupants[player1.pos] is player1 and game.occupants[player2.pos] is player2
+    assert len(game.occupants) == len(game.characters()) == 2 + len(game.enemies)
+    assert game.ticks == 0
+
+    game.act(move, None)
+    assert game.ticks == 1 and player1.pos != positions[0]
+
+
+def test_position_window_extent(rng):
+    window = PositionWindow(20)
+    positions = []
+    for _ in range(300):
+        pos = tuple(int(v) for v in rng.integers(0, 8, size=2))
+        window.append(pos)
+        positions = (positions + [pos])[-20:]
+        assert len(window) == len(positions)
+        for axis in (0, 1):
+            values = [p[axis] for p in positions]
+            assert window.extent(axis) == max(values) - min(values)
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+import swoq_pb2
+from conftest import random_tiles
+from tile_index import TileIndex, kind_tiles
+
+
+@pytest.mark.parametrize('with_blocked', [False, True])
+def test_lookups_match_argwhere(rng, with_blocked):
+    for _ in range(10):
+        game_map = random_tiles(rng)
+        blocked = rng.random(game_map.shape) < 0.2 if with_blocked else None
+        index = TileIndex(game_map, blocked)
+        visible = ~blocked if blocked is not None else np.ones(game_map.shape, dtype=bool)
+
+        kinds = [[tile] for tile in swoq_pb2.Tile.values()] + [[name] for name in kind_tiles] + [['key', 'door', swoq_pb2.TILE_EXIT]]
+        for kind in kinds:
+            tiles = [t for k in kind for t in (kind_tiles[k] if isinstance(k, str) else [k])]
+            expected = np.isin(game_map, tiles) & visible
+            np.testing.assert_array_equal(index.positions(*kind), np.argwhere(expected), err_msg=str(kind))
+            np.testing.assert_array_equal(index.mask(*kind), expected, err_msg=str(kind))
+            assert index.count(*kind) == np.count_nonzero(expected)
+            assert index.has(*kind) == np.any(expected)
+
+
+def test_mask_into_buffer(rng):
+    game_map = random_tiles(rng)
+    out = np.ones(game_map.shape, dtype=bool)
+    assert TileIndex(game_map).mask('plate', out=out) is out
+    np.testing.assert_array_equal(out, np.isin(game_map, kind_tiles['plate']))
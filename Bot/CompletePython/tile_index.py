@@ -0,0 +1,77 @@
+import numpy as np
+import swoq_pb2
+
+# Tile kinds that can be looked up by name
+kind_tiles = {
+    'exit': [swoq_pb2.TILE_EXIT],
+    'door': [swoq_pb2.TILE_DOOR_RED, swoq_pb2.TILE_DOOR_GREEN, swoq_pb2.TILE_DOOR_BLUE],
+    'key': [swoq_pb2.TILE_KEY_RED, swoq_pb2.TILE_KEY_GREEN, swoq_pb2.TILE_KEY_BLUE],
+    'plate': [swoq_pb2.TILE_PRESSURE_PLATE_RED, swoq_pb2.TILE_PRESSURE_PLATE_GREEN, swoq_pb2.TILE_PRESSURE_PLATE_BLUE],
+    'boulder': [swoq_pb2.TILE_BOULDER],
+    'enemy': [swoq_pb2.TILE_ENEMY],
+    'sword': [swoq_pb2.TILE_SWORD],
+    'health': [swoq_pb2.TILE_HEALTH],
+    'treasure': [swoq_pb2.TILE_TREASURE],
+}
+
+
+def _tiles_of(kinds) -> list[int]:
+    tiles = []
+    for kind in kinds:
+        if isinstance(kind, str):
+            tiles.extend(kind_tiles[kind])
+        else:
+            tiles.append(int(kind))
+    return tiles
+
+
+class TileIndex:
+    # Positions of all tiles on the map, grouped per tile value by sorting
+    # the map once. Lookups give the same result as np.argwhere(map == tile)
+    # without scanning the map again.
+    # Blocked cells, when given, are left out of every tile.
+
+    def __init__(self, game_map: np.ndarray[np.int8], blocked: np.ndarray[bool]|None = None):
+        self.map = game_map
+        self.blocked = blocked
+        self.width = game_map.shape[1]
+
+        flat = game_map.ravel().astype(np.intp)
+        if blocked is not None:
+            # Sorted after all tiles, where no lookup reaches them
+            flat[blocked.ravel()] = len(swoq_pb2.Tile.values())
+        # Stable sort keeps the cells of each tile in row-major order
+        self._order = np.argsort(flat, kind='stable')
+        counts = np.bincount(flat, minlength=len(swoq_pb2.Tile.values()))[:len(swoq_pb2.Tile.values())]
+        self._ends = np.cumsum(counts)
+        self._starts = self._ends - counts
+
+    def _flat_positions(self, tile: int) -> np.ndarray[np.intp]:
+        if tile >= len(self._starts):
+            return self._order[:0]
+        return self._order[self._starts[tile]:self._ends[tile]]
+
+    def count(self, *kinds) -> int:
+        return sum(len(self._flat_positions(tile)) for tile in _tiles_of(kinds))
+
+    def has(self, *kinds) -> bool:
+        return self.count(*kinds) > 0
+
+    def positions(self, *kinds) -> np.ndarray[np.intp]:
+        # Kinds are tile values or names from kind_tiles, result is (N, 2) array of (y, x)
+        tiles = _tiles_of(kinds)
+        if len(tiles) == 1:
+            flat = self._flat_positions(tiles[0])
+        else:
+            flat = np.sort(np.concatenate([self._flat_positions(tile) for tile in tiles]))
+        return np.stack(np.divmod(flat, self.width), axis=1)
+
+    def mask(self, *kinds, out: np.ndarray[bool]|None = None) -> np.ndarray[bool]:
+        if out is None:
+            mask = np.zeros(self.map.shape, dtype=bool)
+        else:
+            mask = out
+            mask.fill(False)
+        for tile in _tiles_of(kinds):
+            mask.ravel()[self._flat_positions(tile)] = True
+        return mask